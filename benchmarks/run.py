@@ -0,0 +1,166 @@
+from .synthetic import synthetic_frame, write_mirror, write_processed
+from scripts.base_dataloader import CovidData
+from scripts.dataloader import CountryDataLoader
+from scripts.model_training import MultiGaussianRegression
+from scripts.sweep import apply_overrides
+from scripts.utils import *
+from dataclasses import dataclass, field
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+
+@dataclass
+class BenchmarkSpec:
+    sizes: list = field(default_factory=lambda: [250, 1000])
+    kernels: list = field(default_factory=lambda: ["case1", "case2", "case3"])
+    loader_days: int = 365
+    repeat: int = 3
+    train_repeat: int = 1
+    tolerance: float = 0.25
+    baseline_file: str = "benchmarks/baseline.json"
+    results_file: str = "benchmark_results.json"
+
+
+def measure(func, repeat=1, setup=None):
+    """Best wall time over ``repeat`` runs, then the peak traced memory of one more run (MB)."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": min(times), "peak_mb": peak / 1024 ** 2}
+
+
+class BenchmarkRunner:
+    """Times data loading, training and prediction on synthetic data, fully offline, inside a temporary
+    workspace, and compares the results against a stored baseline."""
+
+    def __init__(self, config, spec=None):
+        self.config = config
+        self.spec = spec if spec is not None else BenchmarkSpec(**config.get('benchmark', {}))
+        self._logger = set_logger(level=logging.INFO)
+        self.results = {}
+
+    def _workspace_config(self, workspace, **data):
+        overrides = {'data.data_dir': str(workspace / "data"), 'data.mirror_dir': str(workspace / "mirror"),
+                     'data.offline': True, 'data.incremental': False, 'data.logging': None,
+                     'model.results_dir': str(workspace / "results"), 'model.n_jobs': 1, 'model.trace': False}
+        overrides.update({f'data.{key}': value for key, value in data.items()})
+        return apply_overrides(self.config, overrides)
+
+    def bench_loader(self, workspace):
+        start_date = pd.Timestamp('2020-04-12')
+        end_date = start_date + pd.Timedelta(days=self.spec.loader_days + 1)
+        config = self._workspace_config(workspace, country="United States", state_name="Synthetic",
+                                        start_date=start_date.strftime('%Y-%m-%d'),
+                                        end_date=end_date.strftime('%Y-%m-%d'), save_dir=None)
+        data_config = CovidData(**config['data'])
+        write_mirror(data_config.mirror_dir, data_config)
+
+        def reset():
+            shutil.rmtree(data_config.processed_path, ignore_errors=True)
+            shutil.rmtree(data_config.cache_dir, ignore_errors=True)
+
+        self.results[f"load_data[{self.spec.loader_days} days]"] = measure(
+            lambda: CountryDataLoader(config).load_data(), repeat=self.spec.repeat, setup=reset)
+
+    def bench_model(self, workspace, n_rows, kernel_type):
+        config = self._workspace_config(workspace, country="United States", state_name="Synthetic",
+                                        save_dir=f"synthetic_{n_rows}.csv")
+        config = apply_overrides(config, {'kernel.type': kernel_type})
+        write_processed(synthetic_frame(n_rows), CovidData(**config['data']))
+        regressor = MultiGaussianRegression(**config)
+        regressor.split_data()
+        self.results[f"train[{kernel_type}, {n_rows} rows]"] = measure(regressor.train,
+                                                                        repeat=self.spec.train_repeat)
+        self.results[f"predict[{kernel_type}, {n_rows} rows]"] = measure(
+            regressor.predict, repeat=self.spec.repeat, setup=regressor._predictions.clear)
+
+    def bench_kernel(self, workspace, n_rows, kernel_type):
+        """Times a kernel evaluation with gradients, as done once per optimizer step, for the composed and the
+        fused kernel on the same inputs."""
+        X = synthetic_frame(n_rows)[FEATURE_COLUMNS].values.astype(np.float64)
+        config = self._workspace_config(workspace, country="United States", state_name="Synthetic",
+                                        save_dir=f"synthetic_{n_rows}.csv")
+        for fused in (False, True):
+            kernel = MultiGaussianRegression(**apply_overrides(config, {'kernel.type': kernel_type,
+                                                                        'kernel.fused': fused})).kernel
+            # The first evaluation fills the caches of both kernels, as the first optimizer step of a fit does
+            kernel(X, eval_gradient=True)
+            self.results[f"kernel[{kernel_type}, {n_rows} rows, {'fused' if fused else 'sklearn'}]"] = measure(
+                lambda: kernel(X, eval_gradient=True), repeat=self.spec.repeat)
+
+    def run(self):
+        with tempfile.TemporaryDirectory() as workspace:
+            workspace = Path(workspace)
+            self._logger.info(f"Benchmarking load_data on {self.spec.loader_days} days of fixture files...")
+            self.bench_loader(workspace)
+            for n_rows in self.spec.sizes:
+                for kernel_type in self.spec.kernels:
+                    self._logger.info(f"Benchmarking {kernel_type} on {n_rows} rows...")
+                    self.bench_model(workspace, int(n_rows), kernel_type)
+                    self.bench_kernel(workspace, int(n_rows), kernel_type)
+        saving_dir = ROOT_DIR / "results" / "benchmarks"
+        saving_dir.mkdir(parents=True, exist_ok=True)
+        with open(saving_dir / self.spec.results_file, 'w') as f:
+            json.dump(self.results, f, indent=4)
+        return self.results
+
+    def compare(self, baseline_file=None):
+        """Logs every benchmark against the baseline and returns the names of those slower or using more
+        memory than the baseline by more than ``tolerance``."""
+        baseline_path = ROOT_DIR / (baseline_file or self.spec.baseline_file)
+        baseline = {}
+        if baseline_path.exists():
+            with open(baseline_path, 'r') as f:
+                baseline = json.load(f)
+        regressions = []
+        for name, result in self.results.items():
+            reference = baseline.get(name)
+            if reference is None:
+                self._logger.info(f"{name}: {result['time']:.3f}s, {result['peak_mb']:.1f} MB (no baseline)")
+                continue
+            ratios = {metric: result[metric] / reference[metric] if reference[metric] else 1.0
+                      for metric in ('time', 'peak_mb')}
+            message = (f"{name}: {result['time']:.3f}s ({ratios['time']:.2f}x), "
+                       f"{result['peak_mb']:.1f} MB ({ratios['peak_mb']:.2f}x)")
+            if any(ratio > 1 + self.spec.tolerance for ratio in ratios.values()):
+                regressions.append(name)
+                self._logger.warning(message)
+            else:
+                self._logger.info(message)
+        return regressions
+
+    def save_baseline(self, baseline_file=None):
+        baseline_path = ROOT_DIR / (baseline_file or self.spec.baseline_file)
+        with open(baseline_path, 'w') as f:
+            json.dump(self.results, f, indent=4)
+        self._logger.info(f"Baseline saved to {baseline_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks of data loading, training and prediction.")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+    PARAMS_DIR = ROOT_DIR / "params.yml"
+    with open(PARAMS_DIR, "r") as config_file:
+        config_data = yaml.safe_load(config_file)
+    runner = BenchmarkRunner(config_data)
+    runner.run()
+    if args.save_baseline:
+        runner.save_baseline()
+    elif runner.compare():
+        sys.exit(1)
@@ -0,0 +1,118 @@
+from scripts.base_dataloader import CovidData
+from scripts.store import ColumnStore
+from scripts.utils import FEATURE_COLUMNS, SIR_URL_TEMPLATE, POLICIES_URL_TEMPLATE, CODES, _URL_PREFIX
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+POPULATION = 39_000_000
+POLICY_INDICES = ('StringencyIndex', 'GovernmentResponseIndex', 'ContainmentHealthIndex', 'EconomicSupportIndex')
+POLICY_SUFFIXES = ('_NonVaccinated', '_Vaccinated', '_SimpleAverage', '_WeightedAverage', '_ForDisplay',
+                   '_WeightedAverage_ForDisplay')
+
+
+def sir_curves(n_rows, seed=0, population=POPULATION):
+    """Cumulative confirmed cases, active cases and deaths following a noisy multi-wave epidemic."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_rows, dtype=float)
+    waves = sum(np.exp(-((t - center) / width) ** 2)
+                for center, width in ((0.2 * n_rows, 0.05 * n_rows + 5), (0.6 * n_rows, 0.1 * n_rows + 5)))
+    daily = 1e-3 * population * (waves + 0.3) * rng.uniform(0.8, 1.2, n_rows)
+    confirmed = np.cumsum(np.round(daily))
+    active = np.convolve(np.round(daily), np.ones(14))[:n_rows]
+    deaths = np.round(0.015 * confirmed)
+    return confirmed, active, deaths
+
+
+def policy_indices(n_rows, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    t = np.arange(n_rows, dtype=float)
+    indices = {}
+    for i, name in enumerate(POLICY_INDICES):
+        level = 50 + 30 * np.sin(2 * np.pi * t / (90 + 30 * i) + i)
+        indices[name] = np.clip(np.round(level + rng.normal(0, 2, n_rows), 2), 0, 100)
+    return indices
+
+
+def synthetic_frame(n_rows, start_date='2020-04-12', seed=0):
+    """Processed dataset with the schema written by ``CountryDataLoader.save_data``."""
+    dates = pd.date_range(start_date, periods=n_rows, freq='D')
+    confirmed, active, deaths = sir_curves(n_rows, seed)
+    frame = pd.DataFrame({
+        'Province_State': 'Synthetic',
+        'Country_Region': 'US',
+        'Last_Update': dates.strftime('%Y-%m-%d 04:30:00'),
+        'Confirmed': confirmed,
+        'Deaths': deaths,
+        'Recovered': deaths,
+        'Active': active,
+        'Report_Date': (dates - pd.Timedelta(days=1)).strftime('%m-%d-%Y'),
+        'Susceptible': POPULATION - confirmed,
+        'Infected': active,
+    }, index=pd.Index(dates, name='Last_Update'))
+    indices = policy_indices(n_rows, seed)
+    frame['StringencyIndex_WeightedAverage'] = indices['StringencyIndex']
+    frame['GovernmentResponseIndex_WeightedAverage'] = indices['GovernmentResponseIndex']
+    frame['ContainmentHealthIndex_WeightedAverage_ForDisplay'] = indices['ContainmentHealthIndex']
+    frame['EconomicSupportIndex_ForDisplay'] = indices['EconomicSupportIndex']
+    return frame
+
+
+def write_processed(frame, data_config: CovidData):
+    """Writes ``frame`` where ``MultiGaussianRegression._read_data`` looks for the dataset of ``data_config``."""
+    path = data_config.processed_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if data_config.processed_format == "csv":
+        frame.to_csv(path)
+    else:
+        ColumnStore(path).save(frame, leading_columns=FEATURE_COLUMNS)
+    return path
+
+
+def _mirror_path(mirror_dir, url):
+    return Path(mirror_dir) / url[len(_URL_PREFIX):]
+
+
+def write_mirror(mirror_dir, data_config: CovidData, regions=('Synthetic',), seed=0):
+    """Writes daily US state reports and OxCGRT policy files covering the period of ``data_config`` in the
+    layout served by ``DownloadCache`` from ``mirror_dir``, plus the population file of its data directory."""
+    dates = pd.date_range(data_config.start_date, data_config.end_date, freq='D')
+    n_rows = len(dates)
+    curves = {region: sir_curves(n_rows, seed + i) for i, region in enumerate(regions)}
+    for k, date in enumerate(dates):
+        report = pd.DataFrame({
+            'Province_State': list(regions),
+            'Country_Region': 'US',
+            'Last_Update': (date + pd.Timedelta(days=1)).strftime('%Y-%m-%d 04:30:00'),
+            'Lat': 0.0,
+            'Long_': 0.0,
+            'Confirmed': [curves[region][0][k] for region in regions],
+            'Deaths': [curves[region][2][k] for region in regions],
+            'Recovered': np.nan,
+            'Active': [curves[region][1][k] for region in regions],
+            'Incident_Rate': 0.0,
+        })
+        path = _mirror_path(mirror_dir, SIR_URL_TEMPLATE.format(LEVEL='_us', DATE=date.strftime('%m-%d-%Y')))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report.to_csv(path, index=False)
+    for year in sorted(set(dates.year) | set((dates + pd.Timedelta(days=1)).year)):
+        year_dates = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+        frames = []
+        for i, region in enumerate((None,) + tuple(regions)):
+            indices = policy_indices(len(year_dates), seed + i)
+            frame = pd.DataFrame({'CountryName': data_config.country, 'RegionName': region,
+                                  'Date': year_dates.strftime('%Y%m%d'), 'C1M_School closing': 1.0,
+                                  'C1M_Notes': 'synthetic'})
+            for name, values in indices.items():
+                frame[name] = values
+                for suffix in POLICY_SUFFIXES:
+                    frame[name + suffix] = values
+            frames.append(frame)
+        url = POLICIES_URL_TEMPLATE.format(COUNTRY=data_config.country, CODE=CODES[data_config.country], YEAR=year)
+        path = _mirror_path(mirror_dir, url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.concat(frames).to_csv(path, index=False)
+    population_path = Path(data_config.data_dir) / "raw" / data_config.population_file
+    population_path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({'Region': list(regions), 'Population': POPULATION}).to_csv(population_path, index=False)
+    return Path(mirror_dir)
@@ -0,0 +1,232 @@
+from pathlib import Path
+import json
+import os
+import shutil
+import numpy as np
+
+ARTIFACT_VERSION = 2
+_META_FILE = "meta.json"
+_SOLVE_BLOCK = 256
+
+
+def _class_names(obj):
+    return [cls.__name__ for cls in type(obj).__mro__]
+
+
+def kernel_spec(kernel):
+    """Describes a (possibly cached or frozen) scikit-learn kernel as a JSON-serializable dict."""
+    names = _class_names(kernel)
+    if 'FixedKernel' in names:
+        return kernel_spec(kernel.kernel)
+    if 'FusedKernel' in names:
+        return kernel_spec(kernel.to_tree())
+    if 'Sum' in names or 'Product' in names:
+        return {'type': 'Sum' if 'Sum' in names else 'Product', 'k1': kernel_spec(kernel.k1),
+                'k2': kernel_spec(kernel.k2)}
+    if 'ConstantKernel' in names:
+        return {'type': 'Constant', 'constant_value': float(kernel.constant_value)}
+    if 'WhiteKernel' in names:
+        return {'type': 'White', 'noise_level': float(kernel.noise_level)}
+    if 'ExpSineSquared' in names:
+        return {'type': 'ExpSineSquared', 'length_scale': float(kernel.length_scale),
+                'periodicity': float(kernel.periodicity)}
+    if 'Matern' in names:
+        if kernel.nu not in (0.5, 1.5, 2.5, np.inf):
+            raise ValueError(f"Matern kernels with nu={kernel.nu} cannot be exported")
+        return {'type': 'Matern', 'length_scale': np.atleast_1d(kernel.length_scale).tolist(),
+                'nu': float(kernel.nu)}
+    if 'RBF' in names:
+        return {'type': 'RBF', 'length_scale': np.atleast_1d(kernel.length_scale).tolist()}
+    raise ValueError(f"Unsupported kernel {type(kernel).__name__}")
+
+
+def _sq_dists(X, Y):
+    # Differences instead of the |x|² + |y|² - 2xy expansion, which cancels badly for inputs of ~1e7, summed
+    # one feature at a time so that only (n, m) temporaries are allocated
+    sq_dists = np.zeros((X.shape[0], Y.shape[0]))
+    diff = np.empty_like(sq_dists)
+    for j in range(X.shape[1]):
+        np.subtract.outer(X[:, j], Y[:, j], out=diff)
+        diff *= diff
+        sq_dists += diff
+    return sq_dists
+
+
+def evaluate_kernel(spec, X, Y, sq_dists=None):
+    """``k(X, Y)`` for a kernel ``spec``; the squared distances of ``X`` and ``Y`` are computed once per call and
+    shared by all the isotropic nodes."""
+    if sq_dists is None:
+        sq_dists = {}
+    kind = spec['type']
+    if kind == 'Sum':
+        return evaluate_kernel(spec['k1'], X, Y, sq_dists) + evaluate_kernel(spec['k2'], X, Y, sq_dists)
+    if kind == 'Product':
+        return evaluate_kernel(spec['k1'], X, Y, sq_dists) * evaluate_kernel(spec['k2'], X, Y, sq_dists)
+    if kind == 'Constant':
+        return np.full((X.shape[0], Y.shape[0]), spec['constant_value'])
+    if kind == 'White':
+        # White noise only correlates a training point with itself, never a new input with the training set
+        return np.zeros((X.shape[0], Y.shape[0]))
+    if 'raw' not in sq_dists:
+        sq_dists['raw'] = _sq_dists(X, Y)
+    if kind == 'ExpSineSquared':
+        arg = np.pi * np.sqrt(sq_dists['raw']) / spec['periodicity']
+        return np.exp(-2 * (np.sin(arg) / spec['length_scale']) ** 2)
+    length_scale = np.asarray(spec['length_scale'])
+    if length_scale.size == 1:
+        scaled = sq_dists['raw'] / float(length_scale.item()) ** 2
+    else:
+        scaled = _sq_dists(X / length_scale, Y / length_scale)
+    if kind == 'RBF' or spec['nu'] == np.inf:
+        return np.exp(-0.5 * scaled)
+    dists = np.sqrt(scaled)
+    if spec['nu'] == 0.5:
+        return np.exp(-dists)
+    if spec['nu'] == 1.5:
+        scaled = dists * np.sqrt(3)
+        return (1.0 + scaled) * np.exp(-scaled)
+    scaled = dists * np.sqrt(5)
+    return (1.0 + scaled + scaled ** 2 / 3.0) * np.exp(-scaled)
+
+
+def kernel_diag(spec, n):
+    kind = spec['type']
+    if kind == 'Sum':
+        return kernel_diag(spec['k1'], n) + kernel_diag(spec['k2'], n)
+    if kind == 'Product':
+        return kernel_diag(spec['k1'], n) * kernel_diag(spec['k2'], n)
+    if kind == 'Constant':
+        return np.full(n, spec['constant_value'])
+    if kind == 'White':
+        return np.full(n, spec['noise_level'])
+    return np.ones(n)
+
+
+def _solve_lower(L, B, block=_SOLVE_BLOCK):
+    """``L⁻¹ B`` for a lower triangular ``L`` by blocked forward substitution, as ``solve_triangular`` would."""
+    L = np.asarray(L)
+    V = np.array(B, dtype=np.float64)
+    for start in range(0, L.shape[0], block):
+        end = min(start + block, L.shape[0])
+        if start:
+            V[start:end] -= L[start:end, :start] @ V[:start]
+        V[start:end] = np.linalg.solve(L[start:end, start:end], V[start:end])
+    return V
+
+
+def _components(model):
+    """Yields ``(estimator, outputs)`` pairs of the fitted Gaussian processes making up ``model``."""
+    if hasattr(model, 'estimators_'):
+        for i, estimator in enumerate(model.estimators_):
+            yield estimator, [i]
+    else:
+        yield model, None
+
+
+def _component_arrays(estimator):
+    names = _class_names(estimator)
+    if 'SparseGPR' in names:
+        n_outputs = estimator.weights_.shape[1]
+        scaling = {'y_mean': [0.0] * n_outputs, 'y_std': [1.0] * n_outputs}
+        return {'X': estimator.Z_, 'alpha': estimator.weights_, 'L': estimator.Lm_, 'LB': estimator.LB_}, scaling
+    if 'GaussianProcessRegressor' in names:
+        L = estimator.L_
+        alpha = estimator.alpha_.reshape(L.shape[0], -1)
+        scaling = {'y_mean': np.atleast_1d(estimator._y_train_mean).tolist(),
+                   'y_std': np.atleast_1d(estimator._y_train_std).tolist()}
+        return {'X': estimator.X_train_, 'alpha': alpha, 'L': L}, scaling
+    raise ValueError(f"Unsupported model {type(estimator).__name__}")
+
+
+def save_artifact(model, path, **extra_meta):
+    """Writes the fitted ``GPR``, ``SparseGPR`` or ``MultiOutputGPR`` to the artifact directory ``path``."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    components = []
+    for i, (estimator, outputs) in enumerate(_components(model)):
+        arrays, scaling = _component_arrays(estimator)
+        for name, array in arrays.items():
+            np.save(tmp_path / f"{name}_{i}.npy", np.ascontiguousarray(array, dtype=np.float64))
+        n_outputs = arrays['alpha'].shape[1]
+        components.append({'kernel': kernel_spec(estimator.kernel_), 'outputs': outputs or list(range(n_outputs)),
+                           'sparse': 'LB' in arrays, **scaling})
+    meta = {'version': ARTIFACT_VERSION, 'model': type(model).__name__, 'components': components}
+    meta.update(extra_meta)
+    with open(tmp_path / _META_FILE, 'w') as f:
+        json.dump(meta, f, indent=4)
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def artifact_files(path):
+    """The metadata of the artifact in ``path`` and the files it consists of."""
+    path = Path(path)
+    with open(path / _META_FILE, 'r') as f:
+        meta = json.load(f)
+    files = [path / _META_FILE]
+    for i, component in enumerate(meta['components']):
+        names = ('X', 'alpha', 'L') + (('LB',) if component['sparse'] else ())
+        files += [path / f"{name}_{i}.npy" for name in names]
+    return meta, files
+
+
+class CompactPredictor:
+    """Predicts from an artifact written by ``save_artifact`` using NumPy only.
+
+    An artifact is a directory with ``meta.json`` (format version, kernel hyperparameters, output scaling) and
+    one set of memory-mapped ``.npy`` arrays per fitted Gaussian process: training (or inducing) inputs ``X``,
+    mean weights ``alpha`` and the lower Cholesky factor ``L`` (and ``LB`` for the sparse engine), so that the
+    mean is ``k(x, X) @ alpha`` and the variance ``k(x, x) - ||V||² + ||LB⁻¹ V||²`` with ``V = L⁻¹ k(X, x)``, the
+    triangular solves done by blocked forward substitution.
+    """
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = Path(path)
+        with open(self.path / _META_FILE, 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported artifact version {self.meta.get('version')} in {self.path}")
+        self.components = []
+        for i, component in enumerate(self.meta['components']):
+            arrays = {name: np.load(self.path / f"{name}_{i}.npy", mmap_mode=mmap_mode)
+                      for name in ('X', 'alpha', 'L') + (('LB',) if component['sparse'] else ())}
+            self.components.append((component, arrays))
+        self.n_outputs = sum(len(component['outputs']) for component, _ in self.components)
+
+    def _variance_terms(self, arrays, K_trans):
+        """``||L⁻¹ k(X, x)||²`` and, for the sparse engine, ``||LB⁻¹ L⁻¹ k(X, x)||²`` for every row of ``K_trans``."""
+        V = _solve_lower(arrays['L'], K_trans.T)
+        W = _solve_lower(arrays['LB'], V) if 'LB' in arrays else None
+        return np.sum(V ** 2, axis=0), None if W is None else np.sum(W ** 2, axis=0)
+
+    def _predict_chunk(self, X, return_std):
+        y_mean = np.empty((X.shape[0], self.n_outputs))
+        y_std = np.empty((X.shape[0], self.n_outputs))
+        for component, arrays in self.components:
+            outputs = component['outputs']
+            y_scale = np.asarray(component['y_std'])
+            K_trans = evaluate_kernel(component['kernel'], X, np.asarray(arrays['X']))
+            y_mean[:, outputs] = (K_trans @ arrays['alpha']) * y_scale + np.asarray(component['y_mean'])
+            if not return_std:
+                continue
+            explained, restored = self._variance_terms(arrays, K_trans)
+            y_var = kernel_diag(component['kernel'], X.shape[0]) - explained
+            if restored is not None:
+                y_var += restored
+            y_std[:, outputs] = np.sqrt(np.clip(y_var, 0, None))[:, np.newaxis] * y_scale
+        return (y_mean, y_std) if return_std else y_mean
+
+    def predict(self, X, return_std=False, chunk_size=2048):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        chunks = [self._predict_chunk(X[i:i + chunk_size], return_std) for i in range(0, X.shape[0], chunk_size)]
+        if not return_std:
+            return np.concatenate(chunks)
+        return np.concatenate([chunk[0] for chunk in chunks]), np.concatenate([chunk[1] for chunk in chunks])
+
+
+def load_artifact(path, mmap_mode='r'):
+    return CompactPredictor(path, mmap_mode=mmap_mode)
@@ -0,0 +1,119 @@
+from .dataloader import CountryDataLoader
+from .model_training import MultiGaussianRegression
+from .sweep import apply_overrides, init_pool_worker
+from .utils import *
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import os
+import time
+
+WINDOWS = ('expanding', 'sliding')
+
+
+@dataclass
+class BacktestSpec:
+    window: str = "expanding"
+    horizon: int = 14
+    initial_train: float = 0.5
+    step: int = None
+    train_window: int = None
+    warm_start: bool = True
+    n_jobs: int = -1
+    results_file: str = "backtest.json"
+
+    def __post_init__(self):
+        if self.window not in WINDOWS:
+            raise ValueError(f"Unsupported window {self.window}, choose one of {WINDOWS}")
+
+    def folds(self, k, shift):
+        """Returns ``(start, origin)`` pairs; each fold trains on ``X[start:origin]`` and is tested on the
+        ``horizon`` points that follow once the data shift is honoured."""
+        step = int(self.step or self.horizon)
+        first = ceil(float(self.initial_train) * k)
+        last = k - 2 * shift - int(self.horizon)
+        train_window = int(self.train_window or first)
+        return [(max(0, origin - train_window) if self.window == 'sliding' else 0, origin)
+                for origin in range(first, last + 1, step)]
+
+
+def _run_fold(config, start, origin, horizon, theta):
+    regressor = MultiGaussianRegression(**config)
+    regressor.split_at(origin, horizon=horizon, start=start)
+    if theta is not None:
+        regressor.warm_start(theta)
+    fit_start = time.perf_counter()
+    regressor.train()
+    fold = {"Start": start, "Origin": origin, "Train size": int(regressor.X_train.shape[0]),
+            "Test size": int(regressor.X_test.shape[0]), "Warm start": theta is not None,
+            "Fit time (s)": time.perf_counter() - fit_start}
+    metrics, _, _ = regressor.evaluate()
+    fold.update({name: float(value) for name, value in metrics.items()})
+    fold["Theta"] = regressor.fitted_theta()
+    return fold
+
+
+class BacktestRunner:
+    """Walk-forward evaluation over many forecast origins.
+
+    The first fold is fitted cold; the remaining folds run in waves of ``n_jobs`` concurrent processes,
+    every wave starting the optimizer from the hyperparameters of the latest fold already fitted, so most
+    folds only refine a nearby optimum.
+    """
+
+    def __init__(self, config, spec=None):
+        self.config = config
+        self.spec = spec if spec is not None else BacktestSpec(**config.get('backtest', {}))
+        self.data_loader = CountryDataLoader(config)
+        self._logger = self.data_loader._logger
+        self.saving_dir = ROOT_DIR / "results" / self.data_loader.config.save_dir[:-4]
+
+    def run(self):
+        self.data_loader.load_data()
+        regressor = MultiGaussianRegression(**self.config)
+        regressor._read_data()
+        folds = self.spec.folds(regressor.X.shape[0], regressor.shift)
+        if not folds:
+            raise ValueError("Not enough data points for a single backtest fold")
+        n_jobs = os.cpu_count() if self.spec.n_jobs in (None, -1) else self.spec.n_jobs
+        n_workers = max(1, min(n_jobs, len(folds) - 1))
+        blas_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        horizon = int(self.spec.horizon)
+        config = apply_overrides(self.config, {'model.n_jobs': 1})
+        self._logger.info(f"Backtesting {len(folds)} folds ({self.spec.window} window) on {n_workers} workers...")
+        results = []
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_pool_worker,
+                                 initargs=(blas_threads,)) as executor, \
+                tqdm(total=len(folds), desc="\033[92mBacktesting\033[0m", unit="fold") as progress:
+            waves = [folds[:1]] + [folds[i:i + n_workers] for i in range(1, len(folds), n_workers)]
+            for wave in waves:
+                theta = results[-1]["Theta"] if results and self.spec.warm_start else None
+                futures = [executor.submit(_run_fold, config, start, origin, horizon, theta)
+                           for start, origin in wave]
+                for future in futures:
+                    results.append(future.result())
+                    progress.update()
+        report = {"Window": self.spec.window, "Horizon": horizon, "Data shift": regressor.shift,
+                  "Folds": results, "Summary": self._summarize(results)}
+        self.saving_dir.mkdir(parents=True, exist_ok=True)
+        report_filename = self.saving_dir / self.spec.results_file
+        with open(report_filename, 'w') as f:
+            json.dump(report, f, indent=4)
+        self._logger.info(f"Mean R-squared over {len(results)} folds: {report['Summary']['R-squared']['mean']:.4f}")
+        self._logger.info(f"Backtest results saved to {report_filename}")
+        return report
+
+    @staticmethod
+    def _summarize(results):
+        summary = {}
+        for name in ("Root Mean Squared Error", "Mean Absolute Error", "R-squared",
+                     "Mean Absolute Percentage Error", "Fit time (s)"):
+            values = np.array([fold[name] for fold in results])
+            summary[name] = {"mean": float(values.mean()), "std": float(values.std())}
+        return summary
+
+
+if __name__ == "__main__":
+    PARAMS_DIR = ROOT_DIR / "params.yml"
+    with open(PARAMS_DIR, "r") as config_file:
+        config_data = yaml.safe_load(config_file)
+    BacktestRunner(config_data).run()
@@ -1,5 +1,9 @@
 from .utils import set_logger
-from .utils import ROOT_DIR
+from .utils import ROOT_DIR, FEATURE_COLUMNS, _URL_PREFIX
+from .store import ColumnStore
+from .cache import DownloadCache
+from .downloader import AsyncDownloader
+from pathlib import Path
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 import pandas as pd
@@ -16,17 +20,45 @@ class CovidData:
     data_dir: str = None
     save_dir: str = None
     population_file: str = None
+    processed_format: str = "npy"
+    incremental: bool = False
+    cache_dir: str = None
+    cache_size_mb: int = 2048
+    offline: bool = False
+    mirror_dir: str = None
+    url_prefix: str = None
+    download_concurrency: int = 8
+    download_retries: int = 3
+    download_timeout: float = 30
 
     def __post_init__(self):
         if not self.save_dir:
-            filename = "_".join(self.country.split())
-            if self.state_name:
-                filename += f"_{self.state_name}"
-            self.save_dir = f"{filename}_{self.start_date}_{self.end_date}.csv"
+            self.save_dir = f"{self.region_prefix}_{self.start_date}_{self.end_date}.csv"
         if not self.population_file:
             self.population_file = f"population.csv"
         if not self.data_dir:
             self.data_dir = ROOT_DIR / "data"
+        self.data_dir = Path(self.data_dir)
+        if not self.url_prefix:
+            self.url_prefix = _URL_PREFIX
+        if not self.cache_dir:
+            self.cache_dir = self.data_dir / "raw" / "cache"
+        if self.processed_format not in ("npy", "csv"):
+            raise ValueError(f"Unsupported processed data format: {self.processed_format}")
+
+    @property
+    def region_prefix(self):
+        filename = "_".join(self.country.split())
+        if self.state_name:
+            filename += f"_{self.state_name}"
+        return filename
+
+    @property
+    def processed_path(self):
+        processed_dir = self.data_dir / "processed"
+        if self.processed_format == "csv":
+            return processed_dir / self.save_dir
+        return processed_dir / self.save_dir[:-4]
 
 
 class BaseDataLoader(ABC):
@@ -35,12 +67,20 @@ class BaseDataLoader(ABC):
         self.data_dir = self.config.data_dir
         self.file_name = self.config.save_dir
         self.data = None
+        self.reports = None
+        self.missing_reports = None
         DEBUG = self.config.logging
         log_level = logging.DEBUG if DEBUG else logging.INFO
         self._logger = set_logger(level=log_level)
         logging.getLogger("matplotlib").setLevel(logging.WARNING)
         logging.getLogger("pandas").setLevel(logging.WARNING)
         self.plots_saving_dir = ROOT_DIR / "results" / self.config.save_dir[:-4]
+        self.plot_config = config.get('plot') or {}
+        downloader = AsyncDownloader(concurrency=self.config.download_concurrency,
+                                     retries=self.config.download_retries, timeout=self.config.download_timeout)
+        self._cache = DownloadCache(self.config.cache_dir, max_size_mb=self.config.cache_size_mb,
+                                    offline=self.config.offline, mirror_dir=self.config.mirror_dir,
+                                    url_prefix=self.config.url_prefix, downloader=downloader)
 
     @property
     def year(self):
@@ -57,8 +97,15 @@ class BaseDataLoader(ABC):
 
     @abstractmethod
     def download_data(self):
+        """Builds the dataset from the daily reports, ``None`` when none of them is available."""
         pass
 
+    def _download_all(self):
+        data = self.download_data()
+        if data is None:
+            raise ValueError(f"No daily report available from {self.start_date} to {self.end_date}.")
+        return data
+
     @staticmethod
     def _load_df(filename, **kwargs):
         try:
@@ -67,6 +114,15 @@ class BaseDataLoader(ABC):
             return None
         return url_df
 
+    def _url(self, template, **kwargs):
+        return self.config.url_prefix + template.format(**kwargs)[len(_URL_PREFIX):]
+
+    def _load_remote_df(self, url, **kwargs):
+        path = self._cache.fetch(url)
+        if path is None:
+            return None
+        return self._load_df(path, **kwargs)
+
     @staticmethod
     def merge_data(df_state, df_policy):
         data_comb = pd.merge(df_state, df_policy, how='inner', left_index=True, right_index=True)
@@ -77,18 +133,113 @@ class BaseDataLoader(ABC):
             self._logger.exception(f"Directory does not exist: {_dir}")
         return _dir
 
+    @property
+    def processed_path(self):
+        return self.config.processed_path
+
+    @property
+    def _store(self):
+        return ColumnStore(self.processed_path)
+
+    def _processed_exists(self):
+        if self.config.processed_format == "csv":
+            return self.processed_path.exists()
+        return self._store.exists()
+
+    def save_data(self, data):
+        file_path = self.processed_path
+        self.data = data
+        self._logger.info(f"Saving processed file to {file_path}...")
+        year_instances = self.data.shape[0]
+        self._logger.warn(f"Found {year_instances} data instances from {self.start_date} to {self.end_date}.")
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.config.processed_format == "csv":
+            self.data.to_csv(file_path)
+        else:
+            self._store.save(self.data, leading_columns=FEATURE_COLUMNS, reports=self.reports,
+                             missing_reports=self.missing_reports,
+                             region=[self.config.country, self.config.state_name])
+
+    def _find_base_store(self, dates):
+        processed_dir = self.processed_path.parent
+        region = [self.config.country, self.config.state_name]
+        candidates = [self._store] + [ColumnStore(path) for path in sorted(processed_dir.glob(f"{self.config.region_prefix}_*"))
+                                      if path.is_dir() and path != self.processed_path]
+        base, base_overlap = None, 0
+        for store in candidates:
+            if not store.exists() or store.meta.get('region') != region or not store.meta.get('reports'):
+                continue
+            overlap = len(set(dates) & set(store.meta['reports']))
+            if overlap > base_overlap:
+                base, base_overlap = store, overlap
+        return base
+
+    def _load_incremental(self):
+        dates = self.load_dates()[:-2]
+        base = self._find_base_store(dates)
+        if base is None:
+            self._logger.info("No processed data covering the requested period, building the full dataset.")
+            self.save_data(self._download_all())
+            return
+        covered = set(base.meta['reports'])
+        # Reports that were never published before the latest available one will not appear later
+        last_report = max(pd.to_datetime(base.meta['reports'], format='%m-%d-%Y'))
+        covered.update(date for date in base.meta.get('missing_reports') or []
+                       if pd.Timestamp(date) < last_report)
+        missing = [date for date in dates if date not in covered]
+        data = base.load_frame()
+        data = data[data['Report_Date'].isin(dates)]
+        reports = [date for date in dates if date in base.meta['reports']]
+        missing_reports = [date for date in dates if date in covered and date not in reports]
+        if not missing and base.path == self.processed_path and data.shape[0] == base.meta['rows']:
+            self._logger.info(f"Processed data file {base.path} is up to date.")
+            self.data = data
+            self.reports = reports
+            self.missing_reports = missing_reports
+            return
+        if missing:
+            self._logger.info(f"Extending {base.path.name} with {len(missing)} missing daily reports.")
+            new_data = self.download_data(missing)
+            if new_data is None:
+                self._logger.warning("None of the missing daily reports are available yet.")
+            else:
+                reports += self.reports
+                missing_reports += self.missing_reports
+                data = pd.concat([data, new_data])
+        else:
+            self._logger.info(f"Reusing {base.path.name} for the requested period.")
+        data.index = pd.DatetimeIndex([str(value)[:10] for value in data.index], name=data.index.name)
+        reports, missing_reports = set(reports), set(missing_reports)
+        self.reports = [date for date in dates if date in reports]
+        self.missing_reports = [date for date in dates if date in missing_reports]
+        self.save_data(data.sort_index(kind='stable'))
+
+    def close(self):
+        self._cache.close()
+
     def load_data(self):
-        file_path = self.data_dir / "processed" / self.file_name
-        if not file_path.exists():
+        try:
+            return self._load_data()
+        finally:
+            self.close()
+
+    def _load_data(self):
+        if self.config.incremental and self.config.processed_format != "csv":
+            return self._load_incremental()
+        file_path = self.processed_path
+        legacy_path = self.data_dir / "processed" / self.file_name
+        if not self._processed_exists() and legacy_path.exists():
+            self._logger.info(f"Converting processed file {legacy_path} to the columnar store.")
+            self.save_data(self._load_df(legacy_path, index_col=0))
+        elif not self._processed_exists():
             self._logger.info(f"File {file_path} does not exist. Proceeding with data processing.")
-            self.data = self.download_data()
-            self._logger.info(f"Saving processed file to {file_path}...")
-            year_instances = self.data.shape[0]
-            self._logger.warn(f"Found {year_instances} data instances from {self.start_date} to {self.end_date}.")
-            self.data.to_csv(file_path)
+            self.save_data(self._download_all())
         else:
             self._logger.info(f"Found processed data file: {file_path}")
-            self.data = self._load_df(file_path, index_col=0)
+            if self.config.processed_format == "csv":
+                self.data = self._load_df(file_path, index_col=0)
+            else:
+                self.data = self._store.load_frame()
             year_instances = self.data.shape[0]
             self._logger.warn(
                 f"Loaded datafile with {year_instances} instances from {self.start_date} to {self.end_date}.")
@@ -0,0 +1,117 @@
+from .base_dataloader import CovidData
+from .dataloader import MultiRegionDataLoader, region_config
+from .model_training import KernelConfig, MemoryGuard
+from .store import ColumnStore
+from .sweep import apply_overrides, fit_configuration, init_pool_worker
+from .utils import *
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import os
+
+
+@dataclass
+class BatchSpec:
+    regions: list = field(default_factory=list)
+    n_jobs: int = -1
+    fetch: bool = True
+    index_file: str = "batch_index.json"
+
+
+def _dataset_rows(data_config: CovidData):
+    path = data_config.processed_path
+    if data_config.processed_format == "csv":
+        with open(path, 'r') as f:
+            return sum(1 for _ in f) - 1
+    return ColumnStore(path).meta['rows']
+
+
+def _region_report(regressor):
+    report = {"Training rows": int(regressor.X_train.shape[0]), "Engine": regressor.engine,
+              "Budget hit": regressor.budget_hit}
+    regressor.predict()
+    metrics, _, _ = regressor.evaluate()
+    report.update(metrics)
+    regressor.save_model()
+    report["Artifact"] = str(regressor.export_model())
+    return report
+
+
+def _fit_region(config):
+    data_config = CovidData(**config['data'])
+    row = {"Region": data_config.state_name or data_config.country, "Dataset": data_config.save_dir[:-4]}
+    return fit_configuration(config, row, _region_report)
+
+
+class BatchTrainer:
+    """Fits one model per region in a process pool.
+
+    Jobs are submitted by estimated fit cost (n³ for the exact engine, n·m² for the sparse one, whichever the
+    memory guard will run), largest first, so that the longest fits do not start last while the other workers
+    sit idle. Every worker is limited to its share of the host cores for BLAS, so the pool saturates the machine
+    without oversubscribing it. The artifacts of each region go to its usual results directory and a summary of
+    all fits to ``index_file`` in the results root.
+    """
+
+    def __init__(self, config, spec=None):
+        self.config = config
+        self.spec = spec if spec is not None else BatchSpec(**config.get('batch', {}))
+        self._logger = set_logger(level=logging.INFO)
+        self.results_dir = Path(config['model'].get('results_dir') or ROOT_DIR / "results")
+
+    def region_configs(self):
+        # Restarts and outputs inside a fit stay serial, the pool already uses every core
+        config = apply_overrides(self.config, {'model.n_jobs': 1})
+        return [region_config(config, region) for region in self.spec.regions]
+
+    def job_cost(self, config):
+        model_config = config['model']
+        test_size = float(model_config.get('test_size', 0.2))
+        n = ceil((1 - test_size) * _dataset_rows(CovidData(**config['data'])))
+        guard = MemoryGuard.from_config(model_config, KernelConfig(**config['kernel']))
+        try:
+            engine = guard.select(n)
+        except MemoryError:
+            # The fit fails on its memory check before doing any work
+            return 0
+        if engine == 'sparse':
+            return n * min(guard.inducing_points, n) ** 2
+        return n ** 3
+
+    def run(self):
+        configs = self.region_configs()
+        if self.spec.fetch:
+            MultiRegionDataLoader(self.config, self.spec.regions).load_data()
+        missing = [config for config in configs if not CovidData(**config['data']).processed_path.exists()]
+        for config in missing:
+            self._logger.error(f"No processed data for {CovidData(**config['data']).save_dir[:-4]}, skipping it.")
+        configs = [config for config in configs if config not in missing]
+        n_jobs = os.cpu_count() if self.spec.n_jobs in (None, -1) else self.spec.n_jobs
+        n_workers = max(1, min(n_jobs, len(configs)))
+        blas_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        # The workers fit side by side, so each may only use its share of the memory budget
+        configs = [apply_overrides(config, {'model.concurrent_fits': n_workers}) for config in configs]
+        jobs = sorted(configs, key=self.job_cost, reverse=True)
+        self._logger.info(f"Fitting {len(jobs)} regions on {n_workers} workers, {blas_threads} BLAS threads each...")
+        # The pool hands out jobs in submission order, so the largest fits start first
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_pool_worker,
+                                 initargs=(blas_threads,)) as executor:
+            futures = [executor.submit(_fit_region, config) for config in jobs]
+            rows = [future.result() for future in tqdm(as_completed(futures), total=len(futures),
+                                                       desc="\033[92mFitting\033[0m", unit="region")]
+        rows.sort(key=lambda row: row["Region"])
+        failed = [row["Region"] for row in rows if row["Status"] != "ok"]
+        if failed:
+            self._logger.warning(f"Fits failed for {', '.join(failed)}")
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        index_filename = self.results_dir / self.spec.index_file
+        with open(index_filename, 'w') as f:
+            json.dump(rows, f, indent=4)
+        self._logger.info(f"Batch index saved to {index_filename}")
+        return rows
+
+
+if __name__ == "__main__":
+    PARAMS_DIR = ROOT_DIR / "params.yml"
+    with open(PARAMS_DIR, "r") as config_file:
+        config_data = yaml.safe_load(config_file)
+    BatchTrainer(config_data).run()
@@ -0,0 +1,232 @@
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote
+from .downloader import AsyncDownloader, OK, MISSING, FAILED
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+_INDEX_FILE = "index.json"
+_JOURNAL_FILE = "index.journal"
+_OBJECTS_DIR = "objects"
+# Access-time updates collected before they are appended to the journal
+_ACCESS_FLUSH = 64
+
+
+class DownloadCache:
+    """Content-addressed on-disk cache for remote CSV files.
+
+    Every URL is mapped to the sha256 digest of its content; objects are stored once under
+    ``objects/<digest[:2]>/<digest>`` and verified against the digest before they are served.
+    When ``offline`` is set, nothing is downloaded and files are served from the cache or
+    from ``mirror_dir``, which mirrors the URL path below ``url_prefix``.
+
+    Index changes are appended to a journal, access times in batches of ``_ACCESS_FLUSH``, and
+    the journal is folded into ``index.json`` once it outgrows the index and on ``close()``.
+    """
+
+    def __init__(self, cache_dir, max_size_mb=2048, offline=False, mirror_dir=None, url_prefix='',
+                 downloader=None):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / _OBJECTS_DIR
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = int(max_size_mb * 1024 ** 2) if max_size_mb else None
+        self.offline = offline
+        self.mirror_dir = Path(mirror_dir) if mirror_dir else None
+        self.url_prefix = url_prefix
+        self.downloader = downloader if downloader is not None else AsyncDownloader()
+        self._logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._verified = set()
+        self._pending = {}
+        self._journal_lines = 0
+        self._index = self._read_index()
+        self._refs, self._size = {}, 0
+        for entry in self._index.values():
+            self._ref(entry)
+
+    @property
+    def index_path(self):
+        return self.cache_dir / _INDEX_FILE
+
+    @property
+    def journal_path(self):
+        return self.cache_dir / _JOURNAL_FILE
+
+    @property
+    def size(self):
+        return self._size
+
+    def _read_index(self):
+        index = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                self._logger.warning(f"Cache index {self.index_path} is unreadable, starting with an empty cache.")
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        url, entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line of an interrupted write
+                        break
+                    if entry is None:
+                        index.pop(url, None)
+                    else:
+                        index[url] = entry
+                    self._journal_lines += 1
+        return index
+
+    def _write_index(self):
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+        self.journal_path.unlink(missing_ok=True)
+        self._journal_lines = 0
+        self._pending.clear()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        if self._journal_lines + len(self._pending) > max(len(self._index), _ACCESS_FLUSH):
+            self._write_index()
+            return
+        with open(self.journal_path, 'a') as f:
+            f.write(''.join(json.dumps([url, entry]) + '\n' for url, entry in self._pending.items()))
+        self._journal_lines += len(self._pending)
+        self._pending.clear()
+
+    def _ref(self, entry):
+        count = self._refs.get(entry['digest'], 0)
+        if not count:
+            self._size += entry['size']
+        self._refs[entry['digest']] = count + 1
+
+    def _unref(self, entry):
+        """Releases one reference to the object of ``entry``, True when nothing refers to it anymore."""
+        count = self._refs.pop(entry['digest']) - 1
+        if count:
+            self._refs[entry['digest']] = count
+            return False
+        self._size -= entry['size']
+        return True
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest
+
+    @staticmethod
+    def _digest(content):
+        return hashlib.sha256(content).hexdigest()
+
+    def mirror_path(self, url):
+        if self.mirror_dir is None:
+            return None
+        relative = url[len(self.url_prefix):] if url.startswith(self.url_prefix) else url.split('://')[-1]
+        path = self.mirror_dir / unquote(relative)
+        return path if path.is_file() else None
+
+    def get(self, url) -> Optional[Path]:
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None:
+                return None
+            path = self._object_path(entry['digest'])
+            if entry['digest'] not in self._verified:
+                if not path.is_file() or self._digest(path.read_bytes()) != entry['digest']:
+                    self._logger.warning(f"Cached copy of {url} failed the integrity check, discarding it.")
+                    self._drop(url)
+                    self._flush()
+                    return None
+                self._verified.add(entry['digest'])
+            entry['accessed'] = time.time()
+            self._pending[url] = entry
+            if len(self._pending) >= _ACCESS_FLUSH:
+                self._flush()
+            return path
+
+    def put(self, url, content) -> Path:
+        digest = self._digest(content)
+        path = self._object_path(digest)
+        with self._lock:
+            if not path.is_file():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, path)
+            self._verified.add(digest)
+            entry = {'digest': digest, 'size': len(content), 'accessed': time.time()}
+            previous = self._index.get(url)
+            # The new entry is counted first, so an object shared by both is kept
+            self._ref(entry)
+            if previous is not None and self._unref(previous):
+                self._remove_object(previous['digest'])
+            self._index[url] = self._pending[url] = entry
+            self._evict(keep=url)
+            self._flush()
+        return path
+
+    def _remove_object(self, digest):
+        self._object_path(digest).unlink(missing_ok=True)
+        self._verified.discard(digest)
+
+    def _drop(self, url):
+        entry = self._index.pop(url)
+        self._pending[url] = None
+        if self._unref(entry):
+            self._remove_object(entry['digest'])
+
+    def _evict(self, keep=None):
+        if self.max_size is None or self.size <= self.max_size:
+            return
+        by_access = sorted(self._index.items(), key=lambda item: item[1]['accessed'])
+        for url, entry in by_access:
+            if self.size <= self.max_size:
+                break
+            if url == keep:
+                continue
+            self._drop(url)
+            self._logger.debug(f"Evicted {url} from the download cache.")
+
+    def _local_path(self, url):
+        path = self.get(url)
+        if path is None:
+            path = self.mirror_path(url)
+        return path
+
+    def prefetch(self, urls):
+        """Downloads every URL that is neither cached nor mirrored, returns the status of each URL."""
+        statuses, pending = {}, []
+        for url in dict.fromkeys(urls):
+            if self._local_path(url) is not None:
+                statuses[url] = OK
+            elif self.offline:
+                self._logger.debug(f"Offline mode: {url} is neither cached nor mirrored.")
+                statuses[url] = MISSING
+            else:
+                pending.append(url)
+        for result in self.downloader.download(pending):
+            if result.status == OK:
+                self.put(url=result.url, content=result.content)
+            elif result.status == FAILED:
+                self._logger.warning(f"Failed to download {result.url} after {result.attempts} attempts: "
+                                     f"{result.error}")
+            statuses[result.url] = result.status
+        return statuses
+
+    def fetch(self, url) -> Optional[Path]:
+        if self.prefetch([url])[url] != OK:
+            return None
+        return self._local_path(url)
+
+    def close(self):
+        with self._lock:
+            if self._pending or self._journal_lines:
+                self._write_index()
+        self.downloader.close()
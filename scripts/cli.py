@@ -0,0 +1,57 @@
+from .pipeline import Pipeline, STAGES, STAGE_NAMES
+from .utils import set_logger
+import argparse
+import os
+import subprocess
+import sys
+import yaml
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def measure_imports(stages=STAGES):
+    """Import time of every stage in a fresh interpreter, as paid by a scheduled job."""
+    timings = {}
+    for stage in stages:
+        code = ("import time; start = time.perf_counter(); "
+                + "; ".join(f"import {name}" for name in stage.modules)
+                + "; print(time.perf_counter() - start)")
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, env={**os.environ, 'MPLBACKEND': 'Agg'},
+                                capture_output=True, text=True, check=True).stdout
+        timings[stage.name] = float(output.split()[-1])
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.cli",
+                                     description="Fetch data, train, predict and plot COVID-19 forecasts.")
+    parser.add_argument("stages", nargs="*", default=['all'],
+                        help=f"stages to run, any of {', '.join(STAGE_NAMES)} ('all' runs every stage, 'imports' "
+                             "checks the import time of each stage against its budget)")
+    parser.add_argument("--config", default=str(ROOT_DIR / "params.yml"), help="parameters file")
+    parser.add_argument("--force", action="store_true", help="run the stages even if their outputs are up to date")
+    args = parser.parse_args(argv)
+    invalid = [stage for stage in args.stages if stage not in STAGE_NAMES + ('all', 'imports')]
+    if invalid:
+        parser.error(f"invalid stage(s): {', '.join(invalid)}")
+    # Headless: figures are only ever written to files
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    with open(args.config, "r") as config_file:
+        config_data = yaml.safe_load(config_file)
+    set_logger()
+    pipeline = Pipeline(config_data, force=args.force)
+    if 'imports' in args.stages:
+        over_budget = False
+        for stage, elapsed in measure_imports().items():
+            budget = pipeline.import_budget.get(stage)
+            over_budget |= budget is not None and elapsed > budget
+            print(f"{stage}: {elapsed:.2f}s (budget {budget}s)")
+        return 1 if over_budget else 0
+    stages = [stage for name in args.stages for stage in (STAGE_NAMES if name == 'all' else (name,))]
+    pipeline.run(stages)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 from .base_dataloader import BaseDataLoader, CovidData
 from .utils import *
 from concurrent.futures import ThreadPoolExecutor
+import copy
 from urllib.parse import quote
+from .downloader import OK, MISSING, FAILED
+from .plotting import render_queue, render_policies, render_sir
 
 
 class CountryDataLoader(BaseDataLoader):
@@ -17,58 +20,89 @@ class CountryDataLoader(BaseDataLoader):
     def state(self):
         return self.config.state_name
 
-    def download_data(self):
+    @property
+    def level(self):
+        return "_us" if self.country == "United States" and self.state else ""
+
+    def download_data(self, dates=None):
+        years = self.policy_years if dates is None else self._policy_years_of(dates)
+        dates = self.load_dates()[:-2] if dates is None else dates
         self._logger.info(f"Loading SIR data...")
-        covid_data = self._load_sir_data()
-        sir_data = self._generate_sir_components(covid_data)
+        covid_data = self._load_sir_data(dates)
+        if covid_data is None:
+            return None
         self._logger.info(f"Loading Policies data...")
-        policies_data = self._load_policies_data()
-        merge_data = self.merge_data(sir_data, policies_data)
+        policies_data = self._load_policies_data(years)
+        return self._build_data(covid_data, policies_data)
 
+    def _build_data(self, covid_data, policies_data):
+        sir_data = self._generate_sir_components(covid_data)
+        merge_data = self.merge_data(sir_data, policies_data)
         return merge_data
 
-    def _load_sir_data(self):
+    def _report_url(self, date):
+        return self._url(SIR_URL_TEMPLATE, LEVEL=self.level, DATE=date)
+
+    def _read_report(self, date):
+        return self._load_remote_df(self._report_url(date), usecols=is_report_column, dtype=REPORT_DTYPES)
+
+    def _prefetch_reports(self, dates):
+        statuses = self._cache.prefetch([self._report_url(date) for date in dates])
+        statuses = {date: statuses[self._report_url(date)] for date in dates}
+        failed = [date for date, status in statuses.items() if status == FAILED]
+        if failed:
+            self._logger.warning(f"{len(failed)} daily reports could not be downloaded and will be retried next run.")
+        self.reports = [date for date, status in statuses.items() if status == OK]
+        self.missing_reports = [date for date, status in statuses.items() if status == MISSING]
+        return self.reports
+
+    def _select_report_rows(self, data_i, date):
+        if data_i is None:
+            return None
+        if self.level:
+            selected_data = data_i
+        else:
+            country_column = [col for col in data_i.columns if col.startswith('Country')][0]
+            selected_data = data_i[data_i[country_column] == self.country]
+            if not selected_data.shape[0]:
+                self._logger.debug(f"Skipping not found country-level data for the date: {date}")
+                return None
+        if self.state:
+            state_column = [col for col in data_i.columns if col.startswith('Province')][0]
+            selected_data = selected_data[selected_data[state_column] == self.state]
+            if not selected_data.shape[0]:
+                existing = ','.join(selected_data[state_column].unique())
+                msg = f"\nSkipping not found region-level ({self.state}) data for the date: {date}"
+                if existing:
+                    msg = f"\nState data not found, choose one"
+                    f"of the following states or regions: {existing}"
+                    self._logger.warning(msg)
+                    self._logger.warning(f"Date: {date}")
+                else:
+                    self._logger.debug(msg)
+        return selected_data.assign(Report_Date=date)
+
+    def _concat_reports(self, results):
+        results = list(filter(lambda x: x is not None, results))
+        if not results:
+            return None
+        data = pd.concat(results)
+        data.index = pd.to_datetime(data['Last_Update']).dt.date
+        return data
+
+    def _load_sir_data(self, dates):
         # J.Hopkins University data is not fully available per year, iterate over the passed dates
-        dates = self.load_dates()[:-2]
-        level = "_us" if self.country == "United States" and self.state else ""
+        available = set(self._prefetch_reports(dates))
 
         def download_selected_data(date):
-            sir_url = SIR_URL_TEMPLATE.format(LEVEL=level, DATE=date)
-            data_i = self._load_df(sir_url)
-            if data_i is None:
-                return None
-            if level:
-                selected_data = data_i
-            else:
-                country_column = [col for col in data_i.columns if col.startswith('Country')][0]
-                selected_data = data_i[data_i[country_column] == self.country]
-                if not selected_data.shape[0]:
-                    self._logger.debug(str(sir_url))
-                    self._logger.debug(f"Skipping not found country-level data for the date: {date}")
-                    return None
-            if self.state:
-                state_column = [col for col in data_i.columns if col.startswith('Province')][0]
-                selected_data = selected_data[selected_data[state_column] == self.state]
-                if not selected_data.shape[0]:
-                    existing = ','.join(selected_data[state_column].unique())
-                    msg = f"\nSkipping not found region-level ({self.state}) data for the date: {date}"
-                    if existing:
-                        msg = f"\nState data not found, choose one"
-                        f"of the following states or regions: {existing}"
-                        self._logger.warning(msg)
-                        self._logger.warning(f"Date: {date}")
-                    else:
-                        self._logger.debug(msg)
-            return selected_data
+            data_i = self._read_report(date) if date in available else None
+            return self._select_report_rows(data_i, date)
 
         with ThreadPoolExecutor(max_workers=2) as executor:
             results = list(
                 tqdm(executor.map(download_selected_data, dates), total=len(dates), desc="\033[92mProcessing\033[0m",
                      unit="item"))
-        results = list(filter(lambda x: x is not None, results))
-        data = pd.concat(results)
-        data.index = pd.to_datetime(data['Last_Update']).dt.date
-        return data
+        return self._concat_reports(results)
 
     def _generate_sir_components(self, sir_data):
         self._logger.info("Generating SIR Data...")
@@ -81,23 +115,63 @@ class CountryDataLoader(BaseDataLoader):
         sir_data['Recovered'] = recovered_
         return sir_data
 
-    def _load_policies_data(self):
+    @property
+    def policy_years(self):
         start_year = self.start_date.split('-')[0]
         end_year = self.end_date.split('-')[0]
-        years_range = set([str(year) for year in range(int(start_year), int(end_year) + 1)])
+        return sorted(set([str(year) for year in range(int(start_year), int(end_year) + 1)]))
+
+    def _policies_url(self, year):
+        return self._url(POLICIES_URL_TEMPLATE, COUNTRY=quote(self.country), CODE=CODES[self.country], YEAR=year)
+
+    def _read_policies(self, year, regions=None):
+        policies_url = self._policies_url(year)
+        file_path = self._cache.fetch(policies_url)
+        if file_path is None:
+            self._logger.error(f"Policies data not found: {policies_url}")
+            return None
+        regions = {self.state} if regions is None else set(regions)
+        header = pd.read_csv(file_path, nrows=0).columns
+        columns = [col for col in header if is_policies_column(col)]
+        dtypes = {col: 'float64' for col in columns if col not in POLICIES_KEY_COLUMNS}
+        dtypes.update({col: str for col in POLICIES_KEY_COLUMNS})
+        # Yearly files hold every region of the country, keep only the requested ones while streaming
+        chunks, existing = [], set()
+        for chunk in pd.read_csv(file_path, usecols=columns, dtype=dtypes, chunksize=POLICIES_CHUNK_SIZE):
+            region_names = chunk['RegionName']
+            existing.update(region_names.dropna().unique())
+            selected = region_names.isin(regions - {None})
+            if None in regions:
+                selected |= region_names.isna()
+            chunks.append(chunk[selected])
+        missing = [region for region in regions if region and region not in existing]
+        if missing:
+            self._logger.exception(f"Passed region not found, choose one of the following: {','.join(sorted(existing))}")
+        return pd.concat(chunks)
+
+    def _select_policies(self, policies):
+        if self.state:
+            policies = policies[policies['RegionName'] == self.state]
+        else:
+            policies = policies[policies['RegionName'].isna()]
+        policies = policies.copy()
+        policies.index = pd.to_datetime(policies['Date'], format='%Y%m%d')
+        return policies
+
+    def _policy_years_of(self, dates):
+        # Reports are stamped with the following day, which may fall into the next year
+        timestamps = pd.to_datetime(pd.Series(dates), format='%m-%d-%Y')
+        years = set(timestamps.dt.year.astype(str)) | set((timestamps + pd.Timedelta(days=1)).dt.year.astype(str))
+        return [year for year in self.policy_years if year in years]
+
+    def _load_policies_data(self, years):
+        self._cache.prefetch([self._policies_url(year) for year in years])
         policies_df = []
-        for year in years_range:
-            policies_url = POLICIES_URL_TEMPLATE.format(COUNTRY=quote(self.country),
-                                                        CODE=CODES[self.country],
-                                                        YEAR=year)
-            policies = self._load_df(policies_url, low_memory=False)
-            if self.state:
-                policies = policies[policies['RegionName'] == self.state]
-                if not policies.shape[0]:
-                    existing = ','.join(policies['Province_State'].unique())
-                    self._logger.exception(f"Passed region not found, choose one of the following: {existing}")
-            policies.index = pd.to_datetime(policies['Date'], format='%Y%m%d')
-            policies_df.append(policies)
+        for year in years:
+            policies = self._read_policies(year)
+            if policies is None:
+                continue
+            policies_df.append(self._select_policies(policies))
         result = pd.concat(policies_df)
         return result
 
@@ -119,41 +193,20 @@ class CountryDataLoader(BaseDataLoader):
 
     def plot_sir(self, show=False):
         data = self.data
-        colors = ["purple", "crimson", "darkblue"]
         self._logger.info("Plotting")
         self._logger.info(data.index[:3])
-        formatted_dates = np.arange(data.shape[0])
-        fig, axs = plt.subplots(1, 2, figsize=(20, 8))
-
-        plots_dir = self.plots_saving_dir
-        plots_dir.mkdir(parents=True, exist_ok=True)
-        axs[0].plot(formatted_dates, data['Susceptible'], label='Susceptible', color=colors[0], linewidth=2)
-        axs[1].plot(formatted_dates, data['Infected'], label='Infected', color=colors[1], linewidth=2)
-        for _ax in axs:
-            _ax.set_facecolor((232 / 255, 232 / 255, 232 / 256))
-            _ax.set_xlabel('Day')
-            _ax.grid(True)
-        xticks_first_subplot = axs[0].get_xticks()[1:]
-        axs[0].set_title('Susceptible')
-        axs[1].set_xticks(xticks_first_subplot)
-        axs[1].set_title('Infected')
-
         plot_file = self.file_name[:-4] + "_sir_data.png"
-        plots_filename = plots_dir / plot_file
+        plots_filename = self.plots_saving_dir / plot_file
         _plot_state_name = self.state if self.state else self.country
-        fig.suptitle(
-            f'SI Covid19 data compartments for {_plot_state_name} between {self.start_date} and {self.end_date}')
-        plt.savefig(plots_filename, dpi=500)
-        if show:
-            plt.show()
-        return
+        title = f'SI Covid19 data compartments for {_plot_state_name} between {self.start_date} and {self.end_date}'
+        return render_queue(self.plot_config).submit(render_sir, plots_filename, show=show,
+                                                     susceptible=data['Susceptible'].to_numpy(),
+                                                     infected=data['Infected'].to_numpy(), title=title)
 
     def plot_policies(self, prefix, show=False):
         data = self.data
-        custom_palette = sns.color_palette("Set3", n_colors=len(data.columns))
+        n_colors = len(data.columns)
         data = data.loc[:, data.nunique() > 1]
-        plots_dir = self.plots_saving_dir
-        plots_dir.mkdir(parents=True, exist_ok=True)
         ncol = 2
         if len(prefix) > 1:
             # Index_SimpleAverage case
@@ -163,24 +216,107 @@ class CountryDataLoader(BaseDataLoader):
         else:
             cs = [c for c in data.columns if re.search(f"{prefix}\dE_((?!Flag).)*$", c)]
         cs.append('Month_Year')
-        fig, ax = plt.subplots(figsize=(16, 4))
         data.index = pd.to_datetime(data.index, format='%Y-%m-%d')
         data['Month_Year'] = data.index.strftime('%b.%y')
         viz = data[cs].groupby(['Month_Year']).mean()
         inds = pd.to_datetime(viz.index, format='%b.%y')
         sorted_names = [dt.strftime('%b.%y') for dt in sorted(inds)]
-        viz.loc[sorted_names, :].plot(kind='bar', ax=ax, color=custom_palette)
-        ax.legend(ncol=ncol)
-        plt.xticks(rotation=45)
         plot_file = self.file_name[:-4] + f"_{prefix}_data.png"
-        plots_filename = plots_dir / plot_file
+        plots_filename = self.plots_saving_dir / plot_file
         _plot_state_name = self.state if self.state else self.country
-        fig.suptitle(f'Policies data for {_plot_state_name} between {self.start_date} and {self.end_date}')
-        plt.tight_layout()
-        plt.savefig(plots_filename, dpi=500)
-        if show:
-            plt.show()
-        return
+        title = f'Policies data for {_plot_state_name} between {self.start_date} and {self.end_date}'
+        return render_queue(self.plot_config).submit(render_policies, plots_filename, show=show,
+                                                     viz=viz.loc[sorted_names, :], n_colors=n_colors, ncol=ncol,
+                                                     title=title)
+
+
+def region_config(config, region):
+    """``config`` with the ``data`` overrides of ``region`` (e.g. ``{"state_name": "Texas"}``) applied."""
+    config = copy.deepcopy(config)
+    config['data'].pop('save_dir', None)
+    config['data'].update(region)
+    return config
+
+
+class MultiRegionDataLoader:
+    """Builds processed datasets for several regions reading every daily report and policy file once."""
+
+    def __init__(self, config_file, regions):
+        self.loaders = [CountryDataLoader(region_config(config_file, region)) for region in regions]
+        self._logger = self.loaders[0]._logger if self.loaders else logging.getLogger(__name__)
+        for loader in self.loaders[1:]:
+            loader._cache = self.loaders[0]._cache
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def close(self):
+        if self.loaders:
+            self.loaders[0].close()
+
+    def load_data(self):
+        try:
+            return self._load_data()
+        finally:
+            self.close()
+
+    def _load_data(self):
+        pending = []
+        for loader in self.loaders:
+            if loader._processed_exists():
+                loader.load_data()
+            else:
+                pending.append(loader)
+        if not pending:
+            return self.loaders
+        self._logger.info(f"Loading SIR data for {len(pending)} regions...")
+        covid_data = self._load_sir_data(pending)
+        self._logger.info(f"Loading Policies data for {len(pending)} regions...")
+        policies_data = self._load_policies_data(pending)
+        for loader in pending:
+            region = loader.state if loader.state else loader.country
+            if covid_data.get(loader) is None or policies_data.get(loader) is None:
+                self._logger.error(f"No data found for {region}, skipping it.")
+                continue
+            loader.save_data(loader._build_data(covid_data[loader], policies_data[loader]))
+        return self.loaders
+
+    @staticmethod
+    def _group_by(loaders, key):
+        groups = {}
+        for loader in loaders:
+            groups.setdefault(key(loader), []).append(loader)
+        return groups
+
+    def _load_sir_data(self, loaders):
+        covid_data = {}
+        for (level, dates), group in self._group_by(loaders, lambda x: (x.level, tuple(x.load_dates()[:-2]))).items():
+            available = set(group[0]._prefetch_reports(dates))
+
+            def download_selected_data(date):
+                data_i = group[0]._read_report(date) if date in available else None
+                return [loader._select_report_rows(data_i, date) for loader in group]
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(
+                    tqdm(executor.map(download_selected_data, dates), total=len(dates),
+                         desc="\033[92mProcessing\033[0m", unit="item"))
+            for i, loader in enumerate(group):
+                loader.reports, loader.missing_reports = group[0].reports, group[0].missing_reports
+                covid_data[loader] = loader._concat_reports([rows[i] for rows in results])
+        return covid_data
+
+    def _load_policies_data(self, loaders):
+        policies_data = {loader: [] for loader in loaders}
+        self.loaders[0]._cache.prefetch([loader._policies_url(year) for loader in loaders for year in loader.policy_years])
+        for (country, years), group in self._group_by(loaders, lambda x: (x.country, tuple(x.policy_years))).items():
+            for year in years:
+                policies = group[0]._read_policies(year, regions=[loader.state for loader in group])
+                if policies is None:
+                    continue
+                for loader in group:
+                    policies_data[loader].append(loader._select_policies(policies))
+        return {loader: pd.concat(frames) if frames else None for loader, frames in policies_data.items()}
 
 
 if __name__ == "__main__":
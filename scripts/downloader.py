@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import asyncio
+import http.client
+import logging
+import random
+import threading
+
+OK = "ok"
+MISSING = "missing"
+FAILED = "failed"
+
+_MISSING_CODES = (404, 410)
+_RETRY_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: str
+    content: Optional[bytes] = None
+    code: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections shared by the download workers, keyed by scheme, host and port."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self._idle: Dict[tuple, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout)
+
+    def release(self, key, connection):
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+class AsyncDownloader:
+    """Downloads many files concurrently over pooled keep-alive connections.
+
+    Every URL ends up as a ``FetchResult`` whose status is ``ok``, ``missing`` (the server answered
+    404/410, e.g. a daily report that was never published) or ``failed`` (timeouts, connection
+    errors and 5xx/429 answers that persisted after ``retries`` exponential-backoff retries).
+    Idle connections are kept across ``download`` calls until ``close`` is called; the downloader
+    stays usable afterwards and simply opens new connections.
+    """
+
+    def __init__(self, concurrency=8, retries=3, backoff=0.5, max_backoff=8.0, timeout=30):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool = ConnectionPool(timeout=timeout)
+        self._logger = logging.getLogger(__name__)
+
+    def _request(self, url):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        connection = self.pool.acquire(key)
+        try:
+            connection.request("GET", path, headers={"Connection": "keep-alive", "Accept-Encoding": "identity"})
+            response = connection.getresponse()
+            content = response.read()
+        except BaseException:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.release(key, connection)
+        return response.status, content
+
+    def _delay(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def fetch(self, url, executor, semaphore) -> FetchResult:
+        loop = asyncio.get_running_loop()
+        result = FetchResult(url=url, status=FAILED)
+        for attempt in range(self.retries + 1):
+            result.attempts = attempt + 1
+            async with semaphore:
+                try:
+                    code, content = await loop.run_in_executor(executor, self._request, url)
+                except (OSError, http.client.HTTPException) as e:
+                    code, content, result.error = None, None, repr(e)
+            result.code = code
+            if code == 200:
+                result.status, result.content, result.error = OK, content, None
+                return result
+            if code in _MISSING_CODES:
+                result.status, result.error = MISSING, None
+                return result
+            if code is not None and code not in _RETRY_CODES:
+                result.error = f"HTTP {code}"
+                return result
+            if attempt < self.retries:
+                self._logger.debug(f"Retrying {url} after {result.error or f'HTTP {code}'}")
+                await asyncio.sleep(self._delay(attempt))
+        return result
+
+    async def fetch_all(self, urls) -> List[FetchResult]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return await asyncio.gather(*[self.fetch(url, executor, semaphore) for url in urls])
+
+    def download(self, urls) -> List[FetchResult]:
+        """Blocking entry point; from inside a running event loop await ``fetch_all`` instead."""
+        urls = list(urls)
+        if not urls:
+            return []
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_all(urls))
+        # asyncio.run refuses to nest, so a caller already inside an event loop gets its own loop thread.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.fetch_all(urls)).result()
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,442 @@
+from scipy.spatial.distance import cdist, pdist, squareform
+from sklearn.gaussian_process.kernels import (ConstantKernel, ExpSineSquared, Hyperparameter, Kernel, Matern, Product,
+                                              RBF, Sum)
+import hashlib
+import math
+import numpy as np
+
+
+def array_digest(X):
+    return X.shape, hashlib.blake2b(np.ascontiguousarray(X).tobytes(), digest_size=16).hexdigest()
+
+
+class KernelCache:
+    """Pairwise distances and Gram matrices of fixed sub-kernels for the current training inputs.
+
+    scikit-learn clones the kernel for every likelihood evaluation, so the cache survives deep copies
+    (all clones share one instance) and is dropped when pickled. Entries are keyed by a digest of ``X``
+    and are rebuilt whenever the training inputs change. It also holds the scratch buffers that
+    ``FusedKernel`` reuses across evaluations.
+    """
+
+    def __init__(self):
+        self._key = None
+        self._entries = {}
+        self._scratch = {}
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getstate__(self):
+        return {'_key': None, '_entries': {}, '_scratch': {}}
+
+    def get(self, X, name, compute):
+        key = array_digest(X)
+        if key != self._key:
+            self._entries.clear()
+            self._key = key
+        if name not in self._entries:
+            value = compute()
+            value.setflags(write=False)
+            self._entries[name] = value
+        return self._entries[name]
+
+    def distances(self, X):
+        return self.get(X, 'euclidean', lambda: squareform(pdist(X, metric="euclidean")))
+
+    def scratch(self, name, shape, dtype=np.float64):
+        """Writable buffer reused across evaluations, its content is only valid until the next one."""
+        buffer = self._scratch.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._scratch[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def clear(self):
+        self._key = None
+        self._entries.clear()
+        self._scratch.clear()
+
+
+def _signature(kernel):
+    params = kernel.get_params(deep=False)
+    return (type(kernel).__name__,) + tuple(
+        (name, _signature(value) if isinstance(value, Kernel) else repr(value))
+        for name, value in sorted(params.items()) if name != 'cache')
+
+
+class FixedKernel(Kernel):
+    """Wraps a kernel whose hyperparameters are all fixed and serves its training Gram matrix from the cache."""
+
+    def __init__(self, kernel, cache=None):
+        self.kernel = kernel
+        self.cache = cache
+
+    def __call__(self, X, Y=None, eval_gradient=False):
+        if Y is not None or self.cache is None:
+            K = self.kernel(X, Y)
+        else:
+            X = np.atleast_2d(X)
+            K = self.cache.get(X, ('fixed', _signature(self.kernel)), lambda: self.kernel(X))
+        if eval_gradient:
+            return K, np.empty((K.shape[0], K.shape[1], 0))
+        return K
+
+    def diag(self, X):
+        return self.kernel.diag(X)
+
+    def is_stationary(self):
+        return self.kernel.is_stationary()
+
+    @property
+    def requires_vector_input(self):
+        return self.kernel.requires_vector_input
+
+    def __repr__(self):
+        return repr(self.kernel)
+
+
+class CachedExpSineSquared(ExpSineSquared):
+    """ExpSineSquared reusing the cached pairwise distances of the training inputs."""
+
+    def __init__(self, length_scale=1.0, periodicity=1.0, length_scale_bounds=(1e-5, 1e5),
+                 periodicity_bounds=(1e-5, 1e5), cache=None):
+        super().__init__(length_scale=length_scale, periodicity=periodicity,
+                         length_scale_bounds=length_scale_bounds, periodicity_bounds=periodicity_bounds)
+        self.cache = cache
+
+    def __call__(self, X, Y=None, eval_gradient=False):
+        if Y is not None or self.cache is None:
+            return super().__call__(X, Y, eval_gradient)
+        X = np.atleast_2d(X)
+        arg = np.pi * self.cache.distances(X) / self.periodicity
+        sin_of_arg = np.sin(arg)
+        K = np.exp(-2 * (sin_of_arg / self.length_scale) ** 2)
+        if not eval_gradient:
+            return K
+        gradients = []
+        if not self.hyperparameter_length_scale.fixed:
+            gradients.append(4 / self.length_scale ** 2 * sin_of_arg ** 2 * K)
+        if not self.hyperparameter_periodicity.fixed:
+            gradients.append(4 * arg / self.length_scale ** 2 * np.cos(arg) * sin_of_arg * K)
+        return K, np.stack(gradients, axis=2) if gradients else np.empty(K.shape + (0,))
+
+
+class CachedMatern(Matern):
+    """Isotropic Matern (nu in 0.5, 1.5, 2.5, inf) reusing the cached pairwise distances of the training inputs.
+
+    scikit-learn scales the inputs before taking distances, here the cached distances are scaled instead, so
+    K and its gradient agree with ``Matern`` to about 1e-13 (absolute, the entries are at most 1) rather than
+    bit for bit.
+    """
+
+    def __init__(self, length_scale=1.0, length_scale_bounds=(1e-5, 1e5), nu=1.5, cache=None):
+        super().__init__(length_scale=length_scale, length_scale_bounds=length_scale_bounds, nu=nu)
+        self.cache = cache
+
+    def __call__(self, X, Y=None, eval_gradient=False):
+        if Y is not None or self.cache is None or self.anisotropic or self.nu not in (0.5, 1.5, 2.5, np.inf):
+            return super().__call__(X, Y, eval_gradient)
+        X = np.atleast_2d(X)
+        dists = self.cache.distances(X) / float(np.squeeze(self.length_scale))
+        if self.nu == 0.5:
+            K = np.exp(-dists)
+        elif self.nu == 1.5:
+            scaled = dists * math.sqrt(3)
+            exp_scaled = np.exp(-scaled)
+            K = (1.0 + scaled) * exp_scaled
+        elif self.nu == 2.5:
+            scaled = dists * math.sqrt(5)
+            exp_scaled = np.exp(-scaled)
+            K = (1.0 + scaled + scaled ** 2 / 3.0) * exp_scaled
+        else:
+            K = np.exp(-dists ** 2 / 2.0)
+        if not eval_gradient:
+            return K
+        if self.hyperparameter_length_scale.fixed:
+            return K, np.empty(K.shape + (0,))
+        if self.nu == 0.5:
+            K_gradient = K * dists
+        elif self.nu == 1.5:
+            K_gradient = 3 * dists ** 2 * exp_scaled
+        elif self.nu == 2.5:
+            K_gradient = 5.0 / 3.0 * dists ** 2 * (scaled + 1) * exp_scaled
+        else:
+            K_gradient = dists ** 2 * K
+        return K, K_gradient[:, :, np.newaxis]
+
+
+def freeze(kernel, cache):
+    if cache is None or any(not hyperparameter.fixed for hyperparameter in kernel.hyperparameters):
+        return kernel
+    return FixedKernel(kernel, cache=cache)
+
+
+FUSED_KINDS = ('case1', 'case2', 'case3')
+FUSED_MATERN_NU = (0.5, 1.5, 2.5, np.inf)
+# Order of the free hyperparameters of FusedKernel in the theta of the composed kernel
+FUSED_TREE_ORDER = ('periodic_length_scale', 'periodicity', 'matern_length_scale', 'constant_value2')
+# Eigenvalues of the fixed RBF * Constant term above this are left out of the Gram matrix by ``deflate``; the
+# other terms are at most 1 on the diagonal
+FUSED_DEFLATION_THRESHOLD = 10.0
+
+
+def _fresh_buffer(name, shape, dtype=np.float64):
+    return np.empty(shape, dtype=dtype)
+
+
+class FusedKernel(Kernel):
+    """The ``case1``-``case3`` kernels of ``MultiGaussianRegression.construct_kernel`` in one pass::
+
+        RBF(length_scale) * ExpSineSquared(periodic_length_scale, periodicity)
+            + RBF(length_scale2) * constant_value
+            [+ Matern(matern_length_scale, matern_nu)]    (case3)
+            [+ constant_value2]                           (case2, case3)
+
+    The composed kernel allocates a Gram matrix and a gradient tensor per node and stacks them on every
+    evaluation. Here the Gram matrix and all gradients are written in place into buffers kept by the
+    ``cache``, which also holds the pairwise distances and the fixed RBF terms of the training inputs, so
+    the matrices returned with ``eval_gradient`` are only valid until the next evaluation. Hyperparameters
+    that are free in the composed kernel are free here too; ``to_tree`` returns the composed equivalent.
+
+    ``dtype`` is the precision of the Gram matrix and of the buffers it is computed in, ``gradient_dtype``
+    the precision of the gradient tensor; both default to float64. With large constants the training Gram
+    matrix is dominated by a few huge eigenvalues and cannot be factorized in float32. ``deflate`` leaves
+    them out of it: the largest eigenpairs of the fixed RBF * Constant term and ``constant_value2`` times the
+    all-ones matrix are returned by ``low_rank`` instead, for a Woodbury correction in float64. Without a
+    cache the eigendecomposition is recomputed on every evaluation.
+    """
+
+    def __init__(self, kind='case1', length_scale=1.0, length_scale2=1.0, constant_value=1.0,
+                 periodic_length_scale=1.0, periodicity=1.0, matern_length_scale=1.0, matern_nu=1.5,
+                 constant_value2=1.0, periodic_length_scale_bounds=(1e-08, 10000.0),
+                 periodicity_bounds=(1e-08, 100000.0), matern_length_scale_bounds=(1000, 10000.0),
+                 constant_value2_bounds=(10000, 1000000.0), dtype='float64', gradient_dtype='float64', deflate=False,
+                 cache=None):
+        self.kind = kind
+        self.length_scale = length_scale
+        self.length_scale2 = length_scale2
+        self.constant_value = constant_value
+        self.periodic_length_scale = periodic_length_scale
+        self.periodicity = periodicity
+        self.matern_length_scale = matern_length_scale
+        self.matern_nu = matern_nu
+        self.constant_value2 = constant_value2
+        self.periodic_length_scale_bounds = periodic_length_scale_bounds
+        self.periodicity_bounds = periodicity_bounds
+        self.matern_length_scale_bounds = matern_length_scale_bounds
+        self.constant_value2_bounds = constant_value2_bounds
+        self.dtype = dtype
+        self.gradient_dtype = gradient_dtype
+        self.deflate = deflate
+        self.cache = cache
+
+    @property
+    def hyperparameter_periodic_length_scale(self):
+        return Hyperparameter("periodic_length_scale", "numeric", self.periodic_length_scale_bounds)
+
+    @property
+    def hyperparameter_periodicity(self):
+        return Hyperparameter("periodicity", "numeric", self.periodicity_bounds)
+
+    @property
+    def hyperparameter_matern_length_scale(self):
+        bounds = self.matern_length_scale_bounds if self.kind == 'case3' else "fixed"
+        return Hyperparameter("matern_length_scale", "numeric", bounds)
+
+    @property
+    def hyperparameter_constant_value2(self):
+        bounds = self.constant_value2_bounds if self.kind in ('case2', 'case3') else "fixed"
+        return Hyperparameter("constant_value2", "numeric", bounds)
+
+    def _scaled_rbf(self, dists):
+        return np.exp(-0.5 * np.square(dists) / self.length_scale2 ** 2) * self.constant_value
+
+    def _fixed_terms(self, dists, deflation=None):
+        scaled_rbf = self._scaled_rbf(dists)
+        if deflation is not None:
+            scaled_rbf -= deflation @ deflation.T
+        return np.stack([np.exp(-0.5 * np.square(dists) / self.length_scale ** 2), scaled_rbf]).astype(self.dtype)
+
+    def _deflation(self, X, dists):
+        """Eigenvectors of the fixed RBF * Constant term above ``FUSED_DEFLATION_THRESHOLD``, scaled by the
+        square roots of their eigenvalues."""
+        def compute():
+            values, vectors = np.linalg.eigh(self._scaled_rbf(dists))
+            keep = values > FUSED_DEFLATION_THRESHOLD
+            return vectors[:, keep] * np.sqrt(values[keep])
+
+        if self.cache is None:
+            return compute()
+        return self.cache.get(X, ('deflation', self.length_scale2, self.constant_value), compute)
+
+    def low_rank(self, X):
+        """Orthonormal ``W`` (n×k) and symmetric positive semi-definite ``C`` (k×k) such that the training Gram
+        matrix is the one returned with ``deflate`` plus ``W @ C @ W.T``."""
+        X = np.atleast_2d(X)
+        dists = self.cache.distances(X) if self.cache is not None else squareform(pdist(X, metric="euclidean"))
+        deflation = self._deflation(X, dists)
+        values = np.sum(deflation ** 2, axis=0)
+        W = deflation / np.sqrt(values)
+        C = np.diag(values)
+        if self.kind == 'case1':
+            return W, C
+        # constant_value2 * 1 1.T, with 1 split into its components in and orthogonal to the span of W
+        ones = np.ones(X.shape[0])
+        v = W.T @ ones
+        residual = ones - W @ v
+        norm = np.linalg.norm(residual)
+        if norm > math.sqrt(np.finfo(np.float64).eps) * math.sqrt(X.shape[0]):
+            W = np.column_stack([W, residual / norm])
+            v = np.append(v, norm)
+            C = np.pad(C, ((0, 1), (0, 1)))
+        return W, C + self.constant_value2 * np.outer(v, v)
+
+    def _add_matern(self, dists, K, gradient, arg, tmp, work):
+        nu, length_scale = self.matern_nu, self.matern_length_scale
+        if nu == 0.5:
+            np.multiply(dists, 1.0 / length_scale, out=arg)
+            np.negative(arg, out=work)
+            np.exp(work, out=work)
+            if gradient is not None:
+                np.multiply(work, arg, out=gradient)
+            K += work
+        elif nu == 1.5:
+            np.multiply(dists, math.sqrt(3) / length_scale, out=arg)
+            np.negative(arg, out=work)
+            np.exp(work, out=work)
+            if gradient is not None:
+                np.multiply(arg, arg, out=gradient)
+                gradient *= work
+            arg += 1.0
+            arg *= work
+            K += arg
+        elif nu == 2.5:
+            np.multiply(dists, math.sqrt(5) / length_scale, out=arg)
+            np.negative(arg, out=work)
+            np.exp(work, out=work)
+            np.multiply(arg, arg, out=tmp)
+            tmp /= 3.0
+            if gradient is not None:
+                np.add(arg, 1.0, out=gradient)
+                gradient *= tmp
+                gradient *= work
+            tmp += arg
+            tmp += 1.0
+            tmp *= work
+            K += tmp
+        elif nu == np.inf:
+            np.multiply(dists, 1.0 / length_scale, out=arg)
+            np.multiply(arg, arg, out=tmp)
+            np.multiply(tmp, -0.5, out=work)
+            np.exp(work, out=work)
+            if gradient is not None:
+                np.multiply(tmp, work, out=gradient)
+            K += work
+        else:
+            raise ValueError(f"FusedKernel supports matern_nu in {FUSED_MATERN_NU}, got {nu}")
+
+    def __call__(self, X, Y=None, eval_gradient=False):
+        if self.kind not in FUSED_KINDS:
+            raise ValueError(f"Unsupported kernel type {self.kind}")
+        X = np.atleast_2d(X)
+        if Y is not None:
+            if eval_gradient:
+                raise ValueError("Gradient can only be evaluated when Y is None.")
+            dists = cdist(X, np.atleast_2d(Y), metric="euclidean")
+            fixed = self._fixed_terms(dists)
+            buffer = _fresh_buffer
+        elif self.cache is not None:
+            dists = self.cache.distances(X)
+            deflation = (lambda: self._deflation(X, dists)) if self.deflate else (lambda: None)
+            fixed = self.cache.get(X, ('fused', self.length_scale, self.length_scale2, self.constant_value,
+                                       self.dtype, self.deflate), lambda: self._fixed_terms(dists, deflation()))
+            buffer = self.cache.scratch
+        else:
+            dists = squareform(pdist(X, metric="euclidean"))
+            fixed = self._fixed_terms(dists, self._deflation(X, dists) if self.deflate else None)
+            buffer = _fresh_buffer
+        # Only the training Gram matrix is deflated, cross-covariances are always complete
+        deflate = self.deflate and Y is None
+        shape = dists.shape
+        free = [hyperparameter.name for hyperparameter in self.hyperparameters if not hyperparameter.fixed]
+        dtype = np.dtype(self.dtype)
+        arg, tmp, work = buffer('arg', shape, dtype), buffer('tmp', shape, dtype), buffer('work', shape, dtype)
+        # Plain evaluations may be kept by the caller (e.g. GPR.update), so only gradient evaluations reuse K
+        K = buffer('K', shape, dtype) if eval_gradient else np.empty(shape, dtype=dtype)
+        gradient = buffer('gradient', (len(free),) + shape, np.dtype(self.gradient_dtype)) if eval_gradient else None
+
+        def slot(name):
+            return gradient[free.index(name)] if eval_gradient and name in free else None
+
+        # RBF * ExpSineSquared
+        np.multiply(dists, np.pi / self.periodicity, out=arg)
+        phase = arg
+        if dtype != np.float64:
+            # Large arguments lose their phase in single precision, so reduce them modulo pi (the period of
+            # sin² and sin·cos) in float64 first
+            phase = buffer('phase64', shape, np.dtype(np.float64))
+            np.multiply(dists, np.pi / self.periodicity, out=phase)
+            np.remainder(phase, np.pi, out=phase)
+            phase = phase.astype(dtype)
+        np.sin(phase, out=tmp)
+        np.multiply(tmp, tmp, out=work)
+        np.multiply(work, -2.0 / self.periodic_length_scale ** 2, out=K)
+        np.exp(K, out=K)
+        K *= fixed[0]
+        scale = 4.0 / self.periodic_length_scale ** 2
+        g = slot('periodic_length_scale')
+        if g is not None:
+            np.multiply(work, K, out=g)
+            g *= scale
+        g = slot('periodicity')
+        if g is not None:
+            np.cos(phase, out=work)
+            work *= tmp
+            work *= arg
+            np.multiply(work, K, out=g)
+            g *= scale
+        # RBF * Constant
+        K += fixed[1]
+        if self.kind == 'case3':
+            self._add_matern(dists, K, slot('matern_length_scale'), arg, tmp, work)
+        if self.kind in ('case2', 'case3'):
+            if not deflate:
+                K += self.constant_value2
+            g = slot('constant_value2')
+            if g is not None:
+                g.fill(self.constant_value2)
+        if not eval_gradient:
+            return K
+        return K, gradient.transpose(1, 2, 0)
+
+    def diag(self, X):
+        value = 1.0 + self.constant_value
+        if self.kind == 'case3':
+            value += 1.0
+        if self.kind in ('case2', 'case3'):
+            value += self.constant_value2
+        return np.full(np.shape(X)[0], value)
+
+    def is_stationary(self):
+        return True
+
+    def to_tree(self):
+        """The equivalent composition of scikit-learn kernels."""
+        periodic = ExpSineSquared(length_scale=self.periodic_length_scale, periodicity=self.periodicity,
+                                  length_scale_bounds=self.periodic_length_scale_bounds,
+                                  periodicity_bounds=self.periodicity_bounds)
+        kernel = Sum(Product(RBF(length_scale=self.length_scale, length_scale_bounds='fixed'), periodic),
+                     Product(RBF(length_scale=self.length_scale2, length_scale_bounds='fixed'),
+                             ConstantKernel(constant_value=self.constant_value, constant_value_bounds='fixed')))
+        if self.kind == 'case1':
+            return kernel
+        constant2 = ConstantKernel(constant_value=self.constant_value2,
+                                   constant_value_bounds=self.constant_value2_bounds)
+        if self.kind == 'case2':
+            return Sum(kernel, constant2)
+        matern = Matern(length_scale=self.matern_length_scale, length_scale_bounds=self.matern_length_scale_bounds,
+                        nu=self.matern_nu)
+        return Sum(kernel, Sum(matern, constant2))
+
+    def __repr__(self):
+        return f"Fused({self.to_tree()!r})"
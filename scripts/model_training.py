@@ -1,11 +1,31 @@
 from .base_dataloader import CovidData
+from .store import ColumnStore
+from .sparse_gp import SparseGPR
+from .trace import OptimizerTrace
+from .artifact import load_artifact, save_artifact
+from .plotting import render_queue, render_predictions
+from .kernels import (KernelCache, CachedExpSineSquared, CachedMatern, FusedKernel, FUSED_KINDS, FUSED_MATERN_NU,
+                      array_digest, freeze)
 from .utils import *
+from sklearn.base import BaseEstimator, RegressorMixin, clone
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import RBF, Matern, ExpSineSquared, ConstantKernel as C, Product, Sum
+from collections import OrderedDict
 from dataclasses import dataclass
 from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
 from scipy import optimize
+from scipy.linalg import cho_solve, cholesky, solve_triangular
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.utils import check_random_state
 from sklearn.utils.optimize import _check_optimize_result
+from threadpoolctl import threadpool_limits
+import multiprocessing
+import os
+import time
+
+
+# Free hyperparameters of each kernel case, composed or fused (``kernel.n_dims``)
+KERNEL_N_THETA = {'case1': 2, 'case2': 3, 'case3': 4}
 
 
 @dataclass
@@ -19,12 +39,163 @@ class KernelConfig:
     alpha2: float = 1.0
     length_scale_periodic: float = 1.44
     periodicity: float = 1
+    fused: bool = False
+
+    def __post_init__(self):
+        # YAML reads exponent notation without a dot (e.g. 1e4) as strings
+        for name in ('length_scale', 'alpha', 'matern_nu', 'matern_length_scale', 'length_scale2', 'alpha2',
+                     'length_scale_periodic', 'periodicity'):
+            setattr(self, name, float(getattr(self, name)))
+
+
+class _StopOptimization(Exception):
+    pass
+
+
+class _TrackedObjective:
+    """Wraps the negative log-marginal-likelihood objective, keeping the best theta seen and running checks
+    that may stop the optimizer early by raising ``_StopOptimization``."""
+
+    def __init__(self, obj_func, checks=()):
+        self.obj_func = obj_func
+        self.checks = list(checks)
+        self.n_calls = 0
+        self.best_theta = None
+        self.best_value = np.inf
+        self.last = None
+
+    def __call__(self, theta, *args, **kwargs):
+        value, grad = self.obj_func(theta, *args, **kwargs)
+        self.n_calls += 1
+        self.last = (np.array(theta, copy=True), value, grad)
+        if value < self.best_value:
+            self.best_theta, self.best_value = np.array(theta, copy=True), value
+        for check in self.checks:
+            check(self)
+        return value, grad
+
+
+class _DominanceCheck:
+    """Stops a restart whose best objective stays far above the best optimum already found by another restart."""
+
+    def __init__(self, shared_best, margin, patience):
+        self.shared_best = shared_best
+        self.margin = margin
+        self.patience = patience
+
+    def __call__(self, objective):
+        best = self.shared_best.value
+        if objective.n_calls >= self.patience and np.isfinite(best) \
+                and objective.best_value > best + self.margin * abs(best):
+            raise _StopOptimization("dominated")
+
+
+class _DeadlineCheck:
+    """Stops the optimizer once the wall-clock ``deadline`` (``time.time()``) has passed."""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+
+    def __call__(self, objective):
+        if time.time() > self.deadline:
+            raise _StopOptimization("time budget")
+
+
+class _StallCheck:
+    """Stops the optimizer when the best objective improved by less than ``tol`` (relative) over the last
+    ``patience`` calls."""
+
+    def __init__(self, patience, tol):
+        self.patience = patience
+        self.tol = tol
+        self._best_values = []
+
+    def __call__(self, objective):
+        self._best_values.append(objective.best_value)
+        if len(self._best_values) <= self.patience:
+            return
+        previous = self._best_values[-self.patience - 1]
+        if np.isfinite(previous) and previous - objective.best_value <= self.tol * abs(previous):
+            raise _StopOptimization("stalled")
+
+
+_restart_best = None
+
+
+def _init_restart_worker(shared_best, blas_threads):
+    global _restart_best
+    _restart_best = shared_best
+    threadpool_limits(limits=blas_threads)
+
+
+def _run_restart(params, X, y, initial_theta):
+    gpr = GPR(**params)
+    gpr.kernel = gpr.kernel.clone_with_theta(initial_theta)
+    gpr._checks = [_DominanceCheck(_restart_best, gpr.dominance_margin, gpr.dominance_patience)]
+    gpr.fit(X, y)
+    value = -gpr.log_marginal_likelihood_value_
+    with _restart_best.get_lock():
+        _restart_best.value = min(_restart_best.value, value)
+    return gpr.kernel_.theta, value, gpr.stopped_
+
+
+# Reasons for which a fit returns its best hyperparameters so far instead of a converged optimum
+BUDGET_STOPS = ("time budget", "stalled")
+
+
+# Largest estimated relative error (float32 eps times the condition number) of a float32 solve in compact mode
+_FLOAT32_TOLERANCE = 1e-4
+_FLOAT32_MAX_CONDITION = _FLOAT32_TOLERANCE / np.finfo(np.float32).eps
+
+
+def _inverse_norm1(solve, n, max_iter=5):
+    """Hager-Higham estimate of the 1-norm of the inverse of a symmetric matrix from solves with it, as in
+    LAPACK's condition estimators, in O(n²) per iteration."""
+    x = np.full(n, 1.0 / n)
+    estimate = 0.0
+    for _ in range(max_iter):
+        y = solve(x)
+        estimate = np.abs(y).sum()
+        z = solve(np.where(y >= 0, 1.0, -1.0))
+        j = int(np.argmax(np.abs(z)))
+        if np.abs(z[j]) <= z @ x:
+            break
+        x = np.zeros(n)
+        x[j] = 1.0
+    # Higham's extra test vector guards against the underestimates of the iteration
+    alternating = (-1.0) ** np.arange(n) * (1.0 + np.arange(n) / max(n - 1, 1))
+    return max(estimate, 2.0 * np.abs(solve(alternating)).sum() / (3.0 * n))
+
+
+def _condition_number(K, L):
+    """Estimated 1-norm condition number of the symmetric positive definite ``K`` with Cholesky factor ``L``."""
+    def solve(b):
+        return cho_solve((L, True), b.astype(L.dtype), check_finite=False).astype(np.float64)
+
+    return float(np.abs(K).sum(axis=0, dtype=np.float64).max()) * _inverse_norm1(solve, K.shape[0])
 
 
 class GPR(GaussianProcessRegressor):
+    """Gaussian process regressor with early-stopped, parallel optimizer restarts, incremental updates and
+    optimizer tracing.
+
+    With ``compact`` the likelihood is evaluated with a deflated float32 kernel (which must accept ``dtype``,
+    ``gradient_dtype`` and ``deflate`` and provide ``low_rank``, as ``FusedKernel`` does): the float32 Cholesky
+    factor only covers the well-conditioned rest of the Gram matrix and its large low-rank part is added back
+    with the Woodbury identity in float64. This is used as long as the estimated condition number of the float32
+    matrix times float32 eps stays below ``_FLOAT32_TOLERANCE``; the first time it does not, the rest of the fit
+    uses float64 (``float64_fallback_``). The fitted factor is always float64.
+
+    ``deadline`` (a ``time.time()`` value) and ``stall_patience`` bound the optimizer: once the deadline has
+    passed, or the objective stopped improving by ``stall_tol`` over ``stall_patience`` calls, every restart
+    returns the best hyperparameters it has seen and the model is factorized at the best of them
+    (``stopped_`` gives the reason).
+    """
 
     def __init__(self, max_iter=2e10, gtol=1e-06, kernel=None, alpha=1e-10, optimizer='fmin_l_bfgs_b',
-                 n_restarts_optimizer=0, normalize_y=False, copy_X_train=True, random_state=None):
+                 n_restarts_optimizer=0, normalize_y=False, copy_X_train=True, random_state=None, n_jobs=1,
+                 dominance_margin=0.1, dominance_patience=25, compact=False, deadline=None, stall_patience=None,
+                 stall_tol=1e-06):
         super().__init__(kernel=kernel, alpha=alpha, optimizer=optimizer,
                          n_restarts_optimizer=n_restarts_optimizer, normalize_y=normalize_y,
                          copy_X_train=copy_X_train,
@@ -32,29 +203,418 @@ class GPR(GaussianProcessRegressor):
         self._max_iter = max_iter
         self.gtol = gtol
         self.max_iter = max_iter
+        self.n_jobs = n_jobs
+        self.dominance_margin = dominance_margin
+        self.dominance_patience = dominance_patience
+        self.compact = compact
+        self.deadline = deadline
+        self.stall_patience = stall_patience
+        self.stall_tol = stall_tol
+        self._checks = []
+        self.stopped_ = None
+        self.float64_fallback_ = False
+        self.trace = None
+
+    def log_marginal_likelihood(self, theta=None, eval_gradient=False, clone_kernel=True):
+        if (self.trace is None and not self.compact) or theta is None:
+            return super().log_marginal_likelihood(theta, eval_gradient=eval_gradient, clone_kernel=clone_kernel)
+        # Same computation as scikit-learn, split into timed sections
+        trace = self.trace if self.trace is not None else OptimizerTrace()
+        trace.n_calls += 1
+        # The compact mode changes the precision of the kernel, so it never modifies the fitted one
+        if clone_kernel or self.compact:
+            kernel = self.kernel_.clone_with_theta(theta)
+        else:
+            kernel = self.kernel_
+            kernel.theta = theta
+        if self.compact and not self.float64_fallback_:
+            kernel.set_params(dtype='float32', gradient_dtype='float32', deflate=True)
+            result = self._log_marginal_likelihood(kernel, theta, eval_gradient, trace)
+            if result is not None:
+                return result
+            self.float64_fallback_ = True
+        if self.compact:
+            kernel.set_params(dtype='float64', gradient_dtype='float64', deflate=False)
+        return self._log_marginal_likelihood(kernel, theta, eval_gradient, trace)
+
+    def _log_marginal_likelihood(self, kernel, theta, eval_gradient, trace):
+        """The likelihood with ``kernel``; None when a deflated float32 kernel is not accurate enough."""
+        with trace.timed('kernel'):
+            if eval_gradient:
+                K, K_gradient = kernel(self.X_train_, eval_gradient=True)
+            else:
+                K = kernel(self.X_train_)
+        low_rank = kernel.low_rank(self.X_train_) if getattr(kernel, 'deflate', False) else None
+        with trace.timed('cholesky'):
+            K[np.diag_indices_from(K)] += self.alpha
+            try:
+                L = cholesky(K, lower=True, check_finite=False)
+            except np.linalg.LinAlgError:
+                L = None
+            if K.dtype == np.float32 and (L is None or _condition_number(K, L) > _FLOAT32_MAX_CONDITION):
+                return None
+        if L is None:
+            trace.cholesky_failures += 1
+            return (-np.inf, np.zeros_like(theta)) if eval_gradient else -np.inf
+        with trace.timed('cholesky'):
+            y_train = self.y_train_
+            if y_train.ndim == 1:
+                y_train = y_train[:, np.newaxis]
+            log_det = 2 * np.log(np.diag(L).astype(np.float64)).sum()
+            if low_rank is not None:
+                # K = B + W C W.T with B = L L.T: Woodbury identity and matrix determinant lemma
+                W, C = low_rank
+                Z = cho_solve((L, True), W.astype(L.dtype), check_finite=False).astype(np.float64)
+                S = np.eye(C.shape[0]) + C @ (W.T @ Z)
+                log_det += np.linalg.slogdet(S)[1]
+
+            def solve(b):
+                x = cho_solve((L, True), b.astype(L.dtype), check_finite=False).astype(np.float64)
+                if low_rank is not None:
+                    x -= Z @ np.linalg.solve(S, C @ (W.T @ x))
+                return x
+
+            alpha = solve(y_train)
+            if low_rank is not None:
+                # One step of iterative refinement with a float64 residual removes most of the error of the
+                # single precision solve, which the Woodbury correction amplifies
+                alpha += solve(y_train - K @ alpha - W @ (C @ (W.T @ alpha)))
+        log_likelihood_dims = -0.5 * np.einsum("ik,ik->k", y_train, alpha)
+        log_likelihood_dims -= 0.5 * log_det
+        log_likelihood_dims -= K.shape[0] / 2 * np.log(2 * np.pi)
+        log_likelihood = log_likelihood_dims.sum(axis=-1)
+        if not eval_gradient:
+            return log_likelihood
+        with trace.timed('gradient'):
+            K_inv = cho_solve((L, True), np.eye(K.shape[0], dtype=L.dtype), check_finite=False)
+            if low_rank is not None:
+                K_inv -= (Z @ np.linalg.solve(S, C @ Z.T)).astype(L.dtype)
+            if L.dtype == np.float32:
+                # alpha alpha.T and K_inv cancel, so contract them separately with float64 sums:
+                # 0.5 * (alpha.T G alpha - tr(K_inv G)) for every gradient slice G
+                log_likelihood_gradient = np.array([
+                    0.5 * (np.einsum("ik,ik->", alpha, K_gradient[:, :, j] @ alpha)
+                           - np.multiply(K_inv, K_gradient[:, :, j]).sum(dtype=np.float64) * alpha.shape[1])
+                    for j in range(K_gradient.shape[2])])
+            else:
+                inner_term = np.einsum("ik,jk->ijk", alpha, alpha)
+                inner_term -= K_inv[..., np.newaxis]
+                log_likelihood_gradient_dims = 0.5 * np.einsum("ijl,jik->kl", inner_term, K_gradient)
+                log_likelihood_gradient = log_likelihood_gradient_dims.sum(axis=-1)
+        return log_likelihood, log_likelihood_gradient
 
     def _constrained_optimization(self, obj_func, initial_theta, bounds):
         if self.optimizer == "fmin_l_bfgs_b":
-            opt_res = optimize.minimize(obj_func, initial_theta, method="L-BFGS-B", jac=True, bounds=bounds,
-                                        options={'maxiter': self._max_iter, 'gtol': self.gtol})
-            _check_optimize_result("lbfgs", opt_res)
-            theta_opt, func_min = opt_res.x, opt_res.fun
+            checks = list(self._checks)
+            if self.deadline is not None:
+                checks.append(_DeadlineCheck(self.deadline))
+            if self.stall_patience is not None:
+                checks.append(_StallCheck(self.stall_patience, self.stall_tol))
+            objective = _TrackedObjective(obj_func, checks)
+            callback = None
+            if self.trace is not None:
+                self.trace.start_run()
+                callback = lambda theta: self.trace.iteration(*objective.last)
+            try:
+                opt_res = optimize.minimize(objective, initial_theta, method="L-BFGS-B", jac=True, bounds=bounds,
+                                            options={'maxiter': self._max_iter, 'gtol': self.gtol}, callback=callback)
+                _check_optimize_result("lbfgs", opt_res)
+                theta_opt, func_min = opt_res.x, opt_res.fun
+            except _StopOptimization as e:
+                # The first stop reason is kept, a later restart stopping for another one does not hide it
+                self.stopped_ = self.stopped_ or str(e)
+                if objective.best_theta is None:
+                    theta_opt, func_min = np.asarray(initial_theta), np.inf
+                else:
+                    theta_opt, func_min = objective.best_theta, objective.best_value
         elif callable(self.optimizer):
             theta_opt, func_min = self.optimizer(obj_func, initial_theta, bounds=bounds)
         else:
             raise ValueError("Unknown optimizer %s." % self.optimizer)
         return theta_opt, func_min
 
+    @property
+    def _n_workers(self):
+        n_jobs = os.cpu_count() if self.n_jobs in (None, -1) else self.n_jobs
+        return max(1, min(n_jobs, self.n_restarts_optimizer + 1))
+
+    def _initial_thetas(self):
+        bounds = self.kernel.bounds
+        if not np.isfinite(bounds).all():
+            raise ValueError("Multiple optimizer restarts (n_restarts_optimizer>0) requires that all bounds are finite.")
+        rng = check_random_state(self.random_state)
+        return [self.kernel.theta] + [rng.uniform(bounds[:, 0], bounds[:, 1])
+                                      for _ in range(self.n_restarts_optimizer)]
+
+    def _parallel_restarts(self, X, y):
+        n_workers = self._n_workers
+        # Pin BLAS threads per worker so that the restarts together do not oversubscribe the host
+        blas_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        shared_best = multiprocessing.Value('d', np.inf)
+        params = {**self.get_params(deep=False), 'n_restarts_optimizer': 0, 'n_jobs': 1}
+        starts = self._initial_thetas()
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_restart_worker,
+                                 initargs=(shared_best, blas_threads)) as executor:
+            optima = list(executor.map(_run_restart, [params] * len(starts), [X] * len(starts),
+                                       [y] * len(starts), starts))
+        self.restarts_ = [{'theta': theta.tolist(), 'objective': value, 'stopped': stopped}
+                          for theta, value, stopped in optima]
+        self.stopped_ = next((stopped for _, _, stopped in optima if stopped in BUDGET_STOPS), None)
+        return min(optima, key=lambda optimum: optimum[1])[0]
+
+    def fit(self, X, y):
+        self.float64_fallback_ = False
+        self.stopped_ = None
+        if self.optimizer is None or self.n_restarts_optimizer <= 0 or self._n_workers == 1 \
+                or self.kernel is None or self.kernel.n_dims == 0:
+            return super().fit(X, y)
+        best_theta = self._parallel_restarts(X, y)
+        kernel, optimizer = self.kernel, self.optimizer
+        self.kernel, self.optimizer = kernel.clone_with_theta(best_theta), None
+        try:
+            super().fit(X, y)
+        finally:
+            self.kernel, self.optimizer = kernel, optimizer
+        return self
+
+    def update(self, X, y):
+        """Appends observations to the fitted model with a block Cholesky update, keeping the hyperparameters,
+        in O(n²·k) for k new points instead of the O((n+k)³) of a refit."""
+        if np.size(self.alpha) > 1:
+            raise ValueError("update() requires a scalar alpha")
+        X = np.asarray(X, dtype=np.float64)
+        y = (np.asarray(y, dtype=np.float64) - self._y_train_mean) / self._y_train_std
+        y = y.reshape(X.shape[0], *self.y_train_.shape[1:])
+        # [[L, 0], [S.T, L22]] is the Cholesky factor of [[K, K_cross], [K_cross.T, K_new]]
+        S = solve_triangular(self.L_, self.kernel_(self.X_train_, X), lower=True, check_finite=False)
+        K_new = self.kernel_(X) - S.T @ S
+        K_new[np.diag_indices_from(K_new)] += self.alpha
+        L22 = cholesky(K_new, lower=True, check_finite=False)
+        n, k = S.shape
+        L = np.zeros((n + k, n + k))
+        L[:n, :n] = self.L_
+        L[n:, :n] = S.T
+        L[n:, n:] = L22
+        self.L_ = L
+        self.X_train_ = np.concatenate([self.X_train_, X])
+        self.y_train_ = np.concatenate([self.y_train_, y])
+        self.alpha_ = cho_solve((self.L_, True), self.y_train_, check_finite=False)
+        y_train = self.y_train_.reshape(n + k, -1)
+        alpha = self.alpha_.reshape(n + k, -1)
+        log_likelihood_dims = -0.5 * np.einsum("ik,ik->k", y_train, alpha) - np.log(np.diag(L)).sum() \
+            - (n + k) / 2 * np.log(2 * np.pi)
+        self.log_marginal_likelihood_value_ = log_likelihood_dims.sum()
+        return self
+
+
+def _init_output_worker(blas_threads):
+    threadpool_limits(limits=blas_threads)
+
+
+def _fit_output(estimator, X, y):
+    return estimator.fit(X, y)
+
+
+class MultiOutputGPR(RegressorMixin, BaseEstimator):
+    """One Gaussian process per output column, each with its own hyperparameters.
+
+    With ``n_jobs`` > 1 the outputs are fitted concurrently in a process pool; ``predict`` stacks the
+    per-output means (and standard deviations) column-wise like a single multi-output regressor.
+    """
+
+    def __init__(self, estimators, n_jobs=1):
+        self.estimators = estimators
+        self.n_jobs = n_jobs
+
+    def _n_workers(self):
+        n_jobs = os.cpu_count() if self.n_jobs in (None, -1) else self.n_jobs
+        return max(1, min(n_jobs, len(self.estimators)))
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        if y.ndim != 2 or y.shape[1] != len(self.estimators):
+            raise ValueError(f"Expected {len(self.estimators)} output columns, got y of shape {y.shape}")
+        estimators = [clone(estimator) for estimator in self.estimators]
+        columns = [np.ascontiguousarray(y[:, i]) for i in range(y.shape[1])]
+        n_workers = self._n_workers()
+        if n_workers == 1:
+            self.estimators_ = [estimator.fit(X, column) for estimator, column in zip(estimators, columns)]
+        else:
+            blas_threads = max(1, (os.cpu_count() or 1) // n_workers)
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_output_worker,
+                                     initargs=(blas_threads,)) as executor:
+                self.estimators_ = list(executor.map(_fit_output, estimators, [X] * len(estimators), columns))
+        self.log_marginal_likelihood_value_ = float(sum(estimator.log_marginal_likelihood_value_
+                                                        for estimator in self.estimators_))
+        return self
+
+    def update(self, X, y):
+        y = np.asarray(y).reshape(np.shape(X)[0], -1)
+        for i, estimator in enumerate(self.estimators_):
+            estimator.update(X, y[:, i])
+        self.log_marginal_likelihood_value_ = float(sum(estimator.log_marginal_likelihood_value_
+                                                        for estimator in self.estimators_))
+        return self
+
+    def predict(self, X, return_std=False):
+        predictions = [estimator.predict(X, return_std=return_std) for estimator in self.estimators_]
+        if not return_std:
+            return np.column_stack(predictions)
+        return (np.column_stack([prediction[0] for prediction in predictions]),
+                np.column_stack([prediction[1] for prediction in predictions]))
+
+
+ENGINES = ('exact', 'sparse')
+# Inputs whose predictions are kept, e.g. the test set and the latest forecast inputs
+PREDICTION_MEMO_SIZE = 4
+MEMORY_FALLBACKS = ('sparse', 'error')
+
+
+def exact_memory_mb(n_samples, n_theta, n_outputs=1, compact=False):
+    """Approximate peak memory of one exact fit: the cached distances and fixed kernel terms, the kernel buffers,
+    K, its Cholesky factor and inverse, the n×n×outputs term of the likelihood gradient and the gradient tensor
+    (float32 in compact mode)."""
+    square = float(n_samples) ** 2
+    return (8 * square * (10 + n_outputs) + (4 if compact else 8) * square * n_theta) / 1024 ** 2
+
+
+def sparse_memory_mb(n_samples, n_inducing, n_outputs=1, n_theta=0):
+    """Approximate peak memory of one sparse fit: the n×m cross-covariance, its whitened copy and slope, and the
+    kernel, gradient and temporaries of the block of 2m inputs evaluated for the bound gradient."""
+    m = min(n_inducing, n_samples)
+    return 8 * (3.0 * n_samples * m + 16.0 * m * m * (n_theta + 2) + n_samples * n_outputs) / 1024 ** 2
+
+
+@dataclass
+class MemoryGuard:
+    """Engine choice of a fit under ``memory_budget_mb``. It only needs the ``model`` settings and the number of
+    kernel hyperparameters, so the choice can be made before building a regressor."""
+    n_theta: int
+    engine: str = 'exact'
+    inducing_points: int = 200
+    n_jobs: int = 1
+    n_restarts: int = 0
+    per_output: bool = False
+    compact: bool = False
+    memory_budget_mb: float = None
+    memory_fallback: str = 'sparse'
+    concurrent_fits: int = 1
+
+    @classmethod
+    def from_config(cls, model_config, kernel_config):
+        budget = model_config.get('memory_budget_mb')
+        return cls(n_theta=KERNEL_N_THETA[kernel_config.type], engine=model_config.get('engine', 'exact'),
+                   inducing_points=int(model_config.get('inducing_points', 200)),
+                   n_jobs=int(model_config.get('n_jobs', 1)), n_restarts=int(model_config.get('n_restarts', 0)),
+                   per_output=bool(model_config.get('per_output', False)),
+                   compact=bool(model_config.get('compact', False)),
+                   memory_budget_mb=None if budget is None else float(budget),
+                   memory_fallback=model_config.get('memory_fallback', 'sparse'),
+                   concurrent_fits=max(1, int(model_config.get('concurrent_fits', 1))))
+
+    def estimate(self, engine, n_samples):
+        """Approximate peak memory (MB) of training ``engine`` on ``n_samples`` rows, counting the fits that run
+        concurrently."""
+        n_outputs = len(TARGET_COLUMNS)
+        n_jobs = os.cpu_count() if self.n_jobs in (None, -1) else self.n_jobs
+        if self.per_output:
+            concurrent, n_outputs = min(n_jobs, n_outputs), 1
+        else:
+            concurrent = min(n_jobs, self.n_restarts + 1) if engine == 'exact' else 1
+        if engine == 'sparse':
+            return concurrent * sparse_memory_mb(n_samples, self.inducing_points, n_outputs, self.n_theta)
+        return concurrent * exact_memory_mb(n_samples, self.n_theta, n_outputs, self.compact)
+
+    def select(self, n_samples):
+        """The configured engine, or the sparse one when the estimated peak memory of the exact fit exceeds this
+        fit's share of ``memory_budget_mb`` and ``memory_fallback`` is "sparse". Raises ``MemoryError`` when no
+        engine fits the budget. Without a budget the configured engine is always used."""
+        engine = self.engine
+        if self.memory_budget_mb is None:
+            return engine
+        budget = self.memory_budget_mb / self.concurrent_fits
+        estimate = self.estimate(engine, n_samples)
+        if estimate <= budget:
+            return engine
+        if engine == 'exact' and self.memory_fallback == 'sparse' and self.estimate('sparse', n_samples) <= budget:
+            return 'sparse'
+        raise MemoryError(f"Training the {engine} engine on {n_samples} rows needs about {estimate:.1f} MB, over the "
+                          f"{budget:.1f} MB budget")
+
+
+def _available_memory_mb():
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if os.name == 'nt':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong)] + [
+                (name, ctypes.c_ulonglong) for name in ('ullTotalPhys', 'ullAvailPhys', 'ullTotalPageFile',
+                                                        'ullAvailPageFile', 'ullTotalVirtual', 'ullAvailVirtual',
+                                                        'ullAvailExtendedVirtual')]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys / 1024 ** 2
+        return None
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (ValueError, OSError, AttributeError):
+        return None
+
 
 class MultiGaussianRegression:
     def __init__(self, gtol=1e-06, test_size=0.2, data_shift=5, **config):
         self.data_config = CovidData(**config['data'])
         self.kernel_config = KernelConfig(**config['kernel'])
         self.config = config['model']
+        self.kernel_cache = KernelCache() if self.config.get('kernel_cache', True) else None
+        self.compact = bool(self.config.get('compact', False))
         self.kernel = self.construct_kernel()
-        self.test_size = test_size
-        self.shift = data_shift
-        self._gtol = gtol
+        self.test_size = float(self.config.get('test_size', test_size))
+        self.shift = int(self.config.get('data_shift', data_shift))
+        self._gtol = float(self.config.get('gtol', gtol))
+        self.configured_engine = self.config.get('engine', 'exact')
+        if self.configured_engine not in ENGINES:
+            raise ValueError(f"Unsupported engine {self.configured_engine}, choose one of {ENGINES}")
+        # Engine of the current fit, the sparse one when the memory guard switched to it
+        self.engine = self.configured_engine
+        self.inducing_points = int(self.config.get('inducing_points', 200))
+        self.sparse_noise = float(self.config.get('sparse_noise', 1.0))
+        noise_bounds = self.config.get('sparse_noise_bounds', (1e-5, 1e5))
+        self.sparse_noise_bounds = noise_bounds if noise_bounds == "fixed" else tuple(map(float, noise_bounds))
+        self.n_restarts = int(self.config.get('n_restarts', 0))
+        self.n_jobs = int(self.config.get('n_jobs', 1))
+        self.per_output = bool(self.config.get('per_output', False))
+        time_budget = self.config.get('time_budget')
+        self.time_budget = None if time_budget is None else float(time_budget)
+        stall_patience = self.config.get('stall_patience')
+        self.stall_patience = None if stall_patience is None else int(stall_patience)
+        self.stall_tol = float(self.config.get('stall_tol', 1e-06))
+        self._deadline = None
+        self.budget_hit = False
+        budget = self.config.get('memory_budget_mb')
+        self.memory_budget_mb = None if budget is None else float(budget)
+        # Fits running at the same time on this host (e.g. batch workers), which share the memory budget
+        self.concurrent_fits = max(1, int(self.config.get('concurrent_fits', 1)))
+        self.memory_fallback = self.config.get('memory_fallback', 'sparse')
+        if self.memory_fallback not in MEMORY_FALLBACKS:
+            raise ValueError(f"Unsupported memory_fallback {self.memory_fallback}, choose one of {MEMORY_FALLBACKS}")
+        self._output_thetas = None
+        drift = self.config.get('update_drift', 0.1)
+        self.update_drift = None if drift is None else float(drift)
+        self._reference_lml = None
+        self.trace = bool(self.config.get('trace', False))
+        self.trace_callback = None
+        self.predict_chunk_size = int(self.config.get('predict_chunk_size', 2048))
+        self._predictions = OrderedDict()
         self.X = None
         self.y = None
         self.X_train = None
@@ -65,28 +625,28 @@ class MultiGaussianRegression:
         DEBUG = self.config['logging'] == 'debug'
         log_level = logging.DEBUG if DEBUG else logging.INFO
         self._logger = set_logger(level=log_level)
-        self.saving_dir = ROOT_DIR / "results" / self.data_config.save_dir[:-4]
+        self.plot_config = config.get('plot') or {}
+        self.saving_dir = Path(self.config.get('results_dir') or ROOT_DIR / "results") / self.data_config.save_dir[:-4]
         if not self.saving_dir.exists():
             self.saving_dir.mkdir(parents=True, exist_ok=True)
         logging.getLogger("sklearn").setLevel(logging.WARNING)
         logging.getLogger("matplotlib").setLevel(logging.WARNING)
 
     def _read_data(self):
-        file_path = self.data_config.data_dir / "processed" / self.data_config.save_dir
-        data = pd.read_csv(file_path, index_col=0)
-        training_data = data[['Susceptible', 'Infected', 'StringencyIndex_WeightedAverage',
-                              'GovernmentResponseIndex_WeightedAverage',
-                              'ContainmentHealthIndex_WeightedAverage_ForDisplay',
-                              'EconomicSupportIndex_ForDisplay']]
-        training_data = training_data.reset_index(drop=True)
-        self.X = training_data.values
-        self.y = training_data[['Susceptible', 'Infected']].values
+        file_path = self.data_config.processed_path
+        if self.data_config.processed_format == "csv":
+            data = pd.read_csv(file_path, usecols=FEATURE_COLUMNS)
+            self.X = data[FEATURE_COLUMNS].values
+        else:
+            # Memory-mapped view over the leading feature columns of the store, no parsing or copying
+            self.X = ColumnStore(file_path).load_matrix(FEATURE_COLUMNS)
+        self.y = self.X[:, :len(TARGET_COLUMNS)]
         return
 
     def split_data(self):
         shift = self.shift
         test_size = self.test_size
-        if not self.X:
+        if self.X is None:
             self._read_data()
         k = self.X.shape[0]
         train_size = 1 - test_size
@@ -94,47 +654,206 @@ class MultiGaussianRegression:
         self._logger.warn("Splitting data into training and testing sets...")
         self._logger.warn(f"Total data points: {k}")
         self._logger.warn(f"Selected training size: {train_size_selected}")
-        self.X_train = self.X[:train_size_selected, :]
-        self.y_train = self.y[shift:train_size_selected + shift, :]
-        self.X_test = self.X[train_size_selected + shift:k - shift, :]
-        self.y_test = self.y[train_size_selected + 2 * shift:k, :]
+        self.split_at(train_size_selected)
         self._logger.info("Data split completed.")
 
+    def split_at(self, origin, horizon=None, start=0):
+        # Targets lag the inputs by the data shift: X[t] is used to predict y[t + shift]
+        shift = self.shift
+        if self.X is None:
+            self._read_data()
+        k = self.X.shape[0]
+        end = k - shift if horizon is None else min(origin + shift + horizon, k - shift)
+        self.X_train = self.X[start:origin, :]
+        self.y_train = self.y[start + shift:origin + shift, :]
+        self.X_test = self.X[origin + shift:end, :]
+        self.y_test = self.y[origin + 2 * shift:end + shift, :]
+
     def construct_kernel(self):
         config = self.kernel_config
+        cache = self.kernel_cache
+        # The compact mode needs a kernel computing in float32
+        if config.fused or self.compact:
+            if config.type not in FUSED_KINDS:
+                raise ValueError("Unsupported kernel type")
+            if config.matern_nu not in FUSED_MATERN_NU:
+                raise ValueError(f"The fused kernel supports matern_nu in {FUSED_MATERN_NU}")
+            return FusedKernel(kind=config.type, length_scale=config.length_scale, length_scale2=config.length_scale2,
+                               constant_value=config.alpha, periodic_length_scale=config.length_scale_periodic,
+                               periodicity=config.periodicity, matern_length_scale=config.matern_length_scale,
+                               matern_nu=config.matern_nu, constant_value2=config.alpha2, cache=cache)
+        # Fixed components are wrapped by freeze() so that their Gram matrices are computed once per fit
         rbf1 = RBF(length_scale=config.length_scale, length_scale_bounds='fixed')
-        periodic = ExpSineSquared(length_scale=config.length_scale_periodic, periodicity=config.periodicity,
-                                  length_scale_bounds=(1e-08, 10000.0),
-                                  periodicity_bounds=(1e-08, 100000.0))
+        periodic = CachedExpSineSquared(length_scale=config.length_scale_periodic, periodicity=config.periodicity,
+                                        length_scale_bounds=(1e-08, 10000.0),
+                                        periodicity_bounds=(1e-08, 100000.0), cache=cache)
         rbf2 = RBF(length_scale=config.length_scale2, length_scale_bounds='fixed')
         constant = C(constant_value=config.alpha, constant_value_bounds='fixed')
         constant2 = C(constant_value=config.alpha2, constant_value_bounds=(10000, 1000000.0))
-        kernel1 = Product(rbf1, periodic)
-        kernel2 = Product(rbf2, constant)
+        kernel1 = Product(freeze(rbf1, cache), periodic)
+        kernel2 = freeze(Product(rbf2, constant), cache)
         kernel_base = Sum(kernel1, kernel2)
         if config.type == 'case1':
             kernel = kernel_base
         elif config.type == 'case2':
             kernel = Sum(kernel_base, constant2)
         elif config.type == 'case3':
-            matern = Matern(length_scale=config.matern_length_scale, nu=config.matern_nu,
-                            length_scale_bounds=(1000, 10000.0))
+            matern = CachedMatern(length_scale=config.matern_length_scale, nu=config.matern_nu,
+                                  length_scale_bounds=(1000, 10000.0), cache=cache)
             kernel_add = Sum(matern, constant2)
             kernel = Sum(kernel_base, kernel_add)
         else:
             raise ValueError("Unsupported kernel type")
         return kernel
 
-    def train(self):
-        if not self.X_train:
+    def _build_model(self, engine=None, kernel=None, n_jobs=None):
+        engine = engine or self.engine
+        kernel = kernel if kernel is not None else self.kernel
+        if engine == 'sparse':
+            return SparseGPR(kernel=kernel, n_inducing=self.inducing_points, noise=self.sparse_noise,
+                             noise_bounds=self.sparse_noise_bounds, gtol=self._gtol)
+        return GPR(kernel=kernel, gtol=self._gtol, n_restarts_optimizer=self.n_restarts,
+                   n_jobs=self.n_jobs if n_jobs is None else n_jobs, random_state=0, compact=self.compact,
+                   deadline=self._deadline, stall_patience=self.stall_patience, stall_tol=self.stall_tol)
+
+    def _build_per_output_model(self, engine=None):
+        thetas = self._output_thetas or [None] * len(TARGET_COLUMNS)
+        n_jobs = os.cpu_count() if self.n_jobs in (None, -1) else self.n_jobs
+        # Outputs that are fitted concurrently run their optimizer restarts serially
+        restart_jobs = 1 if min(n_jobs, len(thetas)) > 1 else self.n_jobs
+        estimators = [self._build_model(engine, self.kernel if theta is None else self.kernel.clone_with_theta(theta),
+                                        restart_jobs) for theta in thetas]
+        return MultiOutputGPR(estimators, n_jobs=self.n_jobs)
+
+    def fitted_theta(self):
+        if isinstance(self.model, MultiOutputGPR):
+            return [estimator.kernel_.theta.tolist() for estimator in self.model.estimators_]
+        return self.model.kernel_.theta.tolist()
+
+    def warm_start(self, theta):
+        """Starts the next fit from the given hyperparameters, as returned by ``fitted_theta``."""
+        if self.per_output:
+            self._output_thetas = theta
+        else:
+            self.kernel = self.kernel.clone_with_theta(theta)
+
+    def _memory_guard(self):
+        return MemoryGuard(n_theta=self.kernel.n_dims, engine=self.configured_engine,
+                           inducing_points=self.inducing_points, n_jobs=self.n_jobs, n_restarts=self.n_restarts,
+                           per_output=self.per_output, compact=self.compact, memory_budget_mb=self.memory_budget_mb,
+                           memory_fallback=self.memory_fallback, concurrent_fits=self.concurrent_fits)
+
+    def memory_estimate(self, engine=None, n_samples=None):
+        """Approximate peak memory (MB) of training ``engine`` on ``n_samples`` rows (by default the training set),
+        counting the fits that run concurrently."""
+        n_samples = self.X_train.shape[0] if n_samples is None else n_samples
+        return self._memory_guard().estimate(engine or self.engine, n_samples)
+
+    def select_engine(self, n_samples=None):
+        """The engine that training on ``n_samples`` rows (by default the training set) uses, see
+        ``MemoryGuard.select``."""
+        n_samples = self.X_train.shape[0] if n_samples is None else n_samples
+        return self._memory_guard().select(n_samples)
+
+    def _check_memory(self):
+        self.engine = self.select_engine()
+        estimate = self.memory_estimate()
+        if self.engine != self.configured_engine:
+            self._logger.warning(f"The {self.configured_engine} engine needs about "
+                                 f"{self.memory_estimate(self.configured_engine):.1f} MB, over the "
+                                 f"{self.memory_budget_mb / self.concurrent_fits:.1f} MB budget, switching to the "
+                                 f"{self.engine} engine ({estimate:.1f} MB)")
+        elif self.memory_budget_mb is None:
+            available = _available_memory_mb()
+            if available is not None and estimate > available / self.concurrent_fits:
+                self._logger.warning(f"Training the {self.engine} engine needs about {estimate:.1f} MB, more than the "
+                                     f"{available / self.concurrent_fits:.1f} MB available to it; set memory_budget_mb "
+                                     "to switch engines or fail before training")
+
+    def train(self, trace_file='optimizer_trace.json'):
+        if self.X_train is None:
             self.split_data()
-        self._logger.debug("Training the Gaussian Process Regressor model...")
-        self.model = GPR(kernel=self.kernel, gtol=self._gtol)
+        self._check_memory()
+        self._logger.debug(f"Training the Gaussian Process Regressor model ({self.engine} engine)...")
+        # One deadline for the whole fit, shared by the restarts and outputs however they are scheduled
+        self._deadline = None if self.time_budget is None else time.time() + self.time_budget
+        if self.time_budget is not None and self.engine == 'sparse':
+            self._logger.warning("The time budget only bounds the exact engine, the sparse fit is not limited")
+        self.model = self._build_per_output_model() if self.per_output else self._build_model()
+        trace = None
+        if self.trace:
+            if isinstance(self.model, GPR):
+                trace = self.model.trace = OptimizerTrace(callback=self.trace_callback)
+            else:
+                self._logger.warning("Optimizer tracing is only available for the exact single-model engine")
         self.model.fit(self.X_train, self.y_train)
+        estimators = getattr(self.model, 'estimators_', [self.model])
+        if any(getattr(estimator, 'float64_fallback_', False) for estimator in estimators):
+            self._logger.debug("The float32 kernel was ill-conditioned, the compact fit continued in float64")
+        self.budget_hit = any(getattr(estimator, 'stopped_', None) in BUDGET_STOPS for estimator in estimators)
+        if self.budget_hit:
+            reasons = sorted({estimator.stopped_ for estimator in estimators if estimator.stopped_ in BUDGET_STOPS})
+            self._logger.warning(f"Optimizer stopped early ({', '.join(reasons)}), the model uses the best "
+                                 "hyperparameters found")
+        if trace is not None:
+            trace.save(self.saving_dir / trace_file)
+            self._logger.debug(f"Optimizer trace saved to {self.saving_dir / trace_file}: {trace.n_calls} objective "
+                               f"calls, {trace.cholesky_failures} Cholesky failures")
+        if self.kernel_cache is not None:
+            self.kernel_cache.clear()
+        self._reference_lml = self.model.log_marginal_likelihood_value_ / self.X_train.shape[0]
+        self._predictions.clear()
         self._logger.info("Model training completed.")
 
-    def predict(self, metrics_file='metrics.json', predictions_file='predictions.json'):
-        y_pred, sigma = self.model.predict(self.X_test, return_std=True)
+    def update(self, new_X, new_y):
+        """Adds new (already shift-aligned) observations to the training set of the fitted model.
+
+        The exact engine is updated in place with fixed hyperparameters. When the per-point log marginal
+        likelihood drifts from the last optimized fit by more than ``update_drift`` (relative), or for the
+        sparse engine, the model is re-optimized, starting from the current hyperparameters.
+        """
+        new_X = np.atleast_2d(new_X)
+        new_y = np.asarray(new_y).reshape(new_X.shape[0], -1)
+        self.X_train = np.concatenate([self.X_train, new_X])
+        self.y_train = np.concatenate([self.y_train, new_y])
+        if self.engine == 'exact':
+            self.model.update(new_X, new_y)
+            self._predictions.clear()
+            lml = self.model.log_marginal_likelihood_value_ / self.X_train.shape[0]
+            drift = abs(lml - self._reference_lml) / abs(self._reference_lml)
+            self._logger.debug(f"Updated model with {new_X.shape[0]} observations, likelihood drift {drift:.4f}")
+            if self.update_drift is None or drift <= self.update_drift:
+                return False
+        self._logger.info("Re-optimizing the model hyperparameters...")
+        self.warm_start(self.fitted_theta())
+        self.train()
+        return True
+
+    def predict_with_std(self, X, model=None):
+        """Predictive mean and standard deviation, computed in chunks of ``predict_chunk_size`` rows so that the
+        cross-covariance and the triangular solve stay memory-bounded. Results of the trained model are memoized
+        for the ``PREDICTION_MEMO_SIZE`` most recent inputs until it is retrained or updated."""
+        if X.shape[0] == 0:
+            empty = np.empty((0, len(TARGET_COLUMNS)))
+            return empty, empty.copy()
+        memoize = model is None
+        model = model if model is not None else self.model
+        key = array_digest(X)
+        if memoize and key in self._predictions:
+            self._predictions.move_to_end(key)
+            return self._predictions[key]
+        chunks = [model.predict(X[i:i + self.predict_chunk_size], return_std=True)
+                  for i in range(0, X.shape[0], self.predict_chunk_size)]
+        y_pred = np.concatenate([chunk[0] for chunk in chunks])
+        sigma = np.concatenate([chunk[1] for chunk in chunks])
+        if memoize:
+            self._predictions[key] = (y_pred, sigma)
+            if len(self._predictions) > PREDICTION_MEMO_SIZE:
+                self._predictions.popitem(last=False)
+        return y_pred, sigma
+
+    def evaluate(self, model=None):
+        y_pred, sigma = self.predict_with_std(self.X_test, model)
         mse = mean_squared_error(self.y_test, y_pred)
         rmse = np.sqrt(mse)
         mae = mean_absolute_error(self.y_test, y_pred)
@@ -142,22 +861,28 @@ class MultiGaussianRegression:
         # Calculate MAPE (Mean Absolute Percentage Error)
         mape = np.mean(np.abs((self.y_test - y_pred) / self.y_test)) * 100
 
-        lower_bound = y_pred - 1.96 * sigma
-        upper_bound = y_pred + 1.96 * sigma
-
         metrics = {
             "Root Mean Squared Error": rmse,
             "Mean Absolute Error": mae,
             "R-squared": r2,
             "Mean Absolute Percentage Error": mape
         }
+        return metrics, y_pred, sigma
+
+    def predict(self, metrics_file='metrics.json', predictions_file='predictions.json'):
+        metrics, y_pred, sigma = self.evaluate()
+
+        lower_bound = y_pred - 1.96 * sigma
+        upper_bound = y_pred + 1.96 * sigma
+
         # self._logger.info(self.model.kernel_)
-        self._logger.info("R-squared: %f", r2)
-        self._logger.info("Mean Absolute Percentage Error: %f%%", mape)
+        self._logger.info("R-squared: %f", metrics["R-squared"])
+        self._logger.info("Mean Absolute Percentage Error: %f%%", metrics["Mean Absolute Percentage Error"])
 
         # self._logger.info("95%% Prediction Interval (Lower Bound): %s", str(lower_bound))
         # self._logger.info("95%% Prediction Interval (Upper Bound): %s", str(upper_bound))
 
+        metrics["Budget hit"] = self.budget_hit
         metrics_filename = self.saving_dir / metrics_file
         with open(metrics_filename, 'w') as f:
             json.dump(metrics, f, indent=4)
@@ -172,46 +897,63 @@ class MultiGaussianRegression:
             json.dump(predictions, f, indent=4)
         return
 
+    def compare_engines(self, report_file='engine_comparison.json'):
+        if self.X_train is None:
+            self.split_data()
+        report = {}
+        predictions = {}
+        for engine in ENGINES:
+            model = self._build_per_output_model(engine) if self.per_output else self._build_model(engine)
+            start = time.perf_counter()
+            model.fit(self.X_train, self.y_train)
+            fit_time = time.perf_counter() - start
+            start = time.perf_counter()
+            metrics, predictions[engine], _ = self.evaluate(model)
+            report[engine] = {**metrics, "Fit time (s)": fit_time, "Predict time (s)": time.perf_counter() - start}
+            self._logger.info(f"{engine} engine: R-squared {metrics['R-squared']:.4f}, fit time {fit_time:.2f}s")
+        report['sparse']['Inducing points'] = self.inducing_points
+        # Counts below one person would blow the relative deviation up, or divide by zero
+        deviation = np.abs(predictions['sparse'] - predictions['exact'])
+        report['Max relative deviation of sparse from exact predictions'] = float(
+            np.max(deviation / np.maximum(np.abs(predictions['exact']), 1.0)))
+        report_filename = self.saving_dir / report_file
+        with open(report_filename, 'w') as f:
+            json.dump(report, f, indent=4)
+        return report
+
     def save_model(self, filename='model.pkl'):
         model_path = self.saving_dir / filename
         joblib.dump(self.model, model_path)
         return
 
-    def plot_predictions(self, plot_filename='predictions_plot.png', show=False):
-        y_mean, y_std = self.model.predict(self.X_test, return_std=True)
-        plot_map = ((0, "Susceptible"), (1, "Infected"))
-        fig, axs = plt.subplots(figsize=(10, 6), ncols=len(plot_map), sharex=True)
-        test_size = np.arange(self.y_test[:, 0].shape[0])
-        for item in plot_map:
-            i = item[0]
-            _y_test = self.y_test[:, i]
-            _y_std = y_std[:, i]
-            _y_mean = y_mean[:, i]
-            ax = axs[i]
-            ax.scatter(test_size, _y_test, s=1, zorder=20)
-            ax.plot(test_size, _y_test, label="Actual", color="blue", alpha=0.5)
-            ax.plot(test_size, _y_mean, label="Predicted", color="orange")
-            # Add a shaded region for uncertainty
-            ax.fill_between(test_size, _y_mean + 3 * _y_std, _y_mean - 3 * _y_std, alpha=0.8)
-
-            ax.set_ylabel(f"#{item[1]}")
-        handles, labels = axs[-1].get_legend_handles_labels()
+    def export_model(self, dirname='model'):
+        """Writes the compact artifact read by ``scripts.artifact.load_artifact``."""
+        artifact_path = save_artifact(self.model, self.saving_dir / dirname, engine=self.engine,
+                                      feature_columns=FEATURE_COLUMNS, target_columns=TARGET_COLUMNS,
+                                      data_shift=self.shift, budget_hit=self.budget_hit)
+        self._logger.debug(f"Model artifact saved to {artifact_path}")
+        return artifact_path
 
-        _plot_state_name = self.data_config.state_name if self.data_config.state_name else self.data_config.country
-        fig.suptitle(f"Prediction results for {_plot_state_name} "
-                     f"between {self.data_config.start_date} and {self.data_config.end_date} \n "
-                     f"$R^2$: {np.round(self.model.score(self.X_test, self.y_test), 3)} \n std={_y_std.max():0.4f}")
-        fig.supxlabel('Day')
-        fig.legend(handles, labels, ncol=2)
+    def load_model(self, dirname='model'):
+        """Predicts with the NumPy-only predictor of an exported artifact instead of training."""
+        artifact_path = self.saving_dir / dirname
+        if not artifact_path.exists():
+            raise FileNotFoundError(f"No model artifact in {artifact_path}, train the model first")
+        self.model = load_artifact(artifact_path)
+        self.budget_hit = bool(self.model.meta.get('budget_hit', False))
+        self._predictions.clear()
+        return self.model
 
+    def plot_predictions(self, plot_filename='predictions_plot.png', show=False):
+        y_mean, y_std = self.predict_with_std(self.X_test)
+        _plot_state_name = self.data_config.state_name if self.data_config.state_name else self.data_config.country
+        title = (f"Prediction results for {_plot_state_name} "
+                 f"between {self.data_config.start_date} and {self.data_config.end_date} \n "
+                 f"$R^2$: {np.round(r2_score(self.y_test, y_mean), 3)} \n std={y_std[:, -1].max():0.4f}")
         save_file = self.saving_dir / plot_filename
-        plt.tight_layout()
-        if save_file:
-            plt.savefig(save_file, dpi=500)
-            self._logger.debug(f"Plot saved to {save_file}")
-        if show:
-            plt.show()
-        return
+        return render_queue(self.plot_config).submit(render_predictions, save_file, show=show,
+                                                     y_test=np.asarray(self.y_test), y_mean=y_mean, y_std=y_std,
+                                                     title=title)
 
 
 if __name__ == "__main__":
@@ -222,4 +964,5 @@ if __name__ == "__main__":
     regressor.train()
     regressor.predict()
     regressor.save_model("covid_regression_model.pkl")
+    regressor.export_model()
     regressor.plot_predictions()
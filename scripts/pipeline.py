@@ -0,0 +1,271 @@
+from dataclasses import dataclass
+from pathlib import Path
+import hashlib
+import importlib
+import json
+import logging
+import os
+import shutil
+import time
+
+ROOT_DIR = Path(__file__).parent.parent
+MANIFEST_FILE = "pipeline.json"
+# Settings that change how a stage runs but not what it produces
+OPERATIONAL_KEYS = {
+    'data': {'logging', 'offline', 'mirror_dir', 'url_prefix', 'cache_dir', 'cache_size_mb', 'download_concurrency',
+             'download_retries', 'download_timeout', 'incremental'},
+    # A fit stopped by its time budget is never memoized, so the budget does not change a recorded model
+    'model': {'logging', 'n_jobs', 'trace', 'predict_chunk_size', 'results_dir', 'update_drift', 'time_budget',
+              'stall_patience', 'stall_tol', 'concurrent_fits'},
+    'kernel': set(),
+    'plot': {'background', 'n_jobs', 'skip_unchanged'},
+}
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    sections: tuple = ()
+    upstream: tuple = ()
+    modules: tuple = ()
+
+
+STAGES = (
+    Stage('fetch', sections=('data',), modules=('scripts.dataloader',)),
+    Stage('train', sections=('model', 'kernel'), upstream=('fetch',), modules=('scripts.model_training',)),
+    Stage('predict', upstream=('train',), modules=('scripts.model_training',)),
+    Stage('plot', sections=('plot',), upstream=('fetch', 'predict'),
+          modules=('scripts.dataloader', 'scripts.model_training', 'matplotlib.pyplot', 'seaborn')),
+)
+STAGE_NAMES = tuple(stage.name for stage in STAGES)
+DEFAULT_IMPORT_BUDGET = {'fetch': 1.0, 'train': 3.0, 'predict': 3.0, 'plot': 5.0}
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def trained_model_dir(saving_dir):
+    """Artifact of the model the pipeline last trained or reused in ``saving_dir``, None if there is none."""
+    try:
+        with open(Path(saving_dir) / MANIFEST_FILE, 'r') as f:
+            entry = json.load(f).get('train')
+    except (OSError, ValueError):
+        return None
+    if not entry or not Path(entry['outputs'][-1]).is_dir():
+        return None
+    return Path(entry['outputs'][-1])
+
+
+class Pipeline:
+    """Runs the stages of ``main.py`` as a DAG, importing the modules of a stage only when it runs.
+
+    Every stage is keyed by a digest of the config sections it reads and of the outputs of its upstream
+    stages (for ``fetch`` the processed dataset itself). A stage whose key matches the one recorded in
+    ``pipeline.json`` and whose outputs still exist is skipped, so changing a kernel parameter reuses the
+    processed data and changing plot settings reuses the trained model. Trained models are stored under
+    ``models/<key>`` and switching back to an earlier configuration reuses them, as long as all their files are
+    there, and makes them the model of the manifest's ``train`` entry again; only the ``keep_models`` most
+    recently used ones (``cli`` section, null keeps all) are kept.
+
+    ``time_budget`` (seconds, in the ``cli`` section) bounds a whole run: the train stage gets what is left
+    of it, or its own ``model.time_budget`` if that is smaller. A model whose optimizer was stopped by a budget
+    is used but neither it nor the stages using it are recorded, so the next run fits it again.
+    """
+
+    def __init__(self, config, force=False):
+        self.config = config
+        self.force = force
+        cli_config = config.get('cli') or {}
+        self.import_budget = {**DEFAULT_IMPORT_BUDGET, **cli_config.get('import_budget', {})}
+        time_budget = cli_config.get('time_budget')
+        self.time_budget = None if time_budget is None else float(time_budget)
+        keep_models = cli_config.get('keep_models', 5)
+        self.keep_models = None if keep_models is None else max(1, int(keep_models))
+        self._deadline = None
+        self._logger = logging.getLogger(__name__)
+        self._regressor = None
+        self._data_loader = None
+        self.keys = {}
+        self.outputs = {}
+
+    @property
+    def saving_dir(self):
+        from .base_dataloader import CovidData
+        save_dir = CovidData(**self.config['data']).save_dir
+        return Path(self.config['model'].get('results_dir') or ROOT_DIR / "results") / save_dir[:-4]
+
+    @property
+    def manifest_path(self):
+        return self.saving_dir / MANIFEST_FILE
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stage_key(self, stage):
+        sections = {section: {name: value for name, value in (self.config.get(section) or {}).items()
+                              if name not in OPERATIONAL_KEYS.get(section, ())}
+                    for section in stage.sections}
+        return _digest({'stage': stage.name, 'sections': sections,
+                        'upstream': [self.keys[name] for name in stage.upstream]})
+
+    def _import(self, stage):
+        start = time.perf_counter()
+        for name in stage.modules:
+            importlib.import_module(name)
+        elapsed = time.perf_counter() - start
+        budget = self.import_budget.get(stage.name)
+        if budget is not None and elapsed > budget:
+            self._logger.warning(f"Imports of the {stage.name} stage took {elapsed:.2f}s, "
+                                 f"over the {budget:.2f}s budget")
+        else:
+            self._logger.debug(f"Imports of the {stage.name} stage took {elapsed:.2f}s")
+
+    @property
+    def data_loader(self):
+        if self._data_loader is None:
+            from .dataloader import CountryDataLoader
+            self._data_loader = CountryDataLoader(self.config)
+        return self._data_loader
+
+    @property
+    def regressor(self):
+        if self._regressor is None:
+            from .model_training import MultiGaussianRegression
+            self._regressor = MultiGaussianRegression(**self.config)
+        return self._regressor
+
+    def _model_dir(self):
+        return Path("models") / self.keys['train']
+
+    def _train_outputs(self):
+        model_dir = self.saving_dir / self._model_dir()
+        return [str(model_dir / "covid_regression_model.pkl"), str(model_dir / "model")]
+
+    def _prune_models(self):
+        models_dir = self.saving_dir / "models"
+        if self.keep_models is None or not models_dir.is_dir():
+            return
+        current = self.saving_dir / self._model_dir()
+        if current.is_dir():
+            # Reusing a model counts as using it
+            os.utime(current)
+        model_dirs = sorted((path for path in models_dir.iterdir() if path.is_dir()),
+                            key=lambda path: (path != current, -path.stat().st_mtime))
+        for path in model_dirs[self.keep_models:]:
+            shutil.rmtree(path, ignore_errors=True)
+            self._logger.debug(f"Removed unused model {path.name}")
+
+    def _fitted_regressor(self):
+        regressor = self.regressor
+        if regressor.X_test is None:
+            regressor.split_data()
+        if regressor.model is None:
+            regressor.load_model(self._model_dir() / "model")
+        return regressor
+
+    def _data_digest(self):
+        from .base_dataloader import CovidData
+        data_config = CovidData(**self.config['data'])
+        path = data_config.processed_path
+        meta_path = path if data_config.processed_format == "csv" else path / "meta.json"
+        if not meta_path.is_file():
+            return None
+        return hashlib.sha256(meta_path.read_bytes()).hexdigest()[:16]
+
+    def fetch(self):
+        self.data_loader.load_data()
+        return [str(self.data_loader.processed_path)]
+
+    def train(self):
+        regressor = self.regressor
+        if self._deadline is not None:
+            remaining = max(0.0, self._deadline - time.time())
+            if regressor.time_budget is None or remaining < regressor.time_budget:
+                regressor.time_budget = remaining
+        regressor.train()
+        model_dir = self._model_dir()
+        (regressor.saving_dir / model_dir).mkdir(parents=True, exist_ok=True)
+        regressor.save_model(str(model_dir / "covid_regression_model.pkl"))
+        regressor.export_model(str(model_dir / "model"))
+        return self._train_outputs()
+
+    def predict(self):
+        regressor = self._fitted_regressor()
+        regressor.predict()
+        return [str(regressor.saving_dir / "metrics.json"), str(regressor.saving_dir / "predictions.json")]
+
+    def plot(self):
+        data_loader = self.data_loader
+        if data_loader.data is None:
+            data_loader.load_data()
+        data_loader.plot_policies(prefix='Index_SimpleAverage')
+        data_loader.plot_sir()
+        self._fitted_regressor().plot_predictions()
+        from .plotting import wait_renders
+        wait_renders()
+        prefix = data_loader.plots_saving_dir / data_loader.file_name[:-4]
+        return [f"{prefix}_Index_SimpleAverage_data.png", f"{prefix}_sir_data.png",
+                str(self.regressor.saving_dir / "predictions_plot.png")]
+
+    def _up_to_date(self, stage, key, manifest):
+        if self.force:
+            return False
+        if stage.name == 'train':
+            # Models are stored by key, so any configuration trained before is reused unless its fit was cut short
+            # or some of its files are gone
+            from .artifact import artifact_files
+            model_file, artifact_dir = self._train_outputs()
+            try:
+                meta, files = artifact_files(artifact_dir)
+            except (OSError, ValueError, KeyError):
+                return False
+            return not meta.get('budget_hit', False) and all(path.exists() for path in files + [Path(model_file)])
+        entry = manifest.get(stage.name)
+        return entry is not None and entry['key'] == key and all(Path(output).exists() for output in entry['outputs'])
+
+    def run(self, stages=STAGE_NAMES):
+        """Runs the requested stages in DAG order; stages that were not requested only provide their keys."""
+        manifest = self._read_manifest()
+        self._deadline = None if self.time_budget is None else time.time() + self.time_budget
+        for stage in STAGES:
+            key = self.keys[stage.name] = self.stage_key(stage)
+            if stage.name in stages:
+                if self._up_to_date(stage, key, manifest):
+                    self._logger.info(f"Stage {stage.name} is up to date, skipping")
+                    if stage.name == 'train' and manifest.get('train', {}).get('key') != key:
+                        # A model trained earlier is reused, the manifest points to the current one
+                        self.outputs[stage.name] = self._train_outputs()
+                        self._record(stage, key)
+                else:
+                    self._run_stage(stage, key)
+                if stage.name == 'train':
+                    self._prune_models()
+            if stage.name == 'fetch':
+                # Downstream stages depend on the processed dataset itself, not only on the data settings
+                self.keys[stage.name] = _digest({'config': key, 'data': self._data_digest()})
+
+    def _run_stage(self, stage, key):
+        self._import(stage)
+        self._logger.info(f"Running stage {stage.name}...")
+        self.outputs[stage.name] = getattr(self, stage.name)()
+        self._record(stage, key)
+
+    def _record(self, stage, key):
+        manifest = self._read_manifest()
+        if self._regressor is not None and self._regressor.budget_hit:
+            # An earlier entry with the same key would describe outputs that were just overwritten
+            manifest.pop(stage.name, None)
+            self._logger.info(f"Stage {stage.name} used a model fitted within its time budget, not recording it")
+        else:
+            manifest[stage.name] = {'key': key, 'outputs': self.outputs[stage.name],
+                                    'finished': time.strftime('%Y-%m-%d %H:%M:%S')}
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,170 @@
+from .utils import *
+from concurrent.futures import ProcessPoolExecutor
+import atexit
+import hashlib
+import os
+import pickle
+import threading
+
+_HASHES_FILE = ".render_hashes.json"
+
+
+def _init_render_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    logging.getLogger("matplotlib").setLevel(logging.WARNING)
+
+
+def _finish(fig, path, dpi, show):
+    fig.savefig(path, dpi=dpi)
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def render_sir(path, dpi, susceptible, infected, title, show=False):
+    colors = ["purple", "crimson", "darkblue"]
+    formatted_dates = np.arange(len(susceptible))
+    fig, axs = plt.subplots(1, 2, figsize=(20, 8))
+    axs[0].plot(formatted_dates, susceptible, label='Susceptible', color=colors[0], linewidth=2)
+    axs[1].plot(formatted_dates, infected, label='Infected', color=colors[1], linewidth=2)
+    for _ax in axs:
+        _ax.set_facecolor((232 / 255, 232 / 255, 232 / 256))
+        _ax.set_xlabel('Day')
+        _ax.grid(True)
+    xticks_first_subplot = axs[0].get_xticks()[1:]
+    axs[0].set_title('Susceptible')
+    axs[1].set_xticks(xticks_first_subplot)
+    axs[1].set_title('Infected')
+    fig.suptitle(title)
+    _finish(fig, path, dpi, show)
+
+
+def render_policies(path, dpi, viz, n_colors, ncol, title, show=False):
+    custom_palette = sns.color_palette("Set3", n_colors=n_colors)
+    fig, ax = plt.subplots(figsize=(16, 4))
+    viz.plot(kind='bar', ax=ax, color=custom_palette)
+    ax.legend(ncol=ncol)
+    plt.xticks(rotation=45)
+    fig.suptitle(title)
+    plt.tight_layout()
+    _finish(fig, path, dpi, show)
+
+
+def render_predictions(path, dpi, y_test, y_mean, y_std, title, show=False):
+    plot_map = ((0, "Susceptible"), (1, "Infected"))
+    fig, axs = plt.subplots(figsize=(10, 6), ncols=len(plot_map), sharex=True)
+    test_size = np.arange(y_test[:, 0].shape[0])
+    for i, name in plot_map:
+        ax = axs[i]
+        ax.scatter(test_size, y_test[:, i], s=1, zorder=20)
+        ax.plot(test_size, y_test[:, i], label="Actual", color="blue", alpha=0.5)
+        ax.plot(test_size, y_mean[:, i], label="Predicted", color="orange")
+        # Add a shaded region for uncertainty
+        ax.fill_between(test_size, y_mean[:, i] + 3 * y_std[:, i], y_mean[:, i] - 3 * y_std[:, i], alpha=0.8)
+        ax.set_ylabel(f"#{name}")
+    handles, labels = axs[-1].get_legend_handles_labels()
+    fig.suptitle(title)
+    fig.supxlabel('Day')
+    fig.legend(handles, labels, ncol=2)
+    plt.tight_layout()
+    _finish(fig, path, dpi, show)
+
+
+class RenderQueue:
+    """Renders figures off the critical path.
+
+    With ``background`` set, figures are drawn by a process pool on the non-interactive Agg backend and
+    ``submit`` returns immediately. A digest of the render function, resolution and inputs is kept next to
+    every figure, so a figure whose inputs did not change is not rendered again (``skip_unchanged``).
+    """
+
+    def __init__(self, background=True, n_jobs=1, dpi=500, skip_unchanged=True):
+        self.background = background
+        self.n_jobs = n_jobs
+        self.dpi = dpi
+        self.skip_unchanged = skip_unchanged
+        self._executor = None
+        self._futures = []
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+
+    def _digest(self, render, inputs):
+        content = pickle.dumps((render.__name__, self.dpi, sorted(inputs.items())), protocol=4)
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def _read_hashes(directory):
+        try:
+            with open(directory / _HASHES_FILE, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store_digest(self, path, digest):
+        with self._lock:
+            hashes = self._read_hashes(path.parent)
+            hashes[path.name] = digest
+            tmp_path = path.parent / f"{_HASHES_FILE}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(hashes, f, indent=4)
+            os.replace(tmp_path, path.parent / _HASHES_FILE)
+
+    def submit(self, render, path, show=False, **inputs):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        digest = self._digest(render, inputs)
+        if self.skip_unchanged and not show and path.exists() \
+                and self._read_hashes(path.parent).get(path.name) == digest:
+            self._logger.debug(f"Plot {path} is up to date.")
+            return None
+        if show or not self.background:
+            render(path, self.dpi, show=show, **inputs)
+            self._store_digest(path, digest)
+            self._logger.debug(f"Plot saved to {path}")
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_render_worker)
+            atexit.register(self.close)
+        future = self._executor.submit(render, path, self.dpi, **inputs)
+
+        def done(future):
+            if future.exception() is None:
+                self._store_digest(path, digest)
+                self._logger.debug(f"Plot saved to {path}")
+
+        future.add_done_callback(done)
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """Blocks until every submitted figure is written, re-raising rendering errors."""
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_queues = {}
+
+
+def render_queue(config=None):
+    """Process-wide queue for the ``plot`` section of the parameters, shared by the loaders and models."""
+    config = config or {}
+    settings = (bool(config.get('background', True)), int(config.get('n_jobs', 1)), int(config.get('dpi', 500)),
+                bool(config.get('skip_unchanged', True)))
+    if settings not in _queues:
+        _queues[settings] = RenderQueue(*settings)
+    return _queues[settings]
+
+
+def wait_renders():
+    for queue in _queues.values():
+        queue.wait()
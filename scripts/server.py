@@ -0,0 +1,334 @@
+from .base_dataloader import CovidData
+from .dataloader import region_config
+from .model_training import MultiGaussianRegression
+from .pipeline import trained_model_dir
+from .store import ColumnStore
+from .utils import *
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+POLICY_COLUMNS = [column for column in FEATURE_COLUMNS if column not in TARGET_COLUMNS]
+
+
+@dataclass
+class ServerSpec:
+    host: str = "127.0.0.1"
+    port: int = 8765
+    capacity: int = 16
+    model_dir: str = "model"
+    batch_window_ms: float = 2.0
+    max_batch_rows: int = 2048
+    latency_window: int = 10000
+
+
+class RequestError(ValueError):
+    pass
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent what-if queries are what micro-batching is for, so do not refuse them at accept
+    request_queue_size = 128
+
+
+class _Slot:
+    def __init__(self, X):
+        self.X = X
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Merges concurrent ``submit`` calls into one ``predict`` call.
+
+    The first request reaching an empty queue leads the batch: it waits up to ``window`` seconds (or until
+    ``max_rows`` rows are queued) for other requests, predicts all their rows at once and hands every request
+    its slice of the result. No background thread is needed and a lone request only pays the window.
+    """
+
+    def __init__(self, predict, window=0.002, max_rows=2048, batch_sizes=None):
+        self.predict = predict
+        self.window = window
+        self.max_rows = max_rows
+        self._condition = threading.Condition()
+        self._pending = []
+        self._rows = 0
+        self.batch_sizes = batch_sizes if batch_sizes is not None else deque(maxlen=10000)
+
+    def submit(self, X):
+        slot = _Slot(X)
+        with self._condition:
+            self._pending.append(slot)
+            self._rows += X.shape[0]
+            leader = len(self._pending) == 1
+            self._condition.notify_all()
+            if leader:
+                self._condition.wait_for(lambda: self._rows >= self.max_rows, timeout=self.window)
+                batch, self._pending, self._rows = self._pending, [], 0
+        if leader:
+            self._run(batch)
+        slot.done.wait()
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def _run(self, batch):
+        try:
+            y_mean, y_std = self.predict(np.concatenate([slot.X for slot in batch]))
+            start = 0
+            for slot in batch:
+                end = start + slot.X.shape[0]
+                slot.result = (y_mean[start:end], y_std[start:end])
+                start = end
+        except Exception as e:
+            for slot in batch:
+                slot.error = e
+        finally:
+            self.batch_sizes.append(len(batch))
+            for slot in batch:
+                slot.done.set()
+
+
+class RegionModel:
+    """A trained model with the processed data of its region, answering policy scenarios."""
+
+    def __init__(self, regressor, dates, batcher_options):
+        self.regressor = regressor
+        self.dates = pd.DatetimeIndex(pd.to_datetime(dates))
+        self.batcher = MicroBatcher(lambda X: regressor.predict_with_std(X, model=regressor.model), **batcher_options)
+
+    @staticmethod
+    def artifact_dir(saving_dir, model_dir):
+        """The most recent of the pipeline's current model and the ``model_dir`` artifact written by the batch
+        trainer."""
+        candidates = [path for path in (trained_model_dir(saving_dir), Path(saving_dir) / model_dir)
+                      if path is not None and (path / "meta.json").exists()]
+        if not candidates:
+            raise FileNotFoundError(f"No model artifact in {saving_dir}, train the model first")
+        return max(candidates, key=lambda path: (path / "meta.json").stat().st_mtime)
+
+    @classmethod
+    def load(cls, config, model_dir, batcher_options):
+        regressor = MultiGaussianRegression(**config)
+        regressor.load_model(cls.artifact_dir(regressor.saving_dir, model_dir))
+        regressor._read_data()
+        data_config = regressor.data_config
+        if data_config.processed_format == "csv":
+            dates = pd.read_csv(data_config.processed_path, index_col=0, usecols=[0]).index
+        else:
+            dates = ColumnStore(data_config.processed_path).index
+        return cls(regressor, dates, batcher_options)
+
+    def scenario(self, policies, rows=1):
+        """The last ``rows`` observed inputs with the policy indices replaced by ``policies``, each a value or a
+        list of ``rows`` values."""
+        X = np.array(self.regressor.X[-rows:], dtype=np.float64)
+        for column, value in policies.items():
+            if column not in POLICY_COLUMNS:
+                raise RequestError(f"Unknown policy index {column}, expected one of {POLICY_COLUMNS}")
+            value = np.asarray(value, dtype=np.float64)
+            if value.ndim > 1 or value.size not in (1, X.shape[0]):
+                raise RequestError(f"{column} must be a number or a list of {X.shape[0]} numbers")
+            X[:, FEATURE_COLUMNS.index(column)] = value
+        return X
+
+    def forecast(self, policies, rows=1):
+        rows = int(rows)
+        if not 1 <= rows <= len(self.dates):
+            raise RequestError(f"rows must be between 1 and {len(self.dates)}")
+        y_mean, y_std = self.batcher.submit(self.scenario(policies, rows))
+        # X[t] predicts the targets data_shift days later
+        dates = self.dates[-rows:] + pd.Timedelta(days=self.regressor.shift)
+        return {"dates": dates.strftime('%Y-%m-%d').tolist(), "columns": TARGET_COLUMNS,
+                "mean": y_mean.tolist(), "std": y_std.tolist()}
+
+
+class ModelRegistry:
+    """Keeps up to ``capacity`` region models in memory, evicting the least recently used one.
+
+    Models are loaded outside the registry lock, so a cold load only delays the requests for that region;
+    concurrent requests for a region that is being loaded wait for the same load.
+    """
+
+    def __init__(self, config, spec: ServerSpec):
+        self.config = config
+        self.spec = spec
+        self._models = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.batch_sizes = deque(maxlen=spec.latency_window)
+
+    def region_config(self, region):
+        if isinstance(region, str):
+            region = {"state_name": region}
+        if not isinstance(region, dict):
+            raise RequestError("region must be a state name or a dict of data settings")
+        return region_config(self.config, region)
+
+    def get(self, region):
+        config = self.region_config(region)
+        key = CovidData(**config['data']).save_dir
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key]
+            self.misses += 1
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            return loading.result()
+        try:
+            model = RegionModel.load(config, self.spec.model_dir,
+                                     {'window': self.spec.batch_window_ms / 1000,
+                                      'max_rows': self.spec.max_batch_rows, 'batch_sizes': self.batch_sizes})
+        except Exception as e:
+            error = RequestError(str(e)) if isinstance(e, FileNotFoundError) else e
+            with self._lock:
+                del self._loading[key]
+            loading.set_exception(error)
+            raise error
+        with self._lock:
+            del self._loading[key]
+            self._models[key] = model
+            while len(self._models) > self.spec.capacity:
+                self._models.popitem(last=False)
+                self.evictions += 1
+        loading.set_result(model)
+        return model
+
+    def stats(self):
+        with self._lock:
+            batch_sizes = list(self.batch_sizes)
+            return {"loaded": [key[:-4] for key in self._models], "capacity": self.spec.capacity,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "mean_batch_requests": float(np.mean(batch_sizes)) if batch_sizes else None,
+                    "max_batch_requests": max(batch_sizes) if batch_sizes else None}
+
+
+class LatencyStats:
+    def __init__(self, window=10000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.count += 1
+            self.errors += error
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            summary = {"count": self.count, "errors": self.errors}
+        if latencies.size:
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            summary.update({"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "max_ms": float(latencies.max())})
+        return summary
+
+
+class ForecastServer:
+    """Serves forecasts of trained models over HTTP.
+
+    ``POST /forecast`` with ``{"region": "Texas", "policies": {"StringencyIndex_WeightedAverage": 40}, "rows": 7}``
+    predicts the targets ``data_shift`` days after each of the last ``rows`` observed days with the given policy
+    indices. Models are the artifacts written by ``export_model``, the current model of the pipeline
+    (``models/<key>/model``) or ``model_dir`` written by the batch trainer, whichever is newer, loaded on first
+    use. ``GET /stats`` reports latency percentiles, batching and the registry, and ``GET /health`` answers
+    when the server is up.
+    """
+
+    def __init__(self, config, spec=None):
+        self.config = config
+        self.spec = spec if spec is not None else ServerSpec(**config.get('server', {}))
+        self.registry = ModelRegistry(config, self.spec)
+        self.latency = LatencyStats(self.spec.latency_window)
+        self._logger = set_logger(level=logging.INFO)
+        self._httpd = None
+
+    def forecast(self, request):
+        if not isinstance(request, dict) or 'region' not in request:
+            raise RequestError("Expected a JSON object with a region")
+        policies = request.get('policies') or {}
+        if not isinstance(policies, dict):
+            raise RequestError("policies must map policy indices to values")
+        model = self.registry.get(request['region'])
+        return {"region": request['region'], **model.forecast(policies, request.get('rows', 1))}
+
+    def stats(self):
+        return {"forecast": self.latency.summary(), "models": self.registry.stats()}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body):
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._reply(200, {"status": "ok"})
+                elif self.path == "/stats":
+                    self._reply(200, server.stats())
+                else:
+                    self._reply(404, {"error": f"Unknown path {self.path}"})
+
+            def do_POST(self):
+                if self.path != "/forecast":
+                    self._reply(404, {"error": f"Unknown path {self.path}"})
+                    return
+                start = time.perf_counter()
+                status, error = 200, False
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = server.forecast(json.loads(self.rfile.read(length) or b"{}"))
+                except (RequestError, ValueError) as e:
+                    status, error, body = 400, True, {"error": str(e)}
+                except Exception as e:
+                    server._logger.exception("Forecast failed")
+                    status, error, body = 500, True, {"error": repr(e)}
+                server.latency.record(time.perf_counter() - start, error)
+                self._reply(status, body)
+
+            def log_message(self, format, *args):
+                server._logger.debug(format % args)
+
+        return Handler
+
+    def serve_forever(self):
+        self._httpd = _HTTPServer((self.spec.host, self.spec.port), self._handler())
+        self._logger.info(f"Serving forecasts on http://{self.spec.host}:{self._httpd.server_port}")
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def shutdown(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+
+
+if __name__ == "__main__":
+    PARAMS_DIR = ROOT_DIR / "params.yml"
+    with open(PARAMS_DIR, "r") as config_file:
+        config_data = yaml.safe_load(config_file)
+    ForecastServer(config_data).serve_forever()
@@ -0,0 +1,173 @@
+from scipy import optimize
+from scipy.linalg import cho_solve, cholesky, solve_triangular
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+import numpy as np
+
+
+class SparseGPR(RegressorMixin, BaseEstimator):
+    """Inducing-point Gaussian process regression (Titsias' variational approximation).
+
+    ``n_inducing`` training inputs, spread evenly over the (chronologically ordered) training set, act as
+    inducing points. Hyperparameters of any scikit-learn kernel and the noise variance (unless ``noise_bounds``
+    is ``"fixed"``) maximise the variational lower bound of the log marginal likelihood and predictions use the
+    matching DTC posterior, so a fit costs O(n·m²) per objective evaluation and O(n·m) memory instead of O(n³)
+    and O(n²) for the exact ``GPR``. The bound comes with its analytic gradient, the kernel gradients of the
+    cross-covariance are evaluated on blocks of m training inputs at a time.
+    """
+
+    def __init__(self, kernel=None, n_inducing=200, noise=1.0, noise_bounds=(1e-5, 1e5), jitter=1e-6,
+                 max_iter=15000, gtol=1e-06, optimizer='fmin_l_bfgs_b'):
+        self.kernel = kernel
+        self.n_inducing = n_inducing
+        self.noise = noise
+        self.noise_bounds = noise_bounds
+        self.jitter = jitter
+        self.max_iter = max_iter
+        self.gtol = gtol
+        self.optimizer = optimizer
+
+    @property
+    def _noise_fixed(self):
+        return isinstance(self.noise_bounds, str) and self.noise_bounds == "fixed"
+
+    @property
+    def theta_(self):
+        """Log-transformed kernel hyperparameters followed by the log noise variance when it is optimised."""
+        if self._noise_fixed:
+            return self.kernel_.theta
+        return np.append(self.kernel_.theta, np.log(self.noise_))
+
+    def _theta_bounds(self):
+        if self._noise_fixed:
+            return self.kernel_.bounds
+        return np.vstack([self.kernel_.bounds, np.log(self.noise_bounds)])
+
+    def _split_theta(self, theta):
+        if theta is None:
+            return self.kernel_, self.noise_
+        if self._noise_fixed:
+            return self.kernel_.clone_with_theta(theta), self.noise_
+        return self.kernel_.clone_with_theta(theta[:-1]), float(np.exp(theta[-1]))
+
+    def _inducing_points(self, X):
+        m = min(self.n_inducing, X.shape[0])
+        index = np.unique(np.linspace(0, X.shape[0] - 1, m).round().astype(int))
+        return X[index]
+
+    def _factorize(self, kernel, noise, X, y):
+        Z = self.Z_
+        Kmm = kernel(Z)
+        mean_diag = np.mean(np.diag(Kmm))
+        Kmm[np.diag_indices_from(Kmm)] += self.jitter * max(mean_diag, 1.0)
+        Lm = cholesky(Kmm, lower=True, check_finite=False)
+        sigma = np.sqrt(noise)
+        Kmn = kernel(Z, X)
+        A = solve_triangular(Lm, Kmn, lower=True, check_finite=False) / sigma
+        B = A @ A.T
+        B[np.diag_indices_from(B)] += 1.0
+        LB = cholesky(B, lower=True, check_finite=False)
+        c = solve_triangular(LB, A @ y, lower=True, check_finite=False) / sigma
+        # Slope of the jitter in the mean of diag(Kmm), it only follows the kernel above a mean of 1
+        jitter_slope = self.jitter if mean_diag > 1.0 else 0.0
+        return Lm, LB, A, c, Kmn, jitter_slope
+
+    def _weights(self, Lm, LB, c):
+        # Mean weights on the inducing points: Kmm^-1/2 B^-1 A y / noise
+        return solve_triangular(Lm.T, solve_triangular(LB.T, c, lower=False, check_finite=False),
+                                lower=False, check_finite=False)
+
+    def _bound(self, kernel, noise, X, y, eval_gradient=False):
+        Lm, LB, A, c, Kmn, jitter_slope = self._factorize(kernel, noise, X, y)
+        n, n_outputs = y.shape
+        diag_sum = np.sum(kernel.diag(X))
+        bound = -0.5 * n * n_outputs * np.log(2 * np.pi * noise)
+        bound -= n_outputs * np.sum(np.log(np.diag(LB)))
+        bound -= 0.5 * np.sum(y ** 2) / noise
+        bound += 0.5 * np.sum(c ** 2)
+        # Trace term of the variational bound, penalises inducing points that explain the data poorly
+        bound -= 0.5 * n_outputs * (diag_sum / noise - np.sum(A ** 2))
+        if not eval_gradient:
+            return bound
+
+        m = Lm.shape[0]
+        weights = self._weights(Lm, LB, c)
+        residuals = y - Kmn.T @ weights
+        AAt = A @ A.T
+        B_inv = cho_solve((LB, True), np.eye(m), check_finite=False)
+        # Slopes of the bound in Kmn and Kmm, with B = I + A A^T and A = Lm^-1 Kmn / sigma
+        grad_Kmn = (n_outputs * np.sqrt(noise) * solve_triangular(Lm.T, (np.eye(m) - B_inv) @ A, lower=False,
+                                                                  check_finite=False)
+                    + weights @ residuals.T) / noise
+        inner = solve_triangular(Lm.T, (np.eye(m) - B_inv - AAt), lower=False, check_finite=False)
+        grad_Kmm = 0.5 * n_outputs * solve_triangular(Lm.T, inner.T, lower=False, check_finite=False)
+        grad_Kmm -= 0.5 * weights @ weights.T
+        grad_diag = -0.5 * n_outputs / noise
+
+        gradient = np.zeros(kernel.n_dims)
+        Z = self.Z_
+        for start in range(0, n, m):
+            stop = min(start + m, n)
+            _, K_gradient = kernel(np.vstack([Z, X[start:stop]]), eval_gradient=True)
+            if start == 0:
+                dKmm = K_gradient[:m, :m]
+                gradient += np.einsum('ij,ijk->k', grad_Kmm, dKmm)
+                gradient += np.trace(grad_Kmm) * jitter_slope * np.einsum('iik->k', dKmm) / m
+            gradient += np.einsum('ij,ijk->k', grad_Kmn[:, start:stop], K_gradient[:m, m:])
+            gradient += grad_diag * np.einsum('iik->k', K_gradient[m:, m:])
+        if self._noise_fixed:
+            return bound, gradient
+        # Slope in the log noise variance
+        noise_gradient = 0.5 * n_outputs * (np.sum(B_inv * AAt) - n - np.sum(A ** 2) + diag_sum / noise)
+        noise_gradient += 0.5 * np.sum(residuals ** 2) / noise
+        return bound, np.append(gradient, noise_gradient)
+
+    def log_marginal_likelihood(self, theta=None, eval_gradient=False):
+        """Variational lower bound at ``theta`` (see ``theta_``), with its gradient if ``eval_gradient``."""
+        kernel, noise = self._split_theta(theta)
+        try:
+            return self._bound(kernel, noise, self.X_train_, self.y_train_, eval_gradient)
+        except np.linalg.LinAlgError:
+            if eval_gradient:
+                return -np.inf, np.zeros_like(self.theta_ if theta is None else theta)
+            return -np.inf
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self._y_1d = y.ndim == 1
+        y = y.reshape(-1, 1) if self._y_1d else y
+        self.X_train_, self.y_train_ = X, y
+        self.kernel_ = clone(self.kernel)
+        self.noise_ = float(self.noise)
+        self.Z_ = self._inducing_points(X)
+        if self.optimizer is not None and len(self.theta_) > 0:
+            def obj_func(theta):
+                value, gradient = self.log_marginal_likelihood(theta, eval_gradient=True)
+                if not np.isfinite(value):
+                    return 1e25, np.zeros_like(theta)
+                return -value, -gradient
+
+            opt_res = optimize.minimize(obj_func, self.theta_, method="L-BFGS-B", jac=True,
+                                        bounds=self._theta_bounds(),
+                                        options={'maxiter': self.max_iter, 'gtol': self.gtol})
+            self.kernel_, self.noise_ = self._split_theta(opt_res.x)
+        self.log_marginal_likelihood_value_ = self.log_marginal_likelihood()
+        Lm, LB, A, c, _, _ = self._factorize(self.kernel_, self.noise_, X, y)
+        self.Lm_, self.LB_ = Lm, LB
+        self.weights_ = self._weights(Lm, LB, c)
+        return self
+
+    def predict(self, X, return_std=False):
+        Kms = self.kernel_(self.Z_, X)
+        y_mean = Kms.T @ self.weights_
+        if self._y_1d:
+            y_mean = y_mean[:, 0]
+        if not return_std:
+            return y_mean
+        tmp1 = solve_triangular(self.Lm_, Kms, lower=True, check_finite=False)
+        tmp2 = solve_triangular(self.LB_, tmp1, lower=True, check_finite=False)
+        y_var = self.kernel_.diag(X) - np.sum(tmp1 ** 2, axis=0) + np.sum(tmp2 ** 2, axis=0)
+        y_std = np.sqrt(np.clip(y_var, 0, None))
+        if not self._y_1d:
+            y_std = np.repeat(y_std[:, np.newaxis], self.y_train_.shape[1], axis=1)
+        return y_mean, y_std
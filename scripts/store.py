@@ -0,0 +1,99 @@
+from pathlib import Path
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+_META_FILE = "meta.json"
+_NUMERIC_FILE = "numeric.npy"
+_TEXT_FILE = "text.npy"
+
+
+class ColumnStore:
+    """Columnar binary layout for processed datasets.
+
+    Numeric columns are kept in a single column-major float64 ``.npy`` matrix that is memory-mapped on
+    load, so selecting columns never parses text and a contiguous block of columns (the training
+    features, which are written first) is returned as a zero-copy view. Text columns live in a
+    separate unicode array and the index and column order in ``meta.json``.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._meta = None
+
+    def exists(self):
+        return (self.path / _META_FILE).is_file()
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            with open(self.path / _META_FILE, 'r') as f:
+                self._meta = json.load(f)
+            if self._meta.get('version') != STORE_VERSION:
+                raise ValueError(f"Unsupported store version {self._meta.get('version')} in {self.path}")
+        return self._meta
+
+    @property
+    def columns(self):
+        return self.meta['columns']
+
+    @property
+    def index(self):
+        return pd.Index(self.meta['index'], name=self.meta['index_name'])
+
+    def save(self, frame, leading_columns=(), **extra_meta):
+        numeric = [col for col in frame.columns if pd.api.types.is_numeric_dtype(frame[col])]
+        leading = [col for col in leading_columns if col in numeric]
+        numeric = leading + [col for col in numeric if col not in leading]
+        text = [col for col in frame.columns if col not in numeric]
+        meta = {
+            'version': STORE_VERSION,
+            'rows': int(frame.shape[0]),
+            'columns': [str(col) for col in frame.columns],
+            'numeric': [str(col) for col in numeric],
+            'text': [str(col) for col in text],
+            'index_name': frame.index.name,
+            'index': self._index_labels(frame.index),
+        }
+        meta.update(extra_meta)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        np.save(tmp_path / _NUMERIC_FILE, np.asfortranarray(frame[numeric].to_numpy(dtype=np.float64)))
+        np.save(tmp_path / _TEXT_FILE, frame[text].fillna('').astype(str).to_numpy(dtype=str))
+        with open(tmp_path / _META_FILE, 'w') as f:
+            json.dump(meta, f)
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        os.replace(tmp_path, self.path)
+        self._meta = meta
+        return self
+
+    @staticmethod
+    def _index_labels(index):
+        if pd.api.types.is_datetime64_any_dtype(index):
+            return list(index.strftime('%Y-%m-%d'))
+        return [str(value) for value in index]
+
+    def load_matrix(self, columns, mmap_mode='r'):
+        values = np.load(self.path / _NUMERIC_FILE, mmap_mode=mmap_mode)
+        positions = [self.meta['numeric'].index(col) for col in columns]
+        start = positions[0] if positions else 0
+        if positions == list(range(start, start + len(positions))):
+            return values[:, start:start + len(positions)]
+        return values[:, positions]
+
+    def load_frame(self, columns=None):
+        columns = self.columns if columns is None else list(columns)
+        numeric = [col for col in columns if col in self.meta['numeric']]
+        text = [col for col in columns if col in self.meta['text']]
+        frame = pd.DataFrame(np.asarray(self.load_matrix(numeric)), columns=numeric, index=self.index)
+        if text:
+            text_values = np.load(self.path / _TEXT_FILE)
+            positions = [self.meta['text'].index(col) for col in text]
+            text_frame = pd.DataFrame(text_values[:, positions], columns=text, index=frame.index)
+            frame = pd.concat([frame, text_frame.replace('', np.nan)], axis=1)
+        return frame[columns]
@@ -0,0 +1,121 @@
+from .dataloader import CountryDataLoader
+from .model_training import MultiGaussianRegression
+from .utils import *
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from threadpoolctl import threadpool_limits
+import copy
+import itertools
+import os
+import time
+
+
+@dataclass
+class SweepSpec:
+    grid: dict = field(default_factory=dict)
+    random: dict = None
+    n_jobs: int = -1
+    results_file: str = "sweep_results.csv"
+
+    def configurations(self):
+        """Returns a list of overrides, each mapping dotted config keys (e.g. ``kernel.type``) to values."""
+        keys = list(self.grid)
+        configurations = [dict(zip(keys, values)) for values in itertools.product(*self.grid.values())]
+        if self.random:
+            rng = np.random.default_rng(self.random.get('seed'))
+            samples = []
+            for _ in range(int(self.random.get('n_iter', 10))):
+                sample = {key: self._sample(rng, space) for key, space in self.random['params'].items()}
+                samples.append(sample)
+            configurations = [{**grid_point, **sample} for grid_point in configurations or [{}]
+                              for sample in samples]
+        return configurations
+
+    @staticmethod
+    def _sample(rng, space):
+        if isinstance(space, (list, tuple)):
+            return space[rng.integers(len(space))]
+        low, high = float(space['low']), float(space['high'])
+        if space.get('log'):
+            return float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        return float(rng.uniform(low, high))
+
+
+def apply_overrides(config, overrides):
+    config = copy.deepcopy(config)
+    for key, value in overrides.items():
+        section, name = key.split('.', 1)
+        config[section][name] = value
+    return config
+
+
+def init_pool_worker(blas_threads):
+    """Initializer of sweep, batch and backtest workers: ``blas_threads`` BLAS threads and warning-only logs."""
+    threadpool_limits(limits=blas_threads)
+    set_worker_logger()
+
+
+def fit_configuration(config, row, report):
+    """Fits a model on ``config`` and fills ``row`` with the fit time, what ``report(regressor)`` returns and the
+    status; a failing fit only marks its row as failed."""
+    try:
+        regressor = MultiGaussianRegression(**config)
+        # Every worker memory-maps the same processed store, so the data is shared read-only through the page cache
+        regressor.split_data()
+        start = time.perf_counter()
+        regressor.train()
+        row["Fit time (s)"] = time.perf_counter() - start
+        row.update(report(regressor))
+        row["Status"] = "ok"
+    except Exception as e:
+        row["Status"] = f"failed: {e!r}"
+    return row
+
+
+def _configuration_report(regressor):
+    metrics, _, _ = regressor.evaluate()
+    metrics["Log marginal likelihood"] = float(regressor.model.log_marginal_likelihood_value_)
+    return metrics
+
+
+def _run_configuration(config, overrides):
+    return fit_configuration(apply_overrides(config, overrides), dict(overrides), _configuration_report)
+
+
+class SweepRunner:
+    def __init__(self, config, spec=None):
+        self.config = config
+        self.spec = spec if spec is not None else SweepSpec(**config.get('sweep', {}))
+        self.data_loader = CountryDataLoader(config)
+        self._logger = self.data_loader._logger
+        self.saving_dir = ROOT_DIR / "results" / self.data_loader.config.save_dir[:-4]
+
+    def run(self):
+        self.data_loader.load_data()
+        configurations = self.spec.configurations()
+        n_jobs = os.cpu_count() if self.spec.n_jobs in (None, -1) else self.spec.n_jobs
+        n_workers = max(1, min(n_jobs, len(configurations)))
+        blas_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        self._logger.info(f"Running {len(configurations)} configurations on {n_workers} workers...")
+        # Restarts inside a configuration stay serial, the pool already uses every core, and the configurations
+        # share the memory budget
+        config = apply_overrides(self.config, {'model.n_jobs': 1, 'model.concurrent_fits': n_workers})
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_pool_worker,
+                                 initargs=(blas_threads,)) as executor:
+            rows = list(tqdm(executor.map(_run_configuration, [config] * len(configurations), configurations),
+                             total=len(configurations), desc="\033[92mSweeping\033[0m", unit="config"))
+        results = pd.DataFrame(rows)
+        if "R-squared" in results:
+            results = results.sort_values("R-squared", ascending=False)
+        self.saving_dir.mkdir(parents=True, exist_ok=True)
+        results_filename = self.saving_dir / self.spec.results_file
+        results.to_csv(results_filename, index=False)
+        self._logger.info(f"Sweep results saved to {results_filename}")
+        return results
+
+
+if __name__ == "__main__":
+    PARAMS_DIR = ROOT_DIR / "params.yml"
+    with open(PARAMS_DIR, "r") as config_file:
+        config_data = yaml.safe_load(config_file)
+    SweepRunner(config_data).run()
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+import json
+import time
+import numpy as np
+
+SECTIONS = ('kernel', 'cholesky', 'gradient')
+
+
+class OptimizerTrace:
+    """Records the hyperparameter optimization of a ``GPR``.
+
+    Every L-BFGS-B iteration stores the log marginal likelihood, gradient norm and theta together with the
+    number of objective calls and the cumulative time spent evaluating the kernel, factorizing it and
+    assembling the gradient. Each record is also passed to ``callback`` as soon as it is made. Consecutive
+    optimizer runs (restarts) are numbered by ``run``.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.iterations = []
+        self.timings = dict.fromkeys(SECTIONS, 0.0)
+        self.n_calls = 0
+        self.cholesky_failures = 0
+        self.n_runs = 0
+        self._run_start = None
+        self._run_iterations = 0
+        self._start = time.perf_counter()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['callback'] = None
+        return state
+
+    @contextmanager
+    def timed(self, section):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[section] += time.perf_counter() - start
+
+    def start_run(self):
+        self.n_runs += 1
+        self._run_start = time.perf_counter()
+        self._run_iterations = 0
+
+    def iteration(self, theta, value, grad):
+        self._run_iterations += 1
+        record = {
+            "run": self.n_runs,
+            "iteration": self._run_iterations,
+            "log_marginal_likelihood": -float(value),
+            "gradient_norm": float(np.linalg.norm(grad)),
+            "theta": np.asarray(theta).tolist(),
+            "objective_calls": self.n_calls,
+            "elapsed": time.perf_counter() - self._run_start,
+            **{f"{section}_time": self.timings[section] for section in SECTIONS},
+        }
+        self.iterations.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def to_dict(self):
+        return {
+            "runs": self.n_runs,
+            "iterations": len(self.iterations),
+            "objective_calls": self.n_calls,
+            "cholesky_failures": self.cholesky_failures,
+            "total_time": time.perf_counter() - self._start,
+            "timings": dict(self.timings),
+            "trace": self.iterations,
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
@@ -1,8 +1,7 @@
 import pandas as pd
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 from pathlib import Path
 import functools
-from omegaconf import OmegaConf
+import importlib
 import logging
 from typing import Optional, Dict
 from colorama import Fore, Back, Style
@@ -11,11 +10,29 @@ import numpy as np
 from math import ceil
 import yaml
 import re
-import matplotlib.pyplot as plt
-import seaborn as sns
 from tqdm import tqdm
 import json
-import joblib
+
+
+class LazyModule:
+    """Imports the named module on first attribute access, so that stages which never plot or pickle do not
+    pay for importing matplotlib, seaborn or joblib."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or attr in ('_name', '_module'):
+            raise AttributeError(attr)
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+plt = LazyModule("matplotlib.pyplot")
+sns = LazyModule("seaborn")
+joblib = LazyModule("joblib")
 
 ROOT_DIR = Path(__file__).parent.parent
 
@@ -34,6 +51,25 @@ CODES = {'Australia': 'AUS',
          'United States': 'USA'
          }
 
+TARGET_COLUMNS = ['Susceptible', 'Infected']
+FEATURE_COLUMNS = TARGET_COLUMNS + ['StringencyIndex_WeightedAverage', 'GovernmentResponseIndex_WeightedAverage',
+                                    'ContainmentHealthIndex_WeightedAverage_ForDisplay',
+                                    'EconomicSupportIndex_ForDisplay']
+
+SIR_COLUMNS = ('Confirmed', 'Deaths', 'Recovered', 'Active')
+REPORT_DTYPES = {'Province_State': str, 'Province/State': str, 'Country_Region': str, 'Country/Region': str,
+                 'Last_Update': str, 'Last Update': str, **{column: 'float64' for column in SIR_COLUMNS}}
+POLICIES_KEY_COLUMNS = ('RegionName', 'Date')
+POLICIES_CHUNK_SIZE = 20000
+
+
+def is_report_column(column):
+    return column.startswith(('Country', 'Province', 'Last')) or column in SIR_COLUMNS
+
+
+def is_policies_column(column):
+    return column in POLICIES_KEY_COLUMNS or 'Index' in column
+
 
 def check_directory(dir_name):
     def decorator_init(init_method):
@@ -52,6 +88,7 @@ def config(params_file: str, as_default: bool = False) -> callable:
     def _decorator(f: callable) -> callable:
         @functools.wraps(f)
         def _wrapper(*args, **kwargs) -> None:
+            from omegaconf import OmegaConf
             cfg_params = OmegaConf.load(params_file)
             if as_default:
                 cfg_params.update(kwargs)
@@ -84,7 +121,11 @@ class ColoredFormatter(logging.Formatter):
         return super().format(record)
 
 
-def set_logger(level=logging.INFO):
+# Set in pool workers, whose logging must not be reconfigured by the objects they build
+_WORKER_LOGGING = False
+
+
+def _stream_handler():
     formatter = ColoredFormatter(
         '{color}[{levelname:.1s}] {message}{reset}',
         style='{', datefmt='%Y-%m-%d %H:%M:%S',
@@ -96,17 +137,37 @@ def set_logger(level=logging.INFO):
             'CRITICAL': Fore.RED + Back.WHITE + Style.BRIGHT,
         }
     )
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def _replace_handlers(logger, handlers):
+    for handler in logger.handlers:
+        handler.close()
+    logger.handlers[:] = handlers
+
+
+def set_logger(level=logging.INFO):
+    logger = logging.getLogger()
+    if _WORKER_LOGGING:
+        return logger
     log_file = Path(__file__).parent / "logs.txt"
     file_handler = logging.FileHandler(log_file)
     file_handler.setLevel(level)
     file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
     file_handler.setFormatter(file_formatter)
 
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(formatter)
-    logger = logging.getLogger()
-    logger.handlers[:] = []
-    logger.addHandler(handler)
-    logger.addHandler(file_handler)
+    _replace_handlers(logger, [_stream_handler(), file_handler])
     logger.setLevel(level)
     return logger
+
+
+def set_worker_logger():
+    """Pool workers only print warnings and never open the log file, whatever they call ``set_logger`` with."""
+    global _WORKER_LOGGING
+    _WORKER_LOGGING = True
+    logger = logging.getLogger()
+    _replace_handlers(logger, [_stream_handler()])
+    logger.setLevel(logging.WARNING)
+    return logger
@@ -0,0 +1,24 @@
+from benchmarks.synthetic import synthetic_frame
+from scripts.model_training import MultiGaussianRegression
+from scripts.sweep import apply_overrides
+from scripts.utils import FEATURE_COLUMNS, ROOT_DIR
+import yaml
+
+
+def training_data(n_rows=160, shift=5, seed=0):
+    """Synthetic inputs and the targets ``shift`` rows later, as ``split_data`` pairs them."""
+    X = synthetic_frame(n_rows + shift, seed=seed)[FEATURE_COLUMNS].values
+    return X[:n_rows], X[shift:n_rows + shift, :2]
+
+
+def regression_config(results_dir, **overrides):
+    """``params.yml`` with dotted-key ``overrides``, writing results to ``results_dir``."""
+    with open(ROOT_DIR / "params.yml", "r") as config_file:
+        config = yaml.safe_load(config_file)
+    return apply_overrides(config, {'model.results_dir': str(results_dir), **overrides})
+
+
+def build_kernel(results_dir, kind, fused=False, **kernel_overrides):
+    overrides = {'kernel.type': kind, 'kernel.fused': fused,
+                 **{f'kernel.{name}': value for name, value in kernel_overrides.items()}}
+    return MultiGaussianRegression(**regression_config(results_dir, **overrides)).kernel
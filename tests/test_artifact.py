@@ -0,0 +1,56 @@
+from fixtures import build_kernel, training_data
+from scripts.artifact import load_artifact, save_artifact
+from scripts.model_training import GPR, MultiOutputGPR
+from scripts.sparse_gp import SparseGPR
+import numpy as np
+import tempfile
+import unittest
+import warnings
+
+
+class CompactPredictorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        X, y = training_data(200)
+        self.X_train, self.y_train, self.X_test = X[:160], y[:160], X[160:]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_same_predictions(self, model, name):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model.fit(self.X_train, self.y_train)
+        y_mean, y_std = model.predict(self.X_test, return_std=True)
+        predictor = load_artifact(save_artifact(model, f"{self.tmp.name}/{name}"))
+        # Small chunks exercise the chunked path
+        artifact_mean, artifact_std = predictor.predict(self.X_test, return_std=True, chunk_size=16)
+        np.testing.assert_allclose(artifact_mean, y_mean, rtol=0, atol=1e-9 * np.abs(y_mean).max(), err_msg=name)
+        np.testing.assert_allclose(artifact_std, y_std, rtol=0, atol=1e-7 * np.abs(y_std).max(), err_msg=name)
+
+    def test_exact(self):
+        for kind in ('case1', 'case2', 'case3'):
+            for fused in (False, True):
+                kernel = build_kernel(self.tmp.name, kind, fused)
+                self.assert_same_predictions(GPR(kernel=kernel, optimizer=None), f"{kind}_{fused}")
+
+    def test_per_output(self):
+        kernel = build_kernel(self.tmp.name, 'case3')
+        model = MultiOutputGPR([GPR(kernel=kernel, optimizer=None), GPR(kernel=kernel, optimizer=None)])
+        self.assert_same_predictions(model, "per_output")
+
+    def test_sparse(self):
+        for kind in ('case1', 'case2', 'case3'):
+            model = SparseGPR(kernel=build_kernel(self.tmp.name, kind), n_inducing=40, optimizer=None)
+            self.assert_same_predictions(model, f"sparse_{kind}")
+
+    def test_unknown_version(self):
+        kernel = build_kernel(self.tmp.name, 'case1')
+        path = save_artifact(GPR(kernel=kernel, optimizer=None).fit(self.X_train, self.y_train), f"{self.tmp.name}/v")
+        (path / "meta.json").write_text((path / "meta.json").read_text().replace('"version": 2', '"version": 1'))
+        with self.assertRaises(ValueError):
+            load_artifact(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
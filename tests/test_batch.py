@@ -0,0 +1,46 @@
+from benchmarks.synthetic import synthetic_frame, write_processed
+from fixtures import build_kernel, regression_config
+from scripts.base_dataloader import CovidData
+from scripts.batch import BatchTrainer
+from scripts.model_training import KERNEL_N_THETA, MultiGaussianRegression
+from math import ceil
+from pathlib import Path
+import tempfile
+import unittest
+
+
+class JobCostTest(unittest.TestCase):
+    def test_kernel_sizes(self):
+        with tempfile.TemporaryDirectory() as results_dir:
+            for kind, n_theta in KERNEL_N_THETA.items():
+                for fused in (False, True):
+                    self.assertEqual(build_kernel(results_dir, kind, fused=fused).n_dims, n_theta, kind)
+
+    def test_matches_regressor_engine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            base = regression_config(tmp / "results", **{'data.data_dir': str(tmp / "data"),
+                                                          'data.state_name': "Texas"})
+            rows = 300
+            write_processed(synthetic_frame(rows), CovidData(**base['data']))
+            n = ceil(0.8 * rows)
+            trainer = BatchTrainer(base)
+            cases = [({}, n ** 3),
+                     ({'model.memory_budget_mb': 5.0, 'model.inducing_points': 50}, n * 50 ** 2),
+                     ({'model.memory_budget_mb': 5.0, 'model.memory_fallback': "error"}, 0),
+                     ({'model.engine': "sparse", 'model.inducing_points': 50}, n * 50 ** 2)]
+            for overrides, cost in cases:
+                config = regression_config(tmp / "results", **{'data.data_dir': str(tmp / "data"),
+                                                               'data.state_name': "Texas", **overrides})
+                self.assertEqual(trainer.job_cost(config), cost, overrides)
+                regressor = MultiGaussianRegression(**config)
+                if cost:
+                    expected = 'exact' if cost == n ** 3 else 'sparse'
+                    self.assertEqual(regressor.select_engine(n), expected, overrides)
+                else:
+                    with self.assertRaises(MemoryError):
+                        regressor.select_engine(n)
+
+
+if __name__ == "__main__":
+    unittest.main()
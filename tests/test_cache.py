@@ -0,0 +1,95 @@
+from scripts.cache import DownloadCache, _ACCESS_FLUSH
+from pathlib import Path
+from unittest import mock
+import json
+import tempfile
+import time
+import unittest
+
+
+def _url(i):
+    return f"https://example.org/reports/{i:04d}.csv"
+
+
+class DownloadCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, **kwargs):
+        return DownloadCache(self.cache_dir, downloader=mock.Mock(), **kwargs)
+
+    def test_puts_append_to_the_journal(self):
+        cache = self.open()
+        writes = []
+        write_index = cache._write_index
+
+        def counted():
+            writes.append(len(cache._index))
+            write_index()
+
+        cache._write_index = counted
+        n = 10 * _ACCESS_FLUSH
+        for i in range(n):
+            cache.put(_url(i), f"report {i}".encode())
+        # The index is rewritten once the journal outgrows it, not on every put
+        self.assertLess(len(writes), 10)
+        # A cache opened without close() replays the journal
+        self.assertEqual(len(self.open()._index), n)
+        cache.close()
+        self.assertFalse(cache.journal_path.exists())
+        self.assertEqual(len(json.loads(cache.index_path.read_text())), n)
+
+    def test_access_times_are_persisted(self):
+        cache = self.open()
+        for i in range(3):
+            cache.put(_url(i), f"report {i}".encode())
+        accessed = cache._index[_url(0)]['accessed']
+        with mock.patch("scripts.cache.time.time", return_value=accessed + 100):
+            cache.get(_url(0))
+        self.assertEqual(self.open()._index[_url(0)]['accessed'], accessed)
+        cache.close()
+        self.assertEqual(self.open()._index[_url(0)]['accessed'], accessed + 100)
+
+    def test_access_times_are_flushed_in_batches(self):
+        cache = self.open()
+        for i in range(2 * _ACCESS_FLUSH):
+            cache.put(_url(i), f"report {i}".encode())
+        with mock.patch("scripts.cache.time.time", return_value=1e10):
+            for i in range(_ACCESS_FLUSH):
+                cache.get(_url(i))
+        index = self.open()._index
+        self.assertTrue(all(index[_url(i)]['accessed'] == 1e10 for i in range(_ACCESS_FLUSH)))
+
+    def test_torn_journal_line(self):
+        cache = self.open()
+        cache.put(_url(0), b"report 0")
+        cache.put(_url(1), b"report 1")
+        with open(cache.journal_path, 'a') as f:
+            f.write('["https://example.org/reports/0002.csv", {"dig')
+        self.assertEqual(sorted(self.open()._index), [_url(0), _url(1)])
+
+    def test_eviction_and_shared_objects(self):
+        cache = self.open(max_size_mb=30 / 1024 ** 2)
+        cache.put(_url(0), b"0" * 10)
+        cache.put(_url(1), b"1" * 10)
+        cache.put(_url(2), b"1" * 10)
+        self.assertEqual(cache.size, 20)
+        with mock.patch("scripts.cache.time.time", return_value=time.time() + 100):
+            cache.get(_url(0))
+        cache.put(_url(3), b"3" * 15)
+        # The least recently used entries go first, their shared object only with the last of them
+        self.assertEqual(sorted(cache._index), [_url(0), _url(3)])
+        self.assertEqual(cache.size, 25)
+        self.assertEqual(len(list(cache.objects_dir.rglob("*"))) - len(list(cache.objects_dir.iterdir())), 2)
+        cache.close()
+        reopened = self.open()
+        self.assertEqual(reopened.size, 25)
+        self.assertEqual(reopened.get(_url(3)).read_bytes(), b"3" * 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+from benchmarks.synthetic import synthetic_frame
+from scripts.kernels import FusedKernel, KernelCache
+from scripts.model_training import GPR, _inverse_norm1
+from scripts.utils import FEATURE_COLUMNS
+import numpy as np
+import unittest
+import warnings
+
+KERNEL_PARAMS = dict(length_scale=1e4, length_scale2=1e7, constant_value=1e7, periodic_length_scale=1.44,
+                     periodicity=2.0, matern_length_scale=1000.0, matern_nu=1.5, constant_value2=1e4)
+
+
+def _training_data(n_rows=160, shift=5):
+    X = synthetic_frame(n_rows + shift)[FEATURE_COLUMNS].values
+    return X[:n_rows], X[shift:n_rows + shift, :2]
+
+
+class CompactLikelihoodTest(unittest.TestCase):
+    def setUp(self):
+        self.X, self.y = _training_data()
+
+    def _fit(self, kind, compact, X=None, alpha=1e-10):
+        gpr = GPR(kernel=FusedKernel(kind=kind, cache=KernelCache(), **KERNEL_PARAMS), optimizer=None,
+                  compact=compact, alpha=alpha)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return gpr.fit(self.X if X is None else X, self.y)
+
+    def test_matches_float64(self):
+        for kind in ('case1', 'case2', 'case3'):
+            reference, compact = self._fit(kind, False), self._fit(kind, True)
+            for offset in (-1.0, 0.0, 0.5):
+                theta = reference.kernel_.theta + offset
+                value, gradient = reference.log_marginal_likelihood(theta, eval_gradient=True)
+                compact_value, compact_gradient = compact.log_marginal_likelihood(theta, eval_gradient=True)
+                self.assertFalse(compact.float64_fallback_, kind)
+                self.assertLess(abs(compact_value - value), 2e-8 * abs(value), kind)
+                # The constant_value2 slope cancels its two terms and is the least accurate one (~1e-5)
+                self.assertLess(np.abs(compact_gradient - gradient).max(), 5e-5 * np.abs(gradient).max(), kind)
+
+    def test_low_rank_rebuilds_gram_matrix(self):
+        for kind in ('case1', 'case2', 'case3'):
+            kernel = FusedKernel(kind=kind, cache=KernelCache(), **KERNEL_PARAMS)
+            K = kernel(self.X)
+            kernel.set_params(deflate=True)
+            W, C = kernel.low_rank(self.X)
+            np.testing.assert_allclose(W.T @ W, np.eye(W.shape[1]), atol=1e-10)
+            np.testing.assert_allclose(kernel(self.X) + W @ C @ W.T, K, rtol=0, atol=1e-8 * np.abs(K).max())
+
+    def test_ill_conditioned_falls_back(self):
+        # Repeated rows make the deflated matrix singular up to alpha, far beyond what float32 resolves
+        X = np.repeat(self.X[:self.X.shape[0] // 2], 2, axis=0)
+        compact = self._fit('case2', True, X, alpha=1e-3)
+        compact.log_marginal_likelihood(compact.kernel_.theta, eval_gradient=True)
+        self.assertTrue(compact.float64_fallback_)
+
+
+class InverseNormTest(unittest.TestCase):
+    def test_estimate(self):
+        rng = np.random.default_rng(0)
+        for condition in (1e2, 1e6, 1e10):
+            Q, _ = np.linalg.qr(rng.normal(size=(120, 120)))
+            A = Q @ np.diag(np.logspace(0, -np.log10(condition), 120)) @ Q.T
+            exact = np.linalg.norm(np.linalg.inv(A), 1)
+            estimate = _inverse_norm1(lambda b: np.linalg.solve(A, b), A.shape[0])
+            self.assertLessEqual(estimate, exact * (1 + 1e-8))
+            self.assertGreaterEqual(estimate, exact / 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+from benchmarks.synthetic import write_mirror
+from scripts.base_dataloader import CovidData
+from scripts.dataloader import CountryDataLoader
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote
+import tempfile
+import threading
+import unittest
+
+START_DATE, END_DATE = '2020-06-01', '2020-06-12'
+MISSING_DATE, FLAKY_DATE, DOWN_DATE = '06-03-2020', '06-05-2020', '06-07-2020'
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    """Serves ``server.root``, failing the ``server.flaky`` files once and the ``server.down`` ones always."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        name = Path(unquote(self.path)).name
+        with server.lock:
+            server.hits[name] = server.hits.get(name, 0) + 1
+            hits = server.hits[name]
+        path = server.root / unquote(self.path).lstrip('/')
+        if name in server.down or (name in server.flaky and hits == 1):
+            self._reply(503, b"unavailable")
+        elif path.is_file():
+            self._reply(200, path.read_bytes())
+        else:
+            self._reply(404, b"not found")
+
+    def _reply(self, code, body):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CountryDataLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _MirrorHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.root = root / "mirror"
+        self.server.hits = {}
+        self.server.flaky, self.server.down = {f"{FLAKY_DATE}.csv"}, {f"{DOWN_DATE}.csv"}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.data = {'country': "United States", 'state_name': "Texas", 'start_date': START_DATE,
+                     'end_date': END_DATE, 'data_dir': str(root / "data"), 'incremental': True,
+                     'download_retries': 1, 'url_prefix': f"http://127.0.0.1:{self.server.server_address[1]}/"}
+        write_mirror(self.server.root, CovidData(**self.data), regions=("Texas", "California"))
+        next(self.server.root.rglob(f"{MISSING_DATE}.csv")).unlink()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def load(self):
+        loader = CountryDataLoader({'data': self.data})
+        loader.load_data()
+        return loader
+
+    def test_missing_and_failed_reports(self):
+        dates = CountryDataLoader({'data': self.data}).load_dates()[:-2]
+        loader = self.load()
+        # A missing report is recorded as such, a report that keeps failing is left for the next run
+        self.assertEqual(loader.missing_reports, [MISSING_DATE])
+        self.assertEqual(loader.reports, [date for date in dates if date not in (MISSING_DATE, DOWN_DATE)])
+        self.assertEqual(sorted(loader.data['Report_Date']), loader.reports)
+        self.assertEqual(self.server.hits[f"{FLAKY_DATE}.csv"], 2)
+        self.assertEqual(self.server.hits[f"{DOWN_DATE}.csv"], 2)
+        self.assertTrue((loader.data['Confirmed'] > 0).all())
+
+        # Nothing to extend the dataset with while the report keeps failing
+        loader = CountryDataLoader({'data': self.data})
+        with self.assertLogs(level='WARNING') as logs:
+            loader.load_data()
+        self.assertIn("None of the missing daily reports are available yet.", "\n".join(logs.output))
+        self.assertEqual(loader.data.shape[0], len(dates) - 2)
+        self.assertEqual(self.server.hits[f"{DOWN_DATE}.csv"], 4)
+
+        self.server.down = set()
+        loader = self.load()
+        self.assertEqual(loader.reports, [date for date in dates if date != MISSING_DATE])
+        self.assertEqual(loader.missing_reports, [MISSING_DATE])
+        self.assertEqual(loader.data.shape[0], len(dates) - 1)
+        # Only the failed report is requested again
+        self.assertEqual(self.server.hits[f"{DOWN_DATE}.csv"], 5)
+        self.assertEqual(self.server.hits[f"{MISSING_DATE}.csv"], 1)
+        self.assertEqual(self.server.hits[f"{FLAKY_DATE}.csv"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
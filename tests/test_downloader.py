@@ -0,0 +1,85 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import threading
+import unittest
+
+from scripts.downloader import AsyncDownloader, OK, MISSING, FAILED
+
+REPORT_CSV = b"Province_State,Confirmed,Deaths,Recovered\nTexas,100,2,50\nCalifornia,200,4,80\n"
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            server.connections.add(self.client_address)
+            hits = server.hits[self.path]
+        if self.path == "/ok.csv" or (self.path == "/flaky.csv" and hits > 1):
+            self._reply(200, REPORT_CSV)
+        elif self.path in ("/flaky.csv", "/down.csv"):
+            self._reply(503, b"unavailable")
+        else:
+            self._reply(404, b"not found")
+
+    def _reply(self, code, body):
+        self.send_response(code)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class AsyncDownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.hits, self.server.connections = {}, set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.downloader = AsyncDownloader(concurrency=2, retries=2, backoff=0.01, max_backoff=0.02, timeout=5)
+
+    def tearDown(self):
+        self.downloader.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def test_outcomes(self):
+        paths = ["/ok.csv", "/missing.csv", "/flaky.csv", "/down.csv"]
+        results = {result.url: result for result in self.downloader.download([self.url(p) for p in paths])}
+        ok, missing, flaky, down = (results[self.url(p)] for p in paths)
+        self.assertEqual((ok.status, ok.content, ok.attempts), (OK, REPORT_CSV, 1))
+        self.assertEqual((missing.status, missing.code, missing.attempts), (MISSING, 404, 1))
+        self.assertEqual((flaky.status, flaky.content, flaky.attempts), (OK, REPORT_CSV, 2))
+        self.assertEqual((down.status, down.code, down.attempts), (FAILED, 503, 3))
+        self.assertEqual(self.server.hits["/down.csv"], 3)
+
+    def test_connections_kept_across_downloads(self):
+        self.downloader.concurrency = 1
+        for _ in range(3):
+            [result] = self.downloader.download([self.url("/ok.csv")])
+            self.assertEqual(result.status, OK)
+        self.assertEqual(len(self.server.connections), 1)
+        self.downloader.close()
+        [result] = self.downloader.download([self.url("/ok.csv")])
+        self.assertEqual(result.status, OK)
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_download_inside_running_loop(self):
+        async def main():
+            return self.downloader.download([self.url("/ok.csv")])
+
+        [result] = asyncio.run(main())
+        self.assertEqual(result.status, OK)
+
+
+if __name__ == "__main__":
+    unittest.main()
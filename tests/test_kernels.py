@@ -0,0 +1,60 @@
+from fixtures import build_kernel, training_data
+from scripts.kernels import CachedExpSineSquared, CachedMatern, KernelCache, FUSED_MATERN_NU, FUSED_TREE_ORDER
+from sklearn.gaussian_process.kernels import ExpSineSquared, Matern
+import numpy as np
+import tempfile
+import unittest
+
+
+class CachedKernelsTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Inputs spanning the magnitudes of the SIR and policy features
+        self.X = rng.normal(size=(150, 4)) * np.array([1.0, 1e2, 1e5, 1e7])
+
+    def test_exp_sine_squared_matches_sklearn(self):
+        for length_scale, periodicity in [(0.1, 3.0), (10.0, 1e3), (1e3, 1e5)]:
+            K, K_gradient = ExpSineSquared(length_scale, periodicity)(self.X, eval_gradient=True)
+            cached = CachedExpSineSquared(length_scale, periodicity, cache=KernelCache())
+            K_cached, K_gradient_cached = cached(self.X, eval_gradient=True)
+            np.testing.assert_array_equal(K_cached, K)
+            np.testing.assert_array_equal(K_gradient_cached, K_gradient)
+
+    def test_matern_matches_sklearn(self):
+        for nu in (0.5, 1.5, 2.5, np.inf):
+            for length_scale in np.logspace(-2, 10, 13):
+                K, K_gradient = Matern(length_scale, nu=nu)(self.X, eval_gradient=True)
+                K_cached, K_gradient_cached = CachedMatern(length_scale, nu=nu, cache=KernelCache())(
+                    self.X, eval_gradient=True)
+                np.testing.assert_allclose(K_cached, K, rtol=0, atol=1e-13)
+                np.testing.assert_allclose(K_gradient_cached, K_gradient, rtol=0, atol=1e-13)
+
+
+class FusedKernelTest(unittest.TestCase):
+    def assert_close(self, actual, expected, rtol=1e-11):
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=rtol * np.abs(expected).max())
+
+    def test_matches_composed_kernel(self):
+        X, _ = training_data(120)
+        cases = [('case1', 1.5), ('case2', 1.5)] + [('case3', nu) for nu in FUSED_MATERN_NU]
+        with tempfile.TemporaryDirectory() as results_dir:
+            for kind, nu in cases:
+                with self.subTest(kind=kind, nu=nu):
+                    # A length scale the size of the input distances keeps the Matern term from vanishing
+                    composed = build_kernel(results_dir, kind, matern_nu=nu, matern_length_scale=1e6)
+                    fused = build_kernel(results_dir, kind, fused=True, matern_nu=nu, matern_length_scale=1e6)
+                    K, K_gradient = composed(X, eval_gradient=True)
+                    K_fused, K_gradient_fused = fused(X, eval_gradient=True)
+                    # The fused kernel orders its gradient by name, the composed one follows the kernel tree
+                    free = [hyperparameter.name for hyperparameter in fused.hyperparameters
+                            if not hyperparameter.fixed]
+                    order = [free.index(name) for name in FUSED_TREE_ORDER if name in free]
+                    self.assert_close(K_fused, K)
+                    for i, j in enumerate(order):
+                        self.assert_close(K_gradient_fused[:, :, j], K_gradient[:, :, i])
+                    self.assert_close(fused.diag(X), composed.diag(X))
+                    self.assert_close(fused(X[:40], X[40:]), composed(X[:40], X[40:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+from scripts.pipeline import Pipeline
+from collections import Counter
+from pathlib import Path
+import copy
+import json
+import tempfile
+import unittest
+
+CONFIG = {
+    'data': {'country': "United States", 'state_name': "Texas", 'start_date': '2020', 'end_date': '2021'},
+    'model': {'logging': "info", 'n_restarts': 0},
+    'kernel': {'type': "case1", 'length_scale': 1e4},
+    'plot': {'dpi': 100},
+    'cli': {'keep_models': 5},
+}
+
+
+class _StubLoader:
+    def __init__(self, root):
+        self.processed_path = root / "data" / "processed" / "United_States_Texas_2020_2021"
+        self.plots_saving_dir = root / "plots"
+        self.file_name = "United_States_Texas_2020_2021.csv"
+        self.data = None
+
+    def load_data(self):
+        self.processed_path.mkdir(parents=True, exist_ok=True)
+        (self.processed_path / "meta.json").write_text(json.dumps({'rows': 100}))
+        self.data = object()
+
+    def plot_policies(self, prefix):
+        self.plots_saving_dir.mkdir(parents=True, exist_ok=True)
+        (self.plots_saving_dir / f"{self.file_name[:-4]}_{prefix}_data.png").touch()
+
+    def plot_sir(self):
+        (self.plots_saving_dir / f"{self.file_name[:-4]}_sir_data.png").touch()
+
+
+class _StubRegressor:
+    def __init__(self, saving_dir, hits_budget=False):
+        self.saving_dir = saving_dir
+        self.time_budget = None
+        self.hits_budget = hits_budget
+        self.budget_hit = False
+        self.X_test = None
+        self.model = None
+
+    def train(self):
+        self.model = object()
+        self.budget_hit = self.hits_budget
+
+    def save_model(self, filename):
+        (self.saving_dir / filename).touch()
+
+    def export_model(self, dirname):
+        path = self.saving_dir / dirname
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "meta.json").write_text(json.dumps({'components': [], 'budget_hit': self.budget_hit}))
+        return path
+
+    def split_data(self):
+        self.X_test = object()
+
+    def load_model(self, dirname):
+        self.model = object()
+
+    def predict(self):
+        for name in ("metrics.json", "predictions.json"):
+            (self.saving_dir / name).touch()
+
+    def plot_predictions(self):
+        (self.saving_dir / "predictions_plot.png").touch()
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def config(self, **changes):
+        config = copy.deepcopy(CONFIG)
+        config['data']['data_dir'] = str(self.root / "data")
+        config['model']['results_dir'] = str(self.root / "results")
+        for key, value in changes.items():
+            section, name = key.split('.', 1)
+            config[section][name] = value
+        return config
+
+    def run_pipeline(self, config, hits_budget=False):
+        """Runs every stage, returns the pipeline and how many times each stage ran."""
+        calls = Counter()
+        pipeline = Pipeline(config)
+        pipeline._import = lambda stage: None
+        pipeline._data_loader = _StubLoader(self.root)
+        pipeline._regressor = _StubRegressor(pipeline.saving_dir, hits_budget)
+        run_stage = pipeline._run_stage
+
+        def counted(stage, key):
+            calls[stage.name] += 1
+            run_stage(stage, key)
+
+        pipeline._run_stage = counted
+        pipeline.run()
+        return pipeline, calls
+
+    def models(self, pipeline):
+        return sorted(path.name for path in (pipeline.saving_dir / "models").iterdir())
+
+    def test_skips(self):
+        _, calls = self.run_pipeline(self.config())
+        self.assertEqual(calls, {'fetch': 1, 'train': 1, 'predict': 1, 'plot': 1})
+        _, calls = self.run_pipeline(self.config())
+        self.assertEqual(calls, {})
+        # Plot settings only change the plot stage
+        _, calls = self.run_pipeline(self.config(**{'plot.dpi': 200}))
+        self.assertEqual(calls, {'plot': 1})
+        # Kernel settings retrain, but keep the processed data
+        _, calls = self.run_pipeline(self.config(**{'plot.dpi': 200, 'kernel.length_scale': 1e3}))
+        self.assertEqual(calls, {'train': 1, 'predict': 1, 'plot': 1})
+        # Operational settings do not change any key
+        _, calls = self.run_pipeline(self.config(**{'plot.dpi': 200, 'kernel.length_scale': 1e3, 'model.n_jobs': 4}))
+        self.assertEqual(calls, {})
+
+    def test_reuses_and_prunes_models(self):
+        first, _ = self.run_pipeline(self.config(**{'cli.keep_models': 2}))
+        second, _ = self.run_pipeline(self.config(**{'cli.keep_models': 2, 'kernel.length_scale': 1e3}))
+        # Going back to the first kernel reuses its model and makes it the manifest's current one
+        again, calls = self.run_pipeline(self.config(**{'cli.keep_models': 2}))
+        self.assertEqual(calls, {'predict': 1, 'plot': 1})
+        manifest = json.loads(again.manifest_path.read_text())
+        self.assertEqual(manifest['train']['key'], first.keys['train'])
+        third, _ = self.run_pipeline(self.config(**{'cli.keep_models': 2, 'kernel.length_scale': 1e2}))
+        self.assertEqual(self.models(third), sorted([first.keys['train'], third.keys['train']]))
+        # A model with missing files is trained again
+        (third.saving_dir / third._model_dir() / "covid_regression_model.pkl").unlink()
+        _, calls = self.run_pipeline(self.config(**{'cli.keep_models': 2, 'kernel.length_scale': 1e2}))
+        self.assertEqual(calls['train'], 1)
+
+    def test_budget_hit_is_not_recorded(self):
+        pipeline, calls = self.run_pipeline(self.config(), hits_budget=True)
+        self.assertEqual(calls['train'], 1)
+        manifest = json.loads(pipeline.manifest_path.read_text())
+        self.assertEqual(sorted(manifest), ['fetch'])
+        _, calls = self.run_pipeline(self.config())
+        self.assertEqual(calls, {'train': 1, 'predict': 1, 'plot': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
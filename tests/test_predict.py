@@ -0,0 +1,54 @@
+from fixtures import regression_config, training_data
+from scripts.model_training import MultiGaussianRegression, PREDICTION_MEMO_SIZE
+from scripts.utils import FEATURE_COLUMNS, TARGET_COLUMNS
+import numpy as np
+import tempfile
+import unittest
+
+
+class _CountingModel:
+    def __init__(self):
+        self.rows = []
+
+    def predict(self, X, return_std=False):
+        self.rows.append(X.shape[0])
+        return X[:, :len(TARGET_COLUMNS)] * 2, np.ones((X.shape[0], len(TARGET_COLUMNS)))
+
+
+class PredictWithStdTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.regressor = MultiGaussianRegression(**regression_config(self.tmp.name,
+                                                                     **{'model.predict_chunk_size': 4}))
+        self.regressor.model = self.model = _CountingModel()
+        self.X, _ = training_data(10)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_chunks(self):
+        y_pred, sigma = self.regressor.predict_with_std(self.X)
+        self.assertEqual(self.model.rows, [4, 4, 2])
+        np.testing.assert_array_equal(y_pred, self.X[:, :len(TARGET_COLUMNS)] * 2)
+        self.assertEqual(sigma.shape, y_pred.shape)
+
+    def test_memo_is_bounded(self):
+        inputs = [self.X + i for i in range(PREDICTION_MEMO_SIZE + 2)]
+        for X in inputs:
+            self.regressor.predict_with_std(X)
+        self.assertEqual(len(self.regressor._predictions), PREDICTION_MEMO_SIZE)
+        calls = len(self.model.rows)
+        self.regressor.predict_with_std(inputs[-1])
+        self.assertEqual(len(self.model.rows), calls)
+        # The least recently used inputs were dropped
+        self.regressor.predict_with_std(inputs[0])
+        self.assertGreater(len(self.model.rows), calls)
+
+    def test_no_rows(self):
+        y_pred, sigma = self.regressor.predict_with_std(np.empty((0, len(FEATURE_COLUMNS))))
+        self.assertEqual((y_pred.shape, sigma.shape), ((0, len(TARGET_COLUMNS)),) * 2)
+        self.assertEqual(self.model.rows, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
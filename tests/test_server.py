@@ -0,0 +1,97 @@
+from scripts.server import MicroBatcher, ModelRegistry, RegionModel, ServerSpec
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+import threading
+import time
+import unittest
+
+CONFIG = {'data': {'country': "United States", 'start_date': '2020', 'end_date': '2021'}, 'model': {}}
+
+
+class MicroBatcherTest(unittest.TestCase):
+    def submit_all(self, batcher, requests):
+        barrier = threading.Barrier(len(requests))
+
+        def submit(X):
+            barrier.wait()
+            return batcher.submit(X)
+
+        with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+            futures = [executor.submit(submit, X) for X in requests]
+        return futures
+
+    def test_one_predict_call(self):
+        calls = []
+
+        def predict(X):
+            calls.append(X.shape[0])
+            return X.sum(axis=1), -X.sum(axis=1)
+
+        # A long window, ended early once every request is queued
+        requests = [np.full((rows, 2), float(i)) for i, rows in enumerate((1, 3, 2, 5))]
+        batcher = MicroBatcher(predict, window=5.0, max_rows=sum(X.shape[0] for X in requests))
+        futures = self.submit_all(batcher, requests)
+        self.assertEqual(calls, [11])
+        self.assertEqual(list(batcher.batch_sizes), [4])
+        for X, future in zip(requests, futures):
+            y_mean, y_std = future.result()
+            np.testing.assert_array_equal(y_mean, X.sum(axis=1))
+            np.testing.assert_array_equal(y_std, -X.sum(axis=1))
+
+    def test_error_reaches_every_request(self):
+        def predict(X):
+            raise ValueError("no model")
+
+        batcher = MicroBatcher(predict, window=5.0, max_rows=3)
+        futures = self.submit_all(batcher, [np.zeros((1, 2))] * 3)
+        for future in futures:
+            with self.assertRaisesRegex(ValueError, "no model"):
+                future.result()
+
+
+class ModelRegistryTest(unittest.TestCase):
+    def test_single_load_per_region(self):
+        loads = []
+
+        def load(config, model_dir, batcher_options):
+            loads.append(config['data']['state_name'])
+            time.sleep(0.2)
+            return object()
+
+        registry = ModelRegistry(CONFIG, ServerSpec(capacity=1))
+        with mock.patch.object(RegionModel, 'load', side_effect=load):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                models = list(executor.map(registry.get, ["Texas"] * 8))
+            self.assertEqual(loads, ["Texas"])
+            self.assertTrue(all(model is models[0] for model in models))
+            self.assertIs(registry.get("Texas"), models[0])
+            # The least recently used region makes room for a new one
+            registry.get("Ohio")
+        self.assertEqual(loads, ["Texas", "Ohio"])
+        self.assertEqual(registry.evictions, 1)
+        self.assertEqual(registry.stats()['loaded'], ["United_States_Ohio_2020_2021"])
+
+    def test_failed_load_reaches_waiters_and_is_retried(self):
+        loads = []
+
+        def load(config, model_dir, batcher_options):
+            loads.append(1)
+            time.sleep(0.2)
+            raise FileNotFoundError("No model artifact")
+
+        registry = ModelRegistry(CONFIG, ServerSpec())
+        with mock.patch.object(RegionModel, 'load', side_effect=load):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [executor.submit(registry.get, "Texas") for _ in range(4)]
+            for future in futures:
+                with self.assertRaisesRegex(ValueError, "No model artifact"):
+                    future.result()
+            self.assertEqual(len(loads), 1)
+            with self.assertRaises(ValueError):
+                registry.get("Texas")
+        self.assertEqual(len(loads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+from fixtures import build_kernel, training_data
+from scripts.model_training import GPR
+from scripts.sparse_gp import SparseGPR
+from sklearn.gaussian_process.kernels import RBF, ConstantKernel
+import numpy as np
+import tempfile
+import unittest
+import warnings
+
+
+class SparseGPRTest(unittest.TestCase):
+    def test_matches_exact_with_all_inducing_points(self):
+        # With every training input as inducing point the bound is the exact likelihood with alpha = noise
+        X, y = training_data(60)
+        with tempfile.TemporaryDirectory() as results_dir, warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for kind in ('case1', 'case2', 'case3'):
+                kernel = build_kernel(results_dir, kind)
+                sparse = SparseGPR(kernel=kernel, n_inducing=X.shape[0], noise=1e4, noise_bounds="fixed",
+                                   jitter=1e-14, optimizer=None).fit(X, y)
+                exact = GPR(kernel=kernel, alpha=1e4, optimizer=None).fit(X, y)
+                theta = sparse.theta_ + 0.2
+                value, gradient = sparse.log_marginal_likelihood(theta, eval_gradient=True)
+                exact_value, exact_gradient = exact.log_marginal_likelihood(theta, eval_gradient=True)
+                self.assertLess(abs(value - exact_value), 1e-10 * abs(exact_value), kind)
+                self.assertLess(np.abs(gradient - exact_gradient).max(), 1e-8 * np.abs(exact_gradient).max(), kind)
+                y_mean, y_std = sparse.predict(X[:10] + 1, return_std=True)
+                exact_mean, exact_std = exact.predict(X[:10] + 1, return_std=True)
+                np.testing.assert_allclose(y_mean, exact_mean, rtol=0, atol=1e-10 * np.abs(exact_mean).max())
+                np.testing.assert_allclose(y_std, exact_std, rtol=0, atol=1e-8 * exact_std.max())
+
+    def test_gradient(self):
+        rng = np.random.default_rng(0)
+        X = rng.uniform(0, 10, (50, 2))
+        y = np.c_[np.sin(X[:, 0]), np.cos(X[:, 1])] + 0.1 * rng.normal(size=(50, 2))
+        kernel = ConstantKernel(2.0) * RBF([1.0, 2.0]) + ConstantKernel(0.5)
+        sparse = SparseGPR(kernel=kernel, n_inducing=15, noise=0.05, optimizer=None).fit(X, y)
+        value, gradient = sparse.log_marginal_likelihood(sparse.theta_, eval_gradient=True)
+        step = 1e-6
+        numerical = [(sparse.log_marginal_likelihood(sparse.theta_ + e * step)
+                      - sparse.log_marginal_likelihood(sparse.theta_ - e * step)) / (2 * step)
+                     for e in np.eye(len(sparse.theta_))]
+        np.testing.assert_allclose(gradient, numerical, rtol=1e-6)
+        fitted = SparseGPR(kernel=kernel, n_inducing=15, noise=0.05).fit(X, y)
+        self.assertGreater(fitted.log_marginal_likelihood_value_, value)
+        self.assertNotEqual(fitted.noise_, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
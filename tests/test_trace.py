@@ -0,0 +1,50 @@
+from fixtures import build_kernel, training_data
+from scripts.model_training import GPR
+from scripts.trace import OptimizerTrace
+from sklearn.gaussian_process import GaussianProcessRegressor
+import numpy as np
+import tempfile
+import unittest
+import warnings
+
+
+class TracedLikelihoodTest(unittest.TestCase):
+    def test_matches_sklearn(self):
+        X, y = training_data(120)
+        with tempfile.TemporaryDirectory() as results_dir, warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for kind in ('case1', 'case2', 'case3'):
+                for targets in (y, y[:, 0]):
+                    gpr = GPR(kernel=build_kernel(results_dir, kind), optimizer=None).fit(X, targets)
+                    gpr.trace = OptimizerTrace()
+                    for offset in (-0.5, 0.0, 0.5):
+                        theta = gpr.kernel_.theta + offset
+                        value, gradient = gpr.log_marginal_likelihood(theta, eval_gradient=True)
+                        expected, expected_gradient = GaussianProcessRegressor.log_marginal_likelihood(
+                            gpr, theta, eval_gradient=True)
+                        self.assertLess(abs(value - expected), 1e-10 * abs(expected), kind)
+                        np.testing.assert_allclose(gradient, expected_gradient, rtol=1e-8,
+                                                   atol=1e-10 * np.abs(expected_gradient).max())
+                        self.assertLess(abs(gpr.log_marginal_likelihood(theta) - expected), 1e-10 * abs(expected))
+                    self.assertEqual(gpr.trace.n_calls, 6)
+                    self.assertTrue(all(gpr.trace.timings[section] > 0 for section in ('kernel', 'cholesky')))
+
+    def test_cholesky_failure(self):
+        X, y = training_data(60)
+        X = np.repeat(X, 2, axis=0)
+        y = np.repeat(y, 2, axis=0)
+        with tempfile.TemporaryDirectory() as results_dir, warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            gpr = GPR(kernel=build_kernel(results_dir, 'case1'), optimizer=None, alpha=0.0)
+            gpr.X_train_, gpr.y_train_, gpr.kernel_ = X, y, gpr.kernel
+            gpr.trace = OptimizerTrace()
+            value, gradient = gpr.log_marginal_likelihood(gpr.kernel.theta, eval_gradient=True)
+            expected, expected_gradient = GaussianProcessRegressor.log_marginal_likelihood(
+                gpr, gpr.kernel.theta, eval_gradient=True)
+        self.assertEqual((value, expected), (-np.inf, -np.inf))
+        np.testing.assert_array_equal(gradient, expected_gradient)
+        self.assertEqual(gpr.trace.cholesky_failures, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+from fixtures import build_kernel, training_data
+from scripts.model_training import GPR, MultiOutputGPR
+from sklearn.base import clone
+import numpy as np
+import tempfile
+import unittest
+
+
+class UpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        X, self.y = training_data(200)
+        self.X, self.X_test = X[:180], X[180:]
+        self.y = self.y[:180]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_matches_refit(self, model, y):
+        refit = clone(model).fit(self.X, y)
+        updated = model.fit(self.X[:140], y[:140])
+        # Two updates, the second one extending an already updated factor
+        updated.update(self.X[140:170], y[140:170]).update(self.X[170:], y[170:])
+        y_mean, y_std = refit.predict(self.X_test, return_std=True)
+        updated_mean, updated_std = updated.predict(self.X_test, return_std=True)
+        np.testing.assert_allclose(updated_mean, y_mean, rtol=0, atol=1e-9 * np.abs(y_mean).max())
+        np.testing.assert_allclose(updated_std, y_std, rtol=0, atol=1e-7 * np.abs(y_std).max())
+        self.assertLess(abs(updated.log_marginal_likelihood_value_ - refit.log_marginal_likelihood_value_),
+                        1e-8 * abs(refit.log_marginal_likelihood_value_))
+
+    def test_single_output(self):
+        for kind in ('case1', 'case3'):
+            self.assert_matches_refit(GPR(kernel=build_kernel(self.tmp.name, kind), optimizer=None), self.y[:, 0])
+
+    def test_multi_output(self):
+        for kind in ('case1', 'case3'):
+            self.assert_matches_refit(GPR(kernel=build_kernel(self.tmp.name, kind), optimizer=None), self.y)
+
+    def test_per_output(self):
+        kernel = build_kernel(self.tmp.name, 'case2')
+        model = MultiOutputGPR([GPR(kernel=kernel, optimizer=None), GPR(kernel=kernel, optimizer=None)])
+        self.assert_matches_refit(model, self.y)
+
+
+if __name__ == "__main__":
+    unittest.main()